@@ -0,0 +1,155 @@
+import posixpath
+import zipfile
+from collections import namedtuple
+from lxml import etree
+
+# a table cell as python-docx would report it: the <w:tc> element and the same text _Cell.text gives
+StreamCell = namedtuple('StreamCell', ['element', 'text'])
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+OFFICE_DOCUMENT_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+
+W_BODY = f"{{{W_NS}}}body"
+W_TBL = f"{{{W_NS}}}tbl"
+W_TR = f"{{{W_NS}}}tr"
+W_TC = f"{{{W_NS}}}tc"
+W_P = f"{{{W_NS}}}p"
+W_R = f"{{{W_NS}}}r"
+W_T = f"{{{W_NS}}}t"
+W_HYPERLINK = f"{{{W_NS}}}hyperlink"
+W_VAL = f"{{{W_NS}}}val"
+
+# text equivalents of run content other than <w:t>, as python-docx translates them; <w:br> is handled separately (only line breaks count)
+RUN_TEXT = {f"{{{W_NS}}}tab": "\t", f"{{{W_NS}}}ptab": "\t", f"{{{W_NS}}}cr": "\n", f"{{{W_NS}}}noBreakHyphen": "-"}
+W_BR = f"{{{W_NS}}}br"
+
+def read_rels(docx, part_name):
+
+    # relationships for a part live in <dir>/_rels/<name>.rels; we only need the external ones (hyperlinks), as {rId: URL}
+    rels_name = posixpath.join(posixpath.dirname(part_name), '_rels', f"{posixpath.basename(part_name)}.rels")
+    if rels_name not in docx.namelist():
+        return {}, {}
+
+    rels = etree.fromstring(docx.read(rels_name))
+    external = {}
+    internal = {}
+    for rel in rels.iterfind(f"{{{PKG_REL_NS}}}Relationship"):
+        if rel.get('TargetMode') == 'External':
+            external[rel.get('Id')] = rel.get('Target')
+        else:
+            internal[rel.get('Type')] = rel.get('Target')
+
+    return external, internal
+
+def main_document_part(docx):
+
+    # the package's own relationships say where the main document is (nearly always word/document.xml)
+    _, package_rels = read_rels(docx, '')
+    target = package_rels.get(OFFICE_DOCUMENT_REL, 'word/document.xml')
+    return target.lstrip('/')
+
+def run_text(run):
+
+    text = []
+    for element in run:
+        if element.tag == W_T:
+            text.append(element.text or '')
+        elif element.tag == W_BR:
+            if element.get(f"{{{W_NS}}}type", 'textWrapping') == 'textWrapping':
+                text.append('\n')
+        else:
+            text.append(RUN_TEXT.get(element.tag, ''))
+
+    return ''.join(text)
+
+def paragraph_text(paragraph):
+
+    # only runs directly in the paragraph (or directly in one of its hyperlinks) count, same as python-docx
+    text = []
+    for element in paragraph:
+        if element.tag == W_R:
+            text.append(run_text(element))
+        elif element.tag == W_HYPERLINK:
+            text.extend(run_text(run) for run in element.iterfind(W_R))
+
+    return ''.join(text)
+
+def cell_text(tc):
+    return '\n'.join(paragraph_text(paragraph) for paragraph in tc.iterfind(W_P))
+
+def tc_properties(tc):
+
+    # how many grid columns the cell covers, and whether it continues a vertical merge from the row above
+    grid_span = 1
+    v_merge = None
+
+    tc_pr = tc.find(f"{{{W_NS}}}tcPr")
+    if tc_pr is not None:
+        span = tc_pr.find(f"{{{W_NS}}}gridSpan")
+        if span is not None:
+            grid_span = int(span.get(W_VAL, 1))
+        merge = tc_pr.find(f"{{{W_NS}}}vMerge")
+        if merge is not None:
+            v_merge = merge.get(W_VAL, 'continue')
+
+    return grid_span, v_merge
+
+def grid_before(tr):
+    element = tr.find(f"{{{W_NS}}}trPr/{{{W_NS}}}gridBefore")
+    return int(element.get(W_VAL, 0)) if element is not None else 0
+
+def table_rows(tbl):
+
+    # lay each row out the way python-docx's row.cells does: a cell once per grid column it spans, and vertically merged cells
+    # replaced by the cell that starts the merge. Cells are shared between rows/columns, so identical cells are the same object
+    rows = []
+    cells_above = {}
+    texts = {}
+
+    for tr in tbl.iterfind(W_TR):
+        row = []
+        cells_here = {}
+        offset = grid_before(tr)
+
+        for tc in tr.iterfind(W_TC):
+            grid_span, v_merge = tc_properties(tc)
+
+            if v_merge == 'continue' and offset in cells_above:
+                cell = cells_above[offset]
+            else:
+                if tc not in texts:
+                    texts[tc] = StreamCell(tc, cell_text(tc))
+                cell = texts[tc]
+
+            cells_here[offset] = cell
+            row.extend([cell] * grid_span)
+            offset += grid_span
+
+        cells_above = cells_here
+        rows.append(row)
+
+    return rows
+
+def iter_tables(docx_path):
+
+    # stream the main document and hand back each top-level table (as rows of StreamCells) along with the hyperlink targets.
+    # Once the caller asks for the next table, the last one (and everything before it) is cleared so memory stays flat
+    with zipfile.ZipFile(docx_path) as docx:
+        part_name = main_document_part(docx)
+        rels, _ = read_rels(docx, part_name)
+
+        with docx.open(part_name) as document_xml:
+            # python-docx parses with remove_blank_text; do the same so cell XML (and therefore the row cache keys) match
+            for _, tbl in etree.iterparse(document_xml, events=('end',), tag=W_TBL, remove_blank_text=True, resolve_entities=False):
+
+                # nested tables are part of their cell; python-docx only lists tables that sit directly in the body
+                body = tbl.getparent()
+                if body is None or body.tag != W_BODY:
+                    continue
+
+                yield table_rows(tbl), rels
+
+                tbl.clear()
+                while tbl.getprevious() is not None:
+                    del body[0]
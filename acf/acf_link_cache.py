@@ -0,0 +1,109 @@
+import os
+import time
+import sqlite3
+from urllib.parse import urlsplit, urlunsplit
+
+# results of link checks, kept between runs (and shared by every state) so that links checked recently don't have to be fetched again
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS link_checks (
+    url TEXT PRIMARY KEY,
+    ok INTEGER NOT NULL,
+    status INTEGER,
+    final_url TEXT,
+    corrected_url TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    error TEXT,
+    checked_at REAL NOT NULL
+)
+"""
+CACHE_COLUMNS = ['url', 'ok', 'status', 'final_url', 'corrected_url', 'etag', 'last_modified', 'error', 'checked_at']
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def canonical_url(url):
+
+    # the same link can be written several ways; scheme and host aren't case-sensitive, default ports and #fragments don't change what's fetched.
+    # Paths and queries are case-sensitive, so they're left alone
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        # a typo'd port or host can't be tidied up; keep the link as written so the check reports it broken instead of stopping
+        return url
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        # hostname drops the brackets around an IPv6 address, which the URL needs back
+        host = f"[{host}]"
+    netloc = host if port in (None, DEFAULT_PORTS.get(scheme)) else f"{host}:{port}"
+    if parts.username or parts.password:
+        netloc = f"{parts.netloc.rsplit('@', 1)[0]}@{netloc}"
+
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+def open_cache(cache_file):
+    conn = sqlite3.connect(cache_file)
+
+    # several states can be checked at once; WAL lets them share the cache without blocking each other's reads
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute(CACHE_SCHEMA)
+    conn.commit()
+
+    return conn
+
+def get_entries(conn, urls):
+
+    # cached results for urls, keyed by canonical URL; looked up in chunks to stay under SQLite's limit on query parameters
+    keys = list({canonical_url(url) for url in urls})
+    entries = {}
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        rows = conn.execute(f"SELECT {', '.join(CACHE_COLUMNS)} FROM link_checks WHERE url IN ({', '.join('?' * len(chunk))})", chunk)
+        entries.update((row[0], dict(zip(CACHE_COLUMNS, row))) for row in rows)
+
+    return entries
+
+def is_fresh(entry, ttl):
+
+    # only good results are trusted for the whole TTL; failures are often temporary (timeouts, 5xx), so those are always checked again
+    return entry is not None and entry['ok'] and time.time() - entry['checked_at'] < ttl
+
+def conditional_headers(entry):
+
+    # a stale good result can be revalidated cheaply: if the page hasn't changed the server answers 304 with no body
+    headers = {}
+    if entry and entry['ok']:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    return headers
+
+def save_results(conn, results):
+
+    # results are test_links.check_url() dicts; one transaction for the lot
+    rows = [(canonical_url(result['url']), int(result['ok']), result['status'], result['final_url'], result['corrected_url'],
+             result.get('etag'), result.get('last_modified'), result['error'], result.get('checked_at', time.time())) for result in results]
+    with conn:
+        conn.executemany(f"INSERT OR REPLACE INTO link_checks ({', '.join(CACHE_COLUMNS)}) VALUES ({', '.join('?' * len(CACHE_COLUMNS))})", rows)
+
+def problem_links(cache_file):
+
+    # every cached link that was broken, or had moved, when it was last checked (used by the parser to flag them without going online).
+    # The cache belongs to test_links.py, so it's opened read-only: a parse never creates, converts or writes to it
+    if not os.path.exists(cache_file):
+        return []
+
+    conn = sqlite3.connect(f"file:{cache_file}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(f"SELECT {', '.join(CACHE_COLUMNS)} FROM link_checks WHERE ok = 0 OR corrected_url != ''")
+        return [dict(zip(CACHE_COLUMNS, row)) for row in rows]
+    except sqlite3.OperationalError:
+        # not a link cache (yet); nothing to report
+        return []
+    finally:
+        conn.close()
@@ -1,125 +1,278 @@
-from docx import Document
 import sys
 import os
 import re
 from lxml import etree
-from fuzzywuzzy import process
 from datetime import datetime
 import pickle
 import json
-from collections import defaultdict
+import copy
+import hashlib
+from collections import defaultdict, namedtuple, Counter
 import urllib.parse
-import requests
-import csv
-import pandas as pd
+import argparse
+import contextlib
+import time
+import traceback
+import tracemalloc
+import socket
+import stat
+from glob import glob
+import acf_vocabs
+import make_html
+
+# python-docx, the streaming reader, cProfile and the process pool are only needed by some runs, so they're imported where they're used
+
+# read-only copy of a table cell, built once per <w:tc> by snapshot_tables() (or stream_tables())
+CellSnapshot = namedtuple('CellSnapshot', ['text', 'lines', 'element', 'links', 'digest'])
+
+# every hyperlink in a cell, keyed by normalized text; built once per cell by index_cell_links()
+LinkIndex = namedtuple('LinkIndex', ['anchors', 'paragraphs', 'fields', 'field_paragraphs', 'ledger'])
+
+# one problem found (and usually fixed) while checking a row against our controlled vocabularies; collected in details['audit'] by write_error()
+AuditEntry = namedtuple('AuditEntry', ['position', 'severity', 'kind', 'vocabulary', 'term', 'correction', 'message'])
+
+# how each kind of audit entry reads in the audit log, and how serious it is
+AUDIT_MESSAGES = {
+    "duplicate": "Duplicate values: '{term}' (from {vocabulary} vocabulary) included multiple times.",
+    "incorrect": "Incorrect term: MS Word included '{term}'; replaced with '{correction}' (from {vocabulary} vocabulary).",
+    "unidentified": "Unidentified term: MS Word included '{term}', which does not exist in the {vocabulary} vocabulary). Revise Word doc and re-run XML generation, if needed.",
+    "missing": "Missing term: when '{term}' is used, '{correction}' must also be included."
+}
+AUDIT_SEVERITY = {"duplicate": "warning", "incorrect": "warning", "unidentified": "error", "missing": "warning"}
+SEVERITY_ORDER = {"error": 0, "warning": 1}
+
+# bump this whenever a change to the parsing code would change the output for an unchanged row; old cache entries are then ignored
+PARSE_CACHE_VERSION = 2
+
+# config values that affect how a row is parsed
+PARSE_CACHE_CONFIG_FIELDS = ["state_code_pattern", "statute_pattern", "titleName", "subtitleName", "articleName", "partName", "subPartName", "category", "titleContent"]
+
+# Word XML namespaces
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+R_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NAMESPACES = {'w': W_NS}
+
+# how much work the current run has done (rows read, links looked up, etc.); reset at the start of main() and written to the metrics report
+COUNTERS = Counter()
+
+# compiled XSD schemas, keyed by (path, modification time)
+XML_SCHEMAS = {}
+
+# namespace and indentation used in our XML output
+XSI_NAMESPACE = {'xsi': 'http://www.w3.org/2001/XMLSchema-instance'}
+XML_INDENT = '  '
+
+# characters we drop (or swap) before comparing text from the Word doc; applied in one step with str.translate
+LINK_TEXT_TABLE = str.maketrans({' ': None, '(': None, ')': None, '\u200b': None, '\u2009': None, '’': "'"})
+
+def normalize_link_text(txt):
+    return txt.strip().translate(LINK_TEXT_TABLE).lower()
+
+def parse_field_url(instr_text):
+
+    # field codes look like: HYPERLINK "https://..." \l "anchor"; the URL is between the first pair of quotes
+    parts = instr_text.split('"')
+    if len(parts) < 2:
+        return None
 
-def find_source_link(cell, target_text, preceding_target_text=None):
-    # Get the XML for the cell
-    cell_xml = cell._element
+    hyperlink_url = parts[1]
 
-    # Prep target text for searching
-    orig_text = target_text
-    target_text = target_text.strip().replace(' ', '').replace(')', '').replace('(', '').lower()
+    # Check for the presence of the \l switch and append as an anchor
+    if "\\l" in instr_text:
+        # Find the text following \l
+        l_index = instr_text.index("\\l") + 2
+        anchor_text = instr_text[l_index:].strip()
+        if anchor_text.startswith('"') and anchor_text.endswith('"'):
+            anchor_text = anchor_text[1:-1]  # Remove surrounding quotes
+        hyperlink_url += f"#{anchor_text}"
 
-    # Prep preceding target text if provided
-    if preceding_target_text is not None:
-        preceding_target_text = preceding_target_text.strip().replace(' ', '').replace(')', '').replace('(', '').lower()
+    return hyperlink_url
 
-    preceding_text_found = False
+def index_cell_links(cell_xml, rels):
 
-    # Find all <w:p> elements in the cell
-    paragraphs = cell_xml.findall('.//w:p', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
+    # OPTION 1: links stored in <w:hyperlink> tags; map the hyperlink text to (paragraph position, URL)
+    anchors = {}
+    paragraphs = {}
 
-    # Iterate through <w:p> elements
-    for paragraph in paragraphs:
-        # Extract all <w:t> (text) elements in the paragraph
-        text_elements = paragraph.findall('.//w:t', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
+    # every link in the cell (URL, text shown in Word), whether or not the parser ends up using it; see check_hyperlink_ledger()
+    ledger = []
 
-        # Concatenate text from all <w:t> elements and clean it
-        paragraph_text = ''.join([t.text.strip().replace(' ', '').replace('(', '').replace(')', '').replace('\u200b', '').replace("\u2009", "").replace("’", "'").lower() for t in text_elements if t.text])
+    for p_idx, paragraph in enumerate(cell_xml.iterfind('.//w:p', NAMESPACES)):
 
-        # Check for preceding target text if needed
-        if preceding_target_text and not preceding_text_found:
-            if preceding_target_text == paragraph_text:
-                preceding_text_found = True
+        # Concatenate text from all <w:t> elements; remember where each paragraph's text first shows up so we can honor 'preceding' text
+        raw_paragraph_text = ''.join([t.text.strip() for t in paragraph.iterfind('.//w:t', NAMESPACES) if t.text])
+        paragraph_text = normalize_link_text(raw_paragraph_text)
+        paragraphs.setdefault(paragraph_text, p_idx)
 
-        # If preceding text was found (or not required), check for target text
-        if preceding_text_found or preceding_target_text is None:
-            # Find all <w:hyperlink> elements in the paragraph
-            hyperlinks = paragraph.findall('.//w:hyperlink', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
+        # the paragraph's first HYPERLINK field (if any) goes in the ledger alongside the paragraph's text
+        instr_text = paragraph.find('.//w:instrText', NAMESPACES)
+        if instr_text is not None and instr_text.text and 'HYPERLINK' in instr_text.text:
+            field_url = parse_field_url(instr_text.text)
+            if field_url:
+                ledger.append((field_url, raw_paragraph_text))
 
-            for hyperlink in hyperlinks:
-                # Extract all <w:t> elements in the hyperlink
-                link_text_elements = hyperlink.findall('.//w:t', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
-                full_text = ''.join([t.text.strip().replace(' ', '').replace('\u200b', '').replace("\u2009", "").replace("’", "'").replace('(', '').replace(')', '').lower() for t in link_text_elements if t.text])
+        for hyperlink in paragraph.iterfind('.//w:hyperlink', NAMESPACES):
+            r_id = hyperlink.get(f"{{{R_NS}}}id")
+            if not r_id or r_id not in rels:
+                continue
 
-                # Match the full hyperlink text with target_text
-                if target_text == full_text:
-                    # Extract rID from hyperlink
-                    r_id = hyperlink.get("{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id")
-                    anchor = hyperlink.get("{http://schemas.openxmlformats.org/wordprocessingml/2006/main}anchor")
+            # Build the full URL
+            full_target = rels[r_id]
+            anchor = hyperlink.get(f"{{{W_NS}}}anchor")
+            if anchor:
+                full_target += f"#{anchor}"  # Append anchor if present
 
-                    if r_id:
-                        rel = cell.part.rels.get(r_id)
-                        if rel:
-                            # Build the full URL
-                            full_target = rel._target
-                            if anchor:
-                                full_target += f"#{anchor}"  # Append anchor if present
+            text_elements = [t.text for t in hyperlink.iterfind('.//w:t', NAMESPACES) if t.text]
+            full_text = normalize_link_text(''.join([text.strip() for text in text_elements]))
+            anchors.setdefault(full_text, []).append((p_idx, full_target))
 
-                            return full_target
+            # links without any visible text can't be placed in the XML, so there's no point reporting them
+            if text_elements:
+                ledger.append((full_target, ''.join(text_elements)))
 
     # OPTION 2: LINKS ARE STORED IN <w:instrText> TAGS, NESTED INSIDE <p> tags alongside text
+    fields = {}
+    field_paragraphs = []
+
+    for paragraph in cell_xml.iterfind('w:p', NAMESPACES):
+        paragraph_text = []
+        paragraph_url = None
+        field_url = None
+        field_text = None
+
+        for run in paragraph.iterfind('w:r', NAMESPACES):
+            run_text = ''.join(t.text for t in run.iterfind('w:t', NAMESPACES) if t.text)
+            paragraph_text.append(run_text.strip().lower())
+
+            # the field's display text sits between its 'separate' and 'end' markers
+            if field_text is not None:
+                field_text.append(run_text)
+
+            for element in run:
+                if element.tag == f"{{{W_NS}}}instrText" and element.text and 'HYPERLINK' in element.text:
+                    field_url = parse_field_url(element.text)
+                    if paragraph_url is None:
+                        paragraph_url = field_url
+                elif element.tag == f"{{{W_NS}}}fldChar":
+                    field_type = element.get(f"{{{W_NS}}}fldCharType")
+                    if field_type == 'separate' and field_url:
+                        field_text = []
+                    elif field_type == 'end' and field_text is not None:
+                        fields.setdefault(normalize_link_text(''.join(field_text)), field_url)
+                        field_text = None
+                        field_url = None
+
+        # the first HYPERLINK field in a paragraph is used for any target text found in that paragraph
+        if paragraph_url:
+            field_paragraphs.append((''.join(paragraph_text).replace(' ', '').replace('’', "'"), paragraph_url))
+
+    return LinkIndex(anchors, paragraphs, fields, tuple(field_paragraphs), tuple(ledger))
 
-    # Loop through <w:p> tags; check if the paragraph contains the target text in any <w:t> tag
-    for para in cell.paragraphs:
-        paragraph_text = "".join(run.text.strip().lower() for run in para.runs).replace(' ', '')
-
-        # If we find the paragraph containing our target text, look for <w:instrText>
-        if target_text in paragraph_text.replace('’', "'"):
-            for run in para.runs:
-                for element in run._element:
-                    # Check if the element is <w:instrText>
-                    if element.tag.endswith('instrText') and 'HYPERLINK' in element.text:
-                        # Extract the URL between the first pair of quotes
-                        parts = element.text.split('"')
-                        if len(parts) > 1:
-                            hyperlink_url = parts[1]
-                            
-                            # Check for the presence of the \l switch and append as an anchor
-                            if "\\l" in element.text:
-                                # Find the text following \l
-                                l_index = element.text.index("\\l") + 2
-                                anchor_text = element.text[l_index:].strip()
-                                if anchor_text.startswith('"') and anchor_text.endswith('"'):
-                                    anchor_text = anchor_text[1:-1]  # Remove surrounding quotes
-                                hyperlink_url += f"#{anchor_text}"
-
-                        return hyperlink_url    
+def find_source_link(cell, target_text, preceding_target_text=None):
+    # every link in the cell was indexed when the table snapshot was built
+    links = cell.links
+    COUNTERS['find_source_link_calls'] += 1
+
+    # Prep target text for searching
+    orig_text = target_text
+    target_text = normalize_link_text(target_text)
+
+    # if preceding target text was provided, only consider links at or after the paragraph that matches it
+    start_idx = 0
+    if preceding_target_text is not None:
+        start_idx = links.paragraphs.get(normalize_link_text(preceding_target_text))
+
+    if start_idx is not None:
+        for p_idx, full_target in links.anchors.get(target_text, ()):
+            if p_idx >= start_idx:
+                return full_target
+
+    # OPTION 2: links stored as HYPERLINK fields; the field's display text normally matches our target exactly
+    if target_text in links.fields:
+        return links.fields[target_text]
+
+    # otherwise fall back to any paragraph with a HYPERLINK field that contains our target text
+    for paragraph_text, hyperlink_url in links.field_paragraphs:
+        if target_text in paragraph_text:
+            return hyperlink_url
 
     # If no matching hyperlink was found, return empty string (no None so that we avoid string processing issues downstream)
     print(f"\n\nWARNING: Word doc does not appear to include a hyperlink for this string: {orig_text}")
-    try:
-        print(f'\tTRIED: {full_text}')
-    except UnboundLocalError:
-        pass
-    try:
-        print(f'\tTRIED: {paragraph_text}')
-    except UnboundLocalError:
-        pass
+    print(f'\tTRIED: {target_text}')
     
     return None
 
-def find_closest_match(user_term, vocabulary, threshold=90):
+def ledger_url_key(url):
+
+    # Word and our XML don't always agree on case or percent-encoding; compare URLs with both smoothed out.
+    # (Looser than acf_link_cache.canonical_url, which is what link check results are keyed on)
+    return urllib.parse.unquote(url.strip()).lower()
+
+def new_link_ledger():
 
-    match, score = process.extractOne(user_term, vocabulary)
-    return match if score >= threshold else None
+    # 'docx': every link in the tables we parse ({URL: [text shown in Word]}); 'sources': every <source> URL we write, as written;
+    # 'emitted': the same URLs as ledger_url_key()s, to match against Word's
+    return {"docx": {}, "sources": set(), "emitted": set()}
 
-def write_error(details, error_msg):
-    # set up the audit log where we will record error
+def ledger_add_row(ledger, row):
+
+    # merged cells appear once per grid column, so only record each cell once
+    seen_cells = set()
+    for cell in row:
+        if cell.element in seen_cells:
+            continue
+        seen_cells.add(cell.element)
 
-    with open(details['tmp_audit_log'], 'a', encoding='utf-8') as fo:
-        fo.write(f"{error_msg}\n") 
+        for url, text in cell.links.ledger:
+            ledger['docx'].setdefault(url, []).append(text)
+
+def ledger_add_sources(ledger, record):
+
+    # walk a title or article record and pick up every 'source' value, however deeply nested
+    if isinstance(record, dict):
+        for key, value in record.items():
+            if key == 'source' and isinstance(value, str) and value.strip():
+                ledger['sources'].add(value.strip())
+                ledger['emitted'].add(ledger_url_key(value))
+            else:
+                ledger_add_sources(ledger, value)
+    elif isinstance(record, (list, tuple)):
+        for value in record:
+            ledger_add_sources(ledger, value)
+
+def write_error(details, current_position, kind, cv_used, term, correction=None):
+
+    # build the entry (and the line it will become in the audit log)
+    message = AUDIT_MESSAGES[kind].format(term=term, correction=correction, vocabulary=cv_used.capitalize())
+    add_audit_entry(details, AuditEntry(current_position, AUDIT_SEVERITY[kind], kind, cv_used, term, correction, f"{current_position} - {message}"))
+
+def add_audit_entry(details, entry):
+
+    # entries are held in memory and written out once, at the end of the run (see write_audit_log)
+    details.setdefault('audit', []).append(entry)
+
+    # if we're parsing a row that will be cached, keep a copy of the entry as well; stored as a plain tuple so the cache doesn't depend on how this script was imported
+    if details.get('row_errors') is not None:
+        details['row_errors'].append(tuple(entry))
+
+def write_audit_log(details):
+
+    entries = details.get('audit', [])
+    if not entries:
+        return
+
+    # group entries by where they were found; errors come before warnings at the same position
+    entries = sorted(entries, key=lambda entry: (entry.position, SEVERITY_ORDER[entry.severity], entry.message))
+
+    # the usual text log (one entry per line, separated by blank lines) for people...
+    with open(details['audit_log'], 'w', encoding='utf-8') as fo:
+        for entry in entries:
+            fo.write(f"{entry.message}\n\n")
+
+    # ...and the same entries, one JSON object per line, for anything else
+    with open(details['audit_jsonl'], 'w', encoding='utf-8') as fo:
+        for entry in entries:
+            fo.write(f"{json.dumps(entry._asdict(), ensure_ascii=False)}\n")
 
 def prep_cell_text(raw_txt):
 
@@ -138,54 +291,28 @@ def prep_cell_text(raw_txt):
     return final_txt
 
 def check_controlled_vocabs(cv_list, cv_used, details, current_position):
-
-    # controlled vocabs
-    cvs = {
-        "offices": [
-            "Administration on Children, Youth, and Families (ACYF)",
-            "Children's Bureau (CB)",
-            "Family and Youth Services Bureau (FYSB)",
-            "Office of Child Support Enforcement (OCSE)",
-            "Office of Family Assistance (OFA)",
-            "Office of Head Start (OHS)",
-            "Office of Planning, Research, and Evaluation (OPRE)",
-            "Office of Child Care (OCC)",
-            "Office of Community Services (OCS)",
-            "Office of Early Childhood Development (ECD)",
-            "Office on Trafficking in Persons (OTIP)",
-            "Administration for Native Americans (ANA)",
-            "Office of Refugee Resettlement (ORR)",
-            "N/A"
-        ],
-        "domains": [
-            "Public Records",
-            "Medical Assistance",
-            "Public Assistance",
-            "Child Welfare Services"
-        ],
-        "federal": ["21st Century Cures Act", "Adam Walsh", "BJS", "CAPEA", "CAPTA", "CCDBG", "CSBG", "EETC", "Evidence Act/CIPSEA", "FCIA", "FERPA", "FISMA", "FVPSA", "Head Start Act", "HIPAA/HITECH", "ICWA", "IDEA", "IRS", "LIHEAP", "Medicare Act/CMS", "MVHAA", "NCHS", "NAPA", "OASDI", "Privacy Act", "Refugee Education Assistance Act", "RHYA", "SAMHSA/SAPT", "Section 1137 of the SSA", "SNAP/2018 Farm Bill", "SSA Title IV-A", "SSA Title IV-B", "SSA Title IV-D", "SSA Title IV-E", "SSA Title XIX", "SSBG", "TVPA", "UIFSA", "US Repatriation Program", "N/A"],
-        "terms": ["Abuse and Neglect", "Adoption and Foster Care", "Background Checks", "Biometric Information", "Breach Response", "Child Care", "Child Support", "Children and Youth Services", "Confidentiality", "Criminal Justice/Courts", "Cross-jurisdictional", "Data Collection", "Data Recipient Requirements", "Data Retention", "Databases", "Disability", "Domestic Violence", "Early Childhood", "Economic Security and Mobility", "Education – Higher Ed", "Education – K-12", "Education – Pre-K", "Family Services", "Genetic Information", "Grants & Funding", "Health Care", "How the Law Relates to Other Laws", "Human Trafficking", "Immigration & Refugee Services", "Income Verification", "Individual Subject Rights", "Information Security", "Information Technology Systems", "Medicaid/Medicare", "Mental Health", "Military", "Minorities", "Missing and Unidentified Persons", "Non-Compliance and Consequences for Misuse", "Nutrition Assistance", "Parents", "Preservation of Culture", "Program Eligibility", "Runaway and Homeless Youth", "Substance Abuse", "Taxpayer Information", "Tribal/Native American", "Use and Sharing – Programmatic", "Use and Sharing – Research"]
-    }
     
     # first, make sure no duplicates are included
     no_duplicates = []
     duplicates = []
+    seen = set()
 
     for term in cv_list:
-        if term in no_duplicates:
+        if term in seen:
             duplicates.append(term)
         else:
+            seen.add(term)
             no_duplicates.append(term)
 
     # log duplicate entry error(s) and use 'no duplicate list'
     if duplicates:
         for dup in duplicates:
-            write_error(details, f"{current_position} - Duplicate values: '{dup}' (from {cv_used.capitalize()} vocabulary) included multiple times.")
+            write_error(details, current_position, "duplicate", cv_used, dup)
         cv_list = no_duplicates
     
     # now review instances where a provided term is not found in our vocabs
     # first, ID the index of any term that is not included
-    problems = [ term for term in cv_list if term not in cvs[cv_used] ]
+    problems = [ term for term in cv_list if term not in acf_vocabs.VOCAB_SETS[cv_used] ]
 
     # if we do have any problematic terms, we'll use fuzzywuzzy (via our find_closest_match function) to identify the closest match, if possible
     if problems:
@@ -198,18 +325,18 @@ def check_controlled_vocabs(cv_list, cv_used, details, current_position):
             # get the term's index
             idx = cv_list.index(term)
             
-            # use a regex to find the closest match to our term
-            closest_match = find_closest_match(term, cvs[cv_used])
+            # use fuzzy matching (against a short list of likely candidates) to find the closest match to our term
+            closest_match = acf_vocabs.find_closest_match(term, cv_used)
             
             # if a term is proposed, log our correction and then replace the problematic one with the proposed term
             if closest_match is not None:
-                write_error(details, f"{current_position} - Incorrect term: MS Word included '{term}'; replaced with '{closest_match}' (from {cv_used.capitalize()} vocabulary).")
+                write_error(details, current_position, "incorrect", cv_used, term, closest_match)
                 cv_list[idx] = closest_match
                 continue
 
             # If we have no match, do not include term in XML; log error instead.
             else:
-                write_error(details, f"{current_position} - Unidentified term: MS Word included '{term}', which does not exist in the {cv_used.capitalize()} vocabulary). Revise Word doc and re-run XML generation, if needed.")
+                write_error(details, current_position, "unidentified", cv_used, term)
                 cv_list.pop(idx)
                 print(f"\n\nWARNING: {term} will not be included in XML, as it is not part of the {cv_used.capitalize()} vocabulary. See {current_position} to determine if .docx should be corrected.")
 
@@ -217,7 +344,7 @@ def check_controlled_vocabs(cv_list, cv_used, details, current_position):
     if 'terms' in cv_used:
         if ('Child Support' in cv_list) and ('Economic Security and Mobility' not in cv_list):
             cv_list.append('Economic Security and Mobility')
-            write_error(details, f"{current_position} - Missing term: when 'Child Support' is used, 'Economic Security and Mobility' must also be included.")
+            write_error(details, current_position, "missing", cv_used, 'Child Support', 'Economic Security and Mobility')
 
     return cv_list
 
@@ -383,340 +510,712 @@ def match_dash(text_string):
 
     return None
 
-def parse_tables(doc, details, record_data, object_type):
+def cell_digest(cell_xml, rels):
+
+    # fingerprint of the cell's XML; hyperlinks only hold a relationship ID, so include the URLs they point to as well
+    digest = hashlib.sha1(etree.tostring(cell_xml))
+    for element in cell_xml.iter(f"{{{W_NS}}}hyperlink"):
+        digest.update(rels.get(element.get(f"{{{R_NS}}}id"), '').encode('utf-8'))
+
+    return digest.hexdigest()
+
+def snapshot_tables(doc):
+
+    # python-docx rebuilds each row's cell grid (and every cell's text) whenever row.cells / cell.text are accessed.
+    # Walk the document once and keep an immutable copy of everything the parser needs: the cell text, its prepped lines, the cell XML and its hyperlinks
+    rels = {r_id: rel.target_ref for r_id, rel in doc.part.rels.items() if rel.is_external}
+
+    tables = []
+
+    for table in doc.tables:
+
+        # merged cells show up once per grid column; only build each underlying <w:tc> once
+        seen_cells = {}
+        rows = []
 
-    # Loop through each table in the document
-    for i, table in enumerate(doc.tables):
+        for row in table.rows:
+            row_cells = []
+            for cell in row.cells:
+                snapshot = seen_cells.get(cell._element)
+                if snapshot is None:
+                    snapshot = snapshot_cell(cell._element, cell.text, rels)
+                    seen_cells[cell._element] = snapshot
+                row_cells.append(snapshot)
+            rows.append(tuple(row_cells))
+
+        tables.append(tuple(rows))
+
+    return tuple(tables)
+
+def stream_tables(docx_path):
+
+    import acf_docx_stream
+
+    # same tables as snapshot_tables(), but read straight out of the DOCX one table at a time, without building python-docx's object model.
+    # Each table's XML is released once we move on to the next one, so memory stays flat however large the document is
+    for table, rels in acf_docx_stream.iter_tables(docx_path):
+        seen_cells = {}
+        rows = []
+
+        for row in table:
+            row_cells = []
+            for cell in row:
+                snapshot = seen_cells.get(cell.element)
+                if snapshot is None:
+                    snapshot = snapshot_cell(cell.element, cell.text, rels)
+                    seen_cells[cell.element] = snapshot
+                row_cells.append(snapshot)
+            rows.append(tuple(row_cells))
+
+        yield tuple(rows)
+
+def snapshot_cell(cell_xml, text, rels):
+    return CellSnapshot(text, tuple(prep_cell_text(text)), cell_xml, index_cell_links(cell_xml, rels), cell_digest(cell_xml, rels))
+
+def parse_title_row(row, details):
+
+    #some rows will actually have more than 3 cells: need to verify where indexes will start
+    if len(row) > 3:
+        title_idx = return_index(row, details['titleName'])
+        office_idx = return_index(row, 'ACF Offices Associated')              
+    else:
+        title_idx = 1
+        office_idx = 2 
+
+    # get the text in the adjacent cell; split lines and loop through text, checking for regex match. NOTE: simple string matching might also work...
+    cell_text = list(row[title_idx].lines)
+    title_dict = parse_to_dict(cell_text, row[title_idx], details['titleName'])
+
+    # Assign our dict values
+    if title_dict is not None:
+        current_title_key = title_dict['title_key']
+        title_record = {
+            "name": title_dict['name'],
+            "number": title_dict['number'],
+            "source": title_dict['source']
+        }
+            
+        #set 'current position' so we can track any errors
+        current_position = title_dict['current_position']
+    
+        #if record uses 'categories', get info:
+        if details["category"]:
+            # category always occurs before the title; if the title is at index 0, something is fishy...
+            if title_dict['start_idx'] == 0:
+                print('\n\nWARNING: config indicates that "Categories" are used, but none found in title cell!!')
+            else:
+                category_name = cell_text[title_dict['start_idx']-1].strip()
+                if 'Part' in category_name:
+                    source_text = category_name.split(': ', 1)[1]
+                else:
+                    source_text = category_name
+                
+                category_source = find_source_link(row[title_idx], source_text)
+            
+                #update 'current position'
+                current_position = f"{category_name} - {current_position}"
+
+                # Assign our dict values
+                title_record['category'] = {
+                    "name": category_name
+                }
+
+                if category_source is not None:
+                    title_record['category']['source'] = category_source
+
+        # 'ACF Offices Associated' should be in the cell immediately next to the titleName; get offices and add to dict
+        if office_idx is not None:
+            office_txt = prep_cell_text(row[office_idx].text.replace('ACF Offices Associated', ''))
+            
+            # check term list for errors, then add to our dictionary
+            title_record['officesAssociated'] = check_controlled_vocabs(office_txt, "offices", details, current_position)
+
+        return current_title_key, title_record
+
+    return None
+
+def parse_article_row(row, details, record_data, context):
+
+    # set variables
+    overview_cell = row[0]
+
+    #be ready for 'titleContent' scenario
+    found_titleContent = False
+
+    # prepare our text
+    article_overview = list(overview_cell.lines)
+
+    # determine which title we are working with
+    title_dict = parse_to_dict(article_overview, overview_cell, details['titleName'])
+
+    # NOTE: if a title can't be found in this cell, we keep using the title from the previous article row
+    if title_dict is not None:
+        context['current_title'] = title_dict['current_position']
+        context['current_title_key'] = title_dict['title_key']
+        context['title_end_idx'] = title_dict['end_idx']
+
+    current_title = context.get('current_title')
+    current_title_key = context.get('current_title_key')
+    title_end_idx = context.get('title_end_idx')
+
+    # an article can show up before its title row has been read (e.g., the title is in a later table), and so can the rows after it
+    # that rely on its title; tell the caller to come back to it
+    if current_title_key not in record_data:
+        return None
+
+    #set current position; will need to see if we have a category
+    try:
+        if record_data[current_title_key].get('category'):
+            current_position = f"{record_data[current_title_key]['category']['name']} - {current_title}"
+        else:
+            current_position = current_title
+    except: 
+        print('\n\nWARNING: may have a problem with "current_title_key" variable--check for any variation in Title name:\n\n', article_overview)
+        sys.exit(1)
+
+    # get article info
+    if details['articleName']:
+        temp_article_dict = parse_to_dict(article_overview, overview_cell, details['articleName'])
+    else:
+        temp_article_dict = None
+
+    # Provide warning if we didn't get an article; continue on to next item
+    if temp_article_dict is None:
+        if not details.get('titleContent', False):
+            print(f"\n\nWARNING: failed to ID article; review cell contents:\n\n\t{'\n\t'.join(article_overview)}")
+            return current_title_key, None
+        # if we anticipate 'titleContent', assume we have found it!
+        else: 
+            found_titleContent = True
+            temp_article_dict = title_dict
+            temp_article_dict['found_titleContent'] = True
+
+    # now that we have our temp_article_dict, get the domain and check for any errors; the domain name should always be at index [1]
+    article_domain = check_controlled_vocabs([article_overview[1]], "domains", details, current_position)
+    if not article_domain:
+        print(f'\n\nWARNING: incorrect domain; review cell contents: {article_overview[0:2]}')
+    else:
+        temp_article_dict['domain'] = article_domain[0]
+
+    # if we expect to find subtitles, check to see if there is any text between the Title and the Article
+    if details['subtitleName']:
+        subtitle_slice = article_overview[title_end_idx+1:temp_article_dict['start_idx']]
+
+        # if there is actually text here, return subtitle info
+        if len(subtitle_slice) > 0:
+            temp_article_dict['subtitle'] = parse_to_dict(subtitle_slice, overview_cell, details['subtitleName'])
+
+            #now set current position
+            if temp_article_dict['subtitle']['current_position'] not in current_position:
+                current_position += f" - {temp_article_dict['subtitle']['current_position']} - {temp_article_dict['current_position']}"
+    else:
+        if temp_article_dict['current_position'] not in current_position:
+            current_position += f" - {temp_article_dict['current_position']}"
+
+    # get associated federal records; then check for errors
+    try:  
+       index_of_associated_records = [i for i, txt in enumerate(article_overview) if 'Associated Federal Records' in txt][0]
+    except IndexError:
+        print(f'\n\nWARNING: "Associated Federal Records" is missing at {current_position}. Check Word DOCX and retry.')
+        sys.exit(1)
+
+    temp_article_dict['associatedFederalRecords'] = check_controlled_vocabs(article_overview[index_of_associated_records + 1:], "federal", details, current_position)
+
+    # if we expect to find parts, check to see if there is any text between the Article and the Associated Federal Records
+    if details['partName']:
+        part_slice = article_overview[temp_article_dict["end_idx"]+1:index_of_associated_records]
+
+        # if there is actually text here, return part info
+        if len(part_slice) > 0:
+            temp_article_dict['part'] = parse_to_dict(part_slice, overview_cell, details['partName'])
+
+            #NOTE: we sometimes have issues with the parsing; exit if we have an error so that we can figure out the issue
+            try:
+                if temp_article_dict['part']['current_position'] not in current_position:
+                    current_position += f" - {temp_article_dict['part']['current_position']}"
+            except TypeError:
+                print(part_slice)
+                sys.exit(1)
+
+            # we will only have a sub-part if there is a part
+            if details['subPartName']:
+
+                part_end_idx = article_overview.index(temp_article_dict['part']['name']) + 1
+
+                #the subPart will occur between the Part and Associated Records
+                subPart_slice = article_overview[part_end_idx:index_of_associated_records]
+
+                if len(subPart_slice) > 0:
+                    temp_article_dict['part']['subPart'] = parse_to_dict(subPart_slice, overview_cell, details['subPartName'])
+
+                    if temp_article_dict['part']['subPart']['current_position'] not in current_position:
+                        current_position += f" - {temp_article_dict['part']['subPart']['current_position']}"
+
+    # now move to the next column and get definitions and requirements. Note that some Word Docx files may have a varied # of cells per row. We need to test this... 
+    statute_cell_index = 1
+    while True:
+        if row[0].lines != row[statute_cell_index].lines:
+            break
+        else:
+            statute_cell_index += 1
+
+    statutes_cell = row[statute_cell_index]
+    statutes = list(statutes_cell.lines)
+            
+    #get indices for Definitions and Requirements
+    def_index = None
+    req_index = None
+
+    # set up lists to carry definition and requirement information
+    definitions = []
+    requirements = []
+
+    for index, item in enumerate(statutes):
+        if any(item.lower().startswith(phrase) for phrase in ['definitions related to', 'definitions for ']):
+            def_index = index
+            break
+
+    for index, item in enumerate(statutes):
+        if any(item.lower().startswith(phrase) for phrase in ['requirements related ', 'requirements for ', 'requirements regarding ', 'regulations regarding ']):
+            req_index = index
+            # NOTE: we need to edit Word doc to replace 'Regulations' with 'Requirements'; give a warning if so
+            if "Regulations" in statutes[index]:
+                print(f'\n\nWARNING: Found REGULATION at {current_position}')
+            break
+
+    # we may not have definitions; make sure we found them
+    if def_index is not None:
+        #establish the index to slice our list of strings
+        start_index = def_index+1
+
+        if req_index is None:
+            def_info = statutes[start_index:]
+        else:
+            def_info = statutes[start_index:req_index]
+
+        defn_pattern = rf"{details['statute_pattern']}"
+
+        # loop through any definitions
+        for defn in def_info:
+            
+            defn_match = re.search(defn_pattern, defn)
+            if defn_match:
+                state_code = defn_match.group(1)
+                terms = defn_match.group(2)
+            else:
+                dash = match_dash(defn)
+
+                try:
+                    state_code, terms = defn.split(dash, 1)
+                except UnboundLocalError:
+                    print(f'\n\nWARNING - unable to split this text: {defn}')
+                    sys.exit(1)
+
+            # add state code, source, and defined terms to a dictionary; append to our definitions
+            temp_defn_dict = { 
+                "state_code": state_code.strip(),
+                "source": find_source_link(statutes_cell, state_code),
+                "defined_terms": [t.strip() for t in terms.split(',')]
+            }
+
+            if temp_defn_dict['source'] is None:
+                print('\tDEFINITION:', defn)
+            definitions.append(temp_defn_dict)
+
+
+    # add definitions info to article dict; if none have been found, we just have an empty list
+    temp_article_dict['definitions'] = definitions
+
+    # Now, verify that we have requirements; if so, use index to pull out all requirement text
+    if req_index is not None:
+
+        # There may be an empty line between the 'Requirements' statement and the statutes. This code makes sure we are not including a blank line at the start
+        check_index = req_index+1
+        while True:
+            if len(statutes[check_index]) > 0:
+                break
+            else:
+                check_index += 1
+
+        # slice our original list to include all the statute information
+        req_info = statutes[check_index:]
+
+        # parse out requirements and add to temp dict
+        requirements = parse_requirement_blocks(req_info, statutes_cell, requirements, details, current_position)
+        temp_article_dict['requirements'] = requirements
+
+    return current_title_key, temp_article_dict
+
+def row_cache_key(row, row_type, details):
+
+    # a row's parsed output depends on its XML (plus link targets), the config values used to read it and the vocabularies used to check it
+    key = hashlib.sha1(f"{PARSE_CACHE_VERSION}|{row_type}".encode('utf-8'))
+    key.update(json.dumps([details.get(field) for field in PARSE_CACHE_CONFIG_FIELDS], sort_keys=True).encode('utf-8'))
+    key.update(json.dumps(acf_vocabs.VOCAB_HASHES, sort_keys=True).encode('utf-8'))
+    for cell in row:
+        key.update(cell.digest.encode('utf-8'))
+
+    return key.hexdigest()
+
+def load_parse_cache(details):
+
+    if not details.get('use_cache', True) or not os.path.exists(details['parse_cache']):
+        return {}
+
+    try:
+        with open(details['parse_cache'], 'rb') as fi:
+            parse_cache = pickle.load(fi)
+    except Exception:
+        print(f"\n\nWARNING: unable to read {details['parse_cache']}; re-parsing every row.")
+        return {}
+
+    if not isinstance(parse_cache, dict):
+        return {}
+
+    return parse_cache
+
+def save_parse_cache(details, parse_cache):
+
+    if not details.get('use_cache', True):
+        return
+
+    # write to a temp file and swap it into place so an interrupted run can't leave a broken cache behind
+    tmp_file = f"{details['parse_cache']}.tmp"
+    with open(tmp_file, 'wb') as fo:
+        pickle.dump(parse_cache, fo, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, details['parse_cache'])
+
+def capture_row_errors(details, parse_function, *args):
+
+    # run one row's parser and keep a copy of every audit entry it logs, so a cached row can log them again later
+    details['row_errors'] = []
+    try:
+        result = parse_function(*args)
+        row_errors = details['row_errors']
+    finally:
+        details.pop('row_errors', None)
+
+    return result, row_errors
+
+def cached_title_row(row, details, old_cache, new_cache):
+
+    key = row_cache_key(row, "title", details)
+
+    cached = old_cache.get(key)
+    if cached is None:
+        result, row_errors = capture_row_errors(details, parse_title_row, row, details)
+        cached = {"result": copy.deepcopy(result), "errors": row_errors}
+    else:
+        COUNTERS['cached_rows'] += 1
+        for entry in cached['errors']:
+            add_audit_entry(details, AuditEntry(*entry))
+
+    new_cache[key] = cached
+
+    return copy.deepcopy(cached['result'])
+
+def cached_article_row(row, details, record_data, context, old_cache, new_cache):
+
+    key = row_cache_key(row, "article", details)
+
+    # a cached article is only good if it was read with the same title context (which may come from earlier rows) and the same title category
+    cached = old_cache.get(key)
+    if cached is not None:
+        title_key = cached['context_out'].get('current_title_key')
+        if not cached['own_title'] and cached['context_in'] != context:
+            cached = None
+        elif title_key not in record_data or record_data[title_key].get('category', {}).get('name') != cached['category']:
+            cached = None
+
+    if cached is None:
+        context_in = dict(context)
+        result, row_errors = capture_row_errors(details, parse_article_row, row, details, record_data, context)
+
+        # don't cache rows we have to come back to
+        if result is None:
+            return None
+
+        title_key = result[0]
+        cached = {
+            "result": copy.deepcopy(result),
+            "errors": row_errors,
+            "context_in": context_in,
+            "context_out": dict(context),
+            "own_title": any(line.lower().startswith(details['titleName'].lower()) for line in row[0].lines),
+            "category": record_data[title_key].get('category', {}).get('name')
+        }
+    else:
+        COUNTERS['cached_rows'] += 1
+        context.update(cached['context_out'])
+        for entry in cached['errors']:
+            add_audit_entry(details, AuditEntry(*entry))
+
+    new_cache[key] = cached
+
+    return copy.deepcopy(cached['result'])
+
+def parse_tables(tables, details, record_data, ledger=None):
+
+    # rows we've already parsed (keyed by their content); anything we use this run is carried into the new cache
+    old_cache = load_parse_cache(details)
+    new_cache = {}
+
+    # article rows that turn up before the row for their title, by title key; each is kept with the title context it was read with,
+    # and parsed again as soon as its title row turns up
+    deferred_rows = {}
+
+    # carries the most recent title between article rows
+    context = {}
+
+    # Loop through each table in the document; title and article rows are handled in the same pass
+    for table in tables:
 
         # skip any table with only 1 column in first row
-        if (len(table.rows[0].cells) == 1) or ("Table of Contents" in table.rows[0].cells[0].text) or ("Domain Color Coding" in table.rows[0].cells[0].text):
+        if (len(table[0]) == 1) or ("Table of Contents" in table[0][0].text) or ("Domain Color Coding" in table[0][0].text):
             continue
 
         # Loop through each row in the table
-        for row_idx, row in enumerate(table.rows):
+        for row in table:
+
+            # note every link Word has for this row so we can later confirm each one made it into the XML
+            if ledger is not None:
+                ledger_add_row(ledger, row)
+
+            # Check if the first cell of the row is empty; a title row should always be empty
+            if not row[0].text.strip():
+                COUNTERS['title_rows'] += 1
+                title = cached_title_row(row, details, old_cache, new_cache)
+                if title is not None:
+                    add_title(record_data, title)
+                    for deferred_row, deferred_context in deferred_rows.pop(title[0], []):
+                        add_article(record_data, cached_article_row(deferred_row, details, record_data, deferred_context, old_cache, new_cache))
+
+            # all rows with Article information should have Domain information at the very top of the first cell
+            elif 'Domain' in row[0].text:
+                COUNTERS['article_rows'] += 1
+                context_in = dict(context)
+                article = cached_article_row(row, details, record_data, context, old_cache, new_cache)
+                if article is None:
+                    COUNTERS['deferred_rows'] += 1
+                    deferred_rows.setdefault(context.get('current_title_key'), []).append((row, context_in))
+                else:
+                    add_article(record_data, article)
+
+    # anything still waiting never got its title row
+    for rows in deferred_rows.values():
+        print('\n\nWARNING: may have a problem with "current_title_key" variable--check for any variation in Title name:\n\n', list(rows[0][0][0].lines))
+        sys.exit(1)
 
-            # initial process for getting Title info
-            if object_type == "title":
+    save_parse_cache(details, new_cache)
 
-                # Check if the first cell of the row is empty; a title row should always be empty
-                initial_cell_text = row.cells[0].text.strip()
-                if not initial_cell_text:
+    # everything we'll write to the XML is in record_data now (parsed or cached); note the links it uses
+    if ledger is not None:
+        ledger_add_sources(ledger, record_data)
 
-                    #some rows will actually have more than 3 cells: need to verify where indexes will start
-                    if len(row.cells) > 3:
-                        title_idx = return_index(row.cells, details['titleName'])
-                        office_idx = return_index(row.cells, 'ACF Offices Associated')              
-                    else:
-                        title_idx = 1
-                        office_idx = 2 
-
-                    # get the text in the adjacent cell; split lines and loop through text, checking for regex match. NOTE: simple string matching might also work...
-                    cell_text = prep_cell_text(row.cells[title_idx].text)
-                    title_dict = parse_to_dict(cell_text, row.cells[title_idx], details['titleName'])
-
-                    # Assign our dict values
-                    if title_dict is not None:
-                        current_title_key = title_dict['title_key']
-                        record_data[current_title_key] = {
-                            "name": title_dict['name'],
-                            "number": title_dict['number'],
-                            "source": title_dict['source']
-                        }
-                            
-                        #set 'current position' so we can track any errors
-                        current_position = title_dict['current_position']
-                    
-                        #if record uses 'categories', get info:
-                        if details["category"]:
-                            # category always occurs before the title; if the title is at index 0, something is fishy...
-                            if title_dict['start_idx'] == 0:
-                                print('\n\nWARNING: config indicates that "Categories" are used, but none found in title cell!!')
-                            else:
-                                category_name = cell_text[title_dict['start_idx']-1].strip()
-                                if 'Part' in category_name:
-                                    source_text = category_name.split(': ', 1)[1]
-                                else:
-                                    source_text = category_name
-                                
-                                category_source = find_source_link(row.cells[title_idx], source_text)
-                            
-                                #update 'current position'
-                                current_position = f"{category_name} - {current_position}"
-
-                                # Assign our dict values
-                                record_data[current_title_key]['category'] = {
-                                    "name": category_name
-                                }
-
-                                if category_source is not None:
-                                    record_data[current_title_key]['category']['source'] = category_source
-
-                        # 'ACF Offices Associated' should be in the cell immediately next to the titleName; get offices and add to dict
-                        if office_idx is not None:
-                            office_txt = prep_cell_text(row.cells[office_idx].text.replace('ACF Offices Associated', ''))
-                            
-                            # check term list for errors, then add to our dictionary
-                            record_data[current_title_key]['officesAssociated'] = check_controlled_vocabs(office_txt, "offices", details, current_position)
-
-            # additional process to add Article info
-            elif object_type == "article":
-
-                # all rows with Article information should have Domain information at the very top of the first cell
-                if 'Domain' in row.cells[0].text:
-
-                    # set variables
-                    overview_cell = row.cells[0]
-
-                    #be ready for 'titleContent' scenario
-                    found_titleContent = False
-
-                    # prepare our text
-                    article_overview = prep_cell_text(overview_cell.text)
-
-                    # determine which title we are working with
-                    title_dict = parse_to_dict(article_overview, overview_cell, details['titleName'])
-
-                    if title_dict is not None:
-                        current_title = title_dict['current_position']
-                        current_title_key = title_dict['title_key']
-                        title_end_idx = title_dict['end_idx']
-
-                    #set current position; will need to see if we have a category
-                    try:
-                        if record_data[current_title_key].get('category'):
-                            current_position = f"{record_data[current_title_key]['category']['name']} - {current_title}"
-                        else:
-                            current_position = current_title
-                    except: 
-                        print('\n\nWARNING: may have a problem with "current_title_key" variable--check for any variation in Title name:\n\n', article_overview)
-                        sys.exit(1)
-
-                    # add 'articles' list to our dict if it's not already there
-                    record_data[current_title_key].setdefault('articles', [])
-
-                    # get article info
-                    if details['articleName']:
-                        temp_article_dict = parse_to_dict(article_overview, overview_cell, details['articleName'])
-                    else:
-                        temp_article_dict = None
-
-                    # Provide warning if we didn't get an article; continue on to next item
-                    if temp_article_dict is None:
-                        if not details.get('titleContent', False):
-                            print(f"\n\nWARNING: failed to ID article; review cell contents:\n\n\t{'\n\t'.join(article_overview)}")
-                            continue
-                        # if we anticipate 'titleContent', assume we have found it!
-                        else: 
-                            found_titleContent = True
-                            temp_article_dict = title_dict
-                            temp_article_dict['found_titleContent'] = True
-
-                    # now that we have our temp_article_dict, get the domain and check for any errors; the domain name should always be at index [1]
-                    article_domain = check_controlled_vocabs([article_overview[1]], "domains", details, current_position)
-                    if not article_domain:
-                        print(f'\n\nWARNING: incorrect domain; review cell contents: {article_overview[0:2]}')
-                    else:
-                        temp_article_dict['domain'] = article_domain[0]
+    return record_data
 
-                    # if we expect to find subtitles, check to see if there is any text between the Title and the Article
-                    if details['subtitleName']:
-                        subtitle_slice = article_overview[title_end_idx+1:temp_article_dict['start_idx']]
+def add_title(record_data, title):
 
-                        # if there is actually text here, return subtitle info
-                        if len(subtitle_slice) > 0:
-                            temp_article_dict['subtitle'] = parse_to_dict(subtitle_slice, overview_cell, details['subtitleName'])
+    # a title row can appear more than once (e.g., at the top of each of its tables); the last one wins, but the articles already read for the title are kept
+    title_key, title_record = title
+    if 'articles' in record_data.get(title_key, {}):
+        title_record['articles'] = record_data[title_key]['articles']
+    record_data[title_key] = title_record
 
-                            #now set current position
-                            if temp_article_dict['subtitle']['current_position'] not in current_position:
-                                current_position += f" - {temp_article_dict['subtitle']['current_position']} - {temp_article_dict['current_position']}"
-                    else:
-                        if temp_article_dict['current_position'] not in current_position:
-                            current_position += f" - {temp_article_dict['current_position']}"
-
-                    # get associated federal records; then check for errors
-                    try:  
-                       index_of_associated_records = [i for i, txt in enumerate(article_overview) if 'Associated Federal Records' in txt][0]
-                    except IndexError:
-                        print(f'\n\nWARNING: "Associated Federal Records" is missing at {current_position}. Check Word DOCX and retry.')
-                        sys.exit(1)
-
-                    temp_article_dict['associatedFederalRecords'] = check_controlled_vocabs(article_overview[index_of_associated_records + 1:], "federal", details, current_position)
-
-                    # if we expect to find parts, check to see if there is any text between the Article and the Associated Federal Records
-                    if details['partName']:
-                        part_slice = article_overview[temp_article_dict["end_idx"]+1:index_of_associated_records]
-
-                        # if there is actually text here, return part info
-                        if len(part_slice) > 0:
-                            temp_article_dict['part'] = parse_to_dict(part_slice, overview_cell, details['partName'])
-
-                            #NOTE: we sometimes have issues with the parsing; exit if we have an error so that we can figure out the issue
-                            try:
-                                if temp_article_dict['part']['current_position'] not in current_position:
-                                    current_position += f" - {temp_article_dict['part']['current_position']}"
-                            except TypeError:
-                                print(part_slice)
-                                sys.exit(1)
-
-                            # we will only have a sub-part if there is a part
-                            if details['subPartName']:
-
-                                part_end_idx = article_overview.index(temp_article_dict['part']['name']) + 1
-
-                                #the subPart will occur between the Part and Associated Records
-                                subPart_slice = article_overview[part_end_idx:index_of_associated_records]
-
-                                if len(subPart_slice) > 0:
-                                    temp_article_dict['part']['subPart'] = parse_to_dict(subPart_slice, overview_cell, details['subPartName'])
-
-                                    if temp_article_dict['part']['subPart']['current_position'] not in current_position:
-                                        current_position += f" - {temp_article_dict['part']['subPart']['current_position']}"
-
-                    # now move to the next column and get definitions and requirements. Note that some Word Docx files may have a varied # of cells per row. We need to test this... 
-                    statute_cell_index = 1
-                    while True:
-                        if prep_cell_text(row.cells[0].text) != prep_cell_text(row.cells[statute_cell_index].text):
-                            break
-                        else:
-                            statute_cell_index += 1
-
-                    statutes_cell = row.cells[statute_cell_index]
-                    statutes = prep_cell_text(statutes_cell.text)
-                            
-                    #get indices for Definitions and Requirements
-                    def_index = None
-                    req_index = None
-
-                    # set up lists to carry definition and requirement information
-                    definitions = []
-                    requirements = []
-
-                    for index, item in enumerate(statutes):
-                        if any(item.lower().startswith(phrase) for phrase in ['definitions related to', 'definitions for ']):
-                            def_index = index
-                            break
-
-                    for index, item in enumerate(statutes):
-                        if any(item.lower().startswith(phrase) for phrase in ['requirements related ', 'requirements for ', 'requirements regarding ', 'regulations regarding ']):
-                            req_index = index
-                            # NOTE: we need to edit Word doc to replace 'Regulations' with 'Requirements'; give a warning if so
-                            if "Regulations" in statutes[index]:
-                                print(f'\n\nWARNING: Found REGULATION at {current_position}')
-                            break
-
-                    # we may not have definitions; make sure we found them
-                    if def_index is not None:
-                        #establish the index to slice our list of strings
-                        start_index = def_index+1
-
-                        if req_index is None:
-                            def_info = statutes[start_index:]
-                        else:
-                            def_info = statutes[start_index:req_index]
-
-                        defn_pattern = rf"{details['statute_pattern']}"
-
-                        # loop through any definitions
-                        for defn in def_info:
-                            
-                            defn_match = re.search(defn_pattern, defn)
-                            if defn_match:
-                                state_code = defn_match.group(1)
-                                terms = defn_match.group(2)
-                            else:
-                                dash = match_dash(defn)
-
-                                try:
-                                    state_code, terms = defn.split(dash, 1)
-                                except UnboundLocalError:
-                                    print(f'\n\nWARNING - unable to split this text: {defn}')
-                                    sys.exit(1)
-
-                            # add state code, source, and defined terms to a dictionary; append to our definitions
-                            temp_defn_dict = { 
-                                "state_code": state_code.strip(),
-                                "source": find_source_link(statutes_cell, state_code),
-                                "defined_terms": [t.strip() for t in terms.split(',')]
-                            }
-
-                            if temp_defn_dict['source'] is None:
-                                print('\tDEFINITION:', defn)
-                            definitions.append(temp_defn_dict)
-
-
-                    # add definitions info to article dict; if none have been found, we just have an empty list
-                    temp_article_dict['definitions'] = definitions
-
-                    # Now, verify that we have requirements; if so, use index to pull out all requirement text
-                    if req_index is not None:
-
-                        # There may be an empty line between the 'Requirements' statement and the statutes. This code makes sure we are not including a blank line at the start
-                        check_index = req_index+1
-                        while True:
-                            if len(statutes[check_index]) > 0:
-                                break
-                            else:
-                                check_index += 1
-
-                        # slice our original list to include all the statute information
-                        req_info = statutes[check_index:]
-
-                        # parse out requirements and add to temp dict
-                        requirements = parse_requirement_blocks(req_info, statutes_cell, requirements, details, current_position)
-                        temp_article_dict['requirements'] = requirements
-
-                    if temp_article_dict not in record_data[current_title_key]['articles']:
-                        record_data[current_title_key]['articles'].append(temp_article_dict)
-
-    return record_data[current_title_key]
-
-def validate_xml(xml_file, xsd_file):
-    # Parse the XML file
-    with open(xml_file, 'r') as xml:
-        xml_doc = etree.parse(xml)
-
-    # Parse the XSD file
-    with open(xsd_file, 'r') as xsd:
-        xsd_doc = etree.parse(xsd)
-
-    # Create an XMLSchema object
-    xml_schema = etree.XMLSchema(xsd_doc)
-
-    # Validate the XML file against the schema
-    is_valid = xml_schema.validate(xml_doc)
-
-    if not is_valid:
-        print("\n\nXML is not valid. Errors:")
-        # read in xml to be able to print specific lines
-        with open(xml_file, 'r', encoding='utf-8') as file:
-            xml_lines = file.readlines()
-
-        #collect all our errors
-        xml_errors = []
-        for error in xml_schema.error_log:
-            print(f'\n\n - Line:', error.line)
-            print(f' - Message:', error.message)
+def add_article(record_data, article):
 
-def write_xml(details, record_data):
-    # Declare the namespace URI
-    namespace = {'xsi': 'http://www.w3.org/2001/XMLSchema-instance'}
-    
-    # Create the root element <records>
-    root = etree.Element("record", nsmap=namespace)
+    title_key, article_dict = article
 
-    # Add the xsi:noNamespaceSchemaLocation attribute
-    root.set("{http://www.w3.org/2001/XMLSchema-instance}noNamespaceSchemaLocation", "../schema_final.xsd")
+    # add 'articles' list to our dict if it's not already there
+    record_data[title_key].setdefault('articles', [])
+
+    if article_dict is not None and article_dict not in record_data[title_key]['articles']:
+        record_data[title_key]['articles'].append(article_dict)
+
+def get_xml_schema(xsd_file):
+
+    # compiling the XSD is expensive; do it once per process (and again only if the file changes)
+    cache_key = (os.path.abspath(xsd_file), os.path.getmtime(xsd_file))
+    if cache_key not in XML_SCHEMAS:
+        XML_SCHEMAS[cache_key] = etree.XMLSchema(etree.parse(xsd_file))
+
+    return XML_SCHEMAS[cache_key]
+
+def validate_xml(xml_doc, xsd_file, xml_file=None):
+
+    # we usually validate the tree write_xml() just built; a path to an XML file works too
+    if isinstance(xml_doc, (str, os.PathLike)):
+        xml_file = xml_doc
+        xml_doc = etree.parse(xml_file)
+
+    xml_schema = get_xml_schema(xsd_file)
+
+    # Validate the XML against the schema; return a (possibly empty) list of errors
+    if xml_schema.validate(xml_doc):
+        return []
+
+    # elements built in memory don't have line numbers; if we have the file on disk, check it again so we can report them
+    if xml_file is not None and xml_doc.getroot().sourceline is None:
+        xml_schema.validate(etree.parse(xml_file))
+
+    #collect all our errors
+    return [{"line": error.line, "path": error.path, "message": error.message} for error in xml_schema.error_log]
+
+def header_elements(details):
 
     #set up top-level elements
-    etree.SubElement(root, "state").text = details.get('state', '')
-    etree.SubElement(root, "articleName").text = details.get('articleName', '')
-    etree.SubElement(root, "titleName").text = details.get('titleName', '')
+    elements = []
+
+    for name, value in [("state", details.get('state', '')), ("articleName", details.get('articleName', '')), ("titleName", details.get('titleName', ''))]:
+        elements.append(etree.Element(name))
+        elements[-1].text = value
+
     if details.get('partName', []):
-        etree.SubElement(root, "partName").text = details['partName'][0]
+        elements.append(etree.Element("partName"))
+        elements[-1].text = details['partName'][0]
     if details.get('subPartName'):
-        etree.SubElement(root, "subPartName").text = details.get('subPartName', '')
+        elements.append(etree.Element("subPartName"))
+        elements[-1].text = details.get('subPartName', '')
     if details.get('subtitleName'):
-        etree.SubElement(root, "subtitleName").text = details.get('subtitleName', '')
+        elements.append(etree.Element("subtitleName"))
+        elements[-1].text = details.get('subtitleName', '')
+
+    return elements
+
+def category_elements(category):
+
+    # the name/source children of a <category> element
+    name_elem = etree.Element("name")
+    name_elem.text = category.get('name', '')
+    elements = [name_elem]
+
+    if category.get('source'):
+        source_elem = etree.Element("source")
+        source_elem.text = category.get('source', '')
+        elements.append(source_elem)
+
+    return elements
+
+def title_elements(title_record):
+
+    # the number/name/source/officesAssociated children of a <title> element (articles are added separately)
+    elements = []
+
+    # Add main title elements
+    for name in ["number", "name", "source"]:
+        elements.append(etree.Element(name))
+        elements[-1].text = title_record.get(name, '')
+
+    # Add officesAssociated elements
+    offices_elem = etree.Element("officesAssociated")
+    for office in title_record.get("officesAssociated", []):
+        etree.SubElement(offices_elem, "office").text = office
+    elements.append(offices_elem)
+
+    return elements
+
+def article_element(article):
+
+    # check if this is a case with 'titleContent'; default is False
+    if article.get("found_titleContent", False):
+        article_elem = etree.Element("titleContent")
+        etree.SubElement(article_elem, "domain").text = article.get("domain", '')
+    
+    # if not, set up article and write domain
+    else:
+        article_elem = etree.Element("article")
+        etree.SubElement(article_elem, "domain").text = article.get("domain", '')
+
+    # add subtitle info, id present
+    if article.get("subtitle", {}):
+        subtitle_elem = etree.SubElement(article_elem, "subtitle")
+        etree.SubElement(subtitle_elem, "number").text = article['subtitle'].get("number", "")
+        etree.SubElement(subtitle_elem, "name").text = article['subtitle'].get("name", "")
+        etree.SubElement(subtitle_elem, "source").text = article['subtitle'].get("source", "")
+
+    # Write basic article info--only if this is NOT a 'titleContent scenario'
+    if not article.get("found_titleContent", False):
+        etree.SubElement(article_elem, "number").text = article.get("number", '')
+        etree.SubElement(article_elem, "name").text = article.get("name", '')
+        etree.SubElement(article_elem, "source").text = article.get("source", '')
+
+    # Add part info, if applicable
+    if article.get('part', {}):
+        part_elem = etree.SubElement(article_elem, "part")
+        etree.SubElement(part_elem, "number").text = article['part'].get("number", '')
+        etree.SubElement(part_elem, "name").text = article['part'].get("name", '')
+        etree.SubElement(part_elem, "source").text = article['part'].get("source", '')
+        
+        # determine if the part used an 'altName'
+        if article['part'].get('altName'):
+            etree.SubElement(part_elem, "altName").text = article['part'].get("altName", '')
+
+        # check to see if there is a subPart
+        if article['part'].get('subPart', {}):
+            subPart_elem = etree.SubElement(part_elem, "subPart")
+            etree.SubElement(subPart_elem, "number").text = article['part']['subPart'].get("number", '')
+            etree.SubElement(subPart_elem, "name").text = article['part']['subPart'].get("name", '')
+            etree.SubElement(subPart_elem, "source").text = article['part']['subPart'].get("source", '')
+
+    # Add associated federal records
+    fedrecords_elem = etree.SubElement(article_elem, "associatedFederalRecords")
+    for rec in article.get("associatedFederalRecords", []):
+        etree.SubElement(fedrecords_elem, "federal").text = rec
+
+    # Add definitions--only if we have at least one
+    if article.get("definitions", []):
+        def_elem = etree.SubElement(article_elem, "definitions")
+        for defn in article.get("definitions"):
+            def_statute_elem = etree.SubElement(def_elem, "statute")
+            etree.SubElement(def_statute_elem, "stateCode").text = defn.get("state_code", '')
+            etree.SubElement(def_statute_elem, "source").text = defn.get("source", '')
+            
+            def_terms_elem = etree.SubElement(def_statute_elem, "definedTerms")
+            for def_term in defn.get("defined_terms", []):
+                etree.SubElement(def_terms_elem, "definedTerm").text = def_term
+
+    # Add requirements
+    if article.get("requirements", []):
+        req_elem = etree.SubElement(article_elem, "requirements")
+        for req in article.get("requirements", []):
+            req_statute_elem = etree.SubElement(req_elem, "statute")
+            etree.SubElement(req_statute_elem, "label").text = req.get("label", '')
+            etree.SubElement(req_statute_elem, "description").text = req.get("description", '')
+            etree.SubElement(req_statute_elem, "stateCode").text = req.get("state_code", '')
+            etree.SubElement(req_statute_elem, "source").text = req.get("source")
+
+            # Add appliesTo entities
+            applies_elem = etree.SubElement(req_statute_elem, "appliesTo")
+            for ent in req.get("entities", ['']):
+                etree.SubElement(applies_elem, "entity").text = ent
+
+            # Add terms tags
+            terms_elem = etree.SubElement(req_statute_elem, "terms")
+            for tag in req.get("tags", []):
+                #watch out for lxml double-escaping ampersands...
+                etree.SubElement(terms_elem, "term").text = tag.replace('&amp;', '&')
+
+    return article_elem
+
+def output_file(details, extension):
+
+    # all output files are named <state>_<YYYYMMDD>.<extension>
+    return os.path.join(details["out_dir"], f"{details['state'].lower().replace(' ', '_')}_{datetime.now().strftime("%Y%m%d")}.{extension}")
+
+def write_xml(details, record_data):
+
+    # for very large states, write each title as soon as it's built rather than holding the whole tree in memory; there is no tree to hand back in that case
+    if details.get('stream_xml'):
+        return write_xml_stream(details, record_data), None
+
+    # Create the root element <records>
+    root = etree.Element("record", nsmap=XSI_NAMESPACE)
+
+    # Add the xsi:noNamespaceSchemaLocation attribute
+    root.set(f"{{{XSI_NAMESPACE['xsi']}}}noNamespaceSchemaLocation", "../schema_final.xsd")
+
+    #set up top-level elements
+    root.extend(header_elements(details))
 
     # set a dummy value to check current category
     current_category = 'none'
@@ -727,9 +1226,7 @@ def write_xml(details, record_data):
             # only add 'category' element if it's a new one. Compare value to 'current category'
             if record_data[title]['category'].get('name', '') not in current_category:
                 cat_elem = etree.SubElement(root, "category")
-                etree.SubElement(cat_elem, "name").text = record_data[title]['category'].get('name', '')
-                if record_data[title]['category'].get('source'):
-                    etree.SubElement(cat_elem, "source").text = record_data[title]['category'].get('source', '')
+                cat_elem.extend(category_elements(record_data[title]['category']))
 
                 #update 'current category'
                 current_category = record_data[title]['category']['name']
@@ -740,226 +1237,104 @@ def write_xml(details, record_data):
             title_elem = etree.SubElement(root, "title")
         
         # Add main title elements
-        etree.SubElement(title_elem, "number").text = record_data[title].get('number', '')
-        etree.SubElement(title_elem, "name").text = record_data[title].get('name', '') 
-        etree.SubElement(title_elem, "source").text = record_data[title].get('source', '')
-
-        # Add officesAssociated elements
-        offices_elem = etree.SubElement(title_elem, "officesAssociated")
-        for office in record_data[title].get("officesAssociated", []):
-            etree.SubElement(offices_elem, "office").text = office
+        title_elem.extend(title_elements(record_data[title]))
 
         # Loop through articles within each title
         for article in record_data[title].get("articles", []):
-
-            # check if this is a case with 'titleContent'; default is False
-            if article.get("found_titleContent", False):
-                article_elem = etree.SubElement(title_elem, "titleContent")
-                etree.SubElement(article_elem, "domain").text = article.get("domain", '')
-            
-            # if not, set up article and write domain
-            else:
-                article_elem = etree.SubElement(title_elem, "article")
-                etree.SubElement(article_elem, "domain").text = article.get("domain", '')
-
-            # add subtitle info, id present
-            if article.get("subtitle", {}):
-                subtitle_elem = etree.SubElement(article_elem, "subtitle")
-                etree.SubElement(subtitle_elem, "number").text = article['subtitle'].get("number", "")
-                etree.SubElement(subtitle_elem, "name").text = article['subtitle'].get("name", "")
-                etree.SubElement(subtitle_elem, "source").text = article['subtitle'].get("source", "")
-
-            # Write basic article info--only if this is NOT a 'titleContent scenario'
-            if not article.get("found_titleContent", False):
-                etree.SubElement(article_elem, "number").text = article.get("number", '')
-                etree.SubElement(article_elem, "name").text = article.get("name", '')
-                etree.SubElement(article_elem, "source").text = article.get("source", '')
-
-            # Add part info, if applicable
-            if article.get('part', {}):
-                part_elem = etree.SubElement(article_elem, "part")
-                etree.SubElement(part_elem, "number").text = article['part'].get("number", '')
-                etree.SubElement(part_elem, "name").text = article['part'].get("name", '')
-                etree.SubElement(part_elem, "source").text = article['part'].get("source", '')
-                
-                # determine if the part used an 'altName'
-                if article['part'].get('altName'):
-                    etree.SubElement(part_elem, "altName").text = article['part'].get("altName", '')
-
-                # check to see if there is a subPart
-                if article['part'].get('subPart', {}):
-                    subPart_elem = etree.SubElement(part_elem, "subPart")
-                    etree.SubElement(subPart_elem, "number").text = article['part']['subPart'].get("number", '')
-                    etree.SubElement(subPart_elem, "name").text = article['part']['subPart'].get("name", '')
-                    etree.SubElement(subPart_elem, "source").text = article['part']['subPart'].get("source", '')
-
-            # Add associated federal records
-            fedrecords_elem = etree.SubElement(article_elem, "associatedFederalRecords")
-            for rec in article.get("associatedFederalRecords", []):
-                etree.SubElement(fedrecords_elem, "federal").text = rec
-
-            # Add definitions--only if we have at least one
-            if article.get("definitions", []):
-                def_elem = etree.SubElement(article_elem, "definitions")
-                for defn in article.get("definitions"):
-                    def_statute_elem = etree.SubElement(def_elem, "statute")
-                    etree.SubElement(def_statute_elem, "stateCode").text = defn.get("state_code", '')
-                    etree.SubElement(def_statute_elem, "source").text = defn.get("source", '')
-                    
-                    def_terms_elem = etree.SubElement(def_statute_elem, "definedTerms")
-                    for def_term in defn.get("defined_terms", []):
-                        etree.SubElement(def_terms_elem, "definedTerm").text = def_term
-
-            # Add requirements
-            if article.get("requirements", []):
-                req_elem = etree.SubElement(article_elem, "requirements")
-                for req in article.get("requirements", []):
-                    req_statute_elem = etree.SubElement(req_elem, "statute")
-                    etree.SubElement(req_statute_elem, "label").text = req.get("label", '')
-                    etree.SubElement(req_statute_elem, "description").text = req.get("description", '')
-                    etree.SubElement(req_statute_elem, "stateCode").text = req.get("state_code", '')
-                    etree.SubElement(req_statute_elem, "source").text = req.get("source")
-
-                    # Add appliesTo entities
-                    applies_elem = etree.SubElement(req_statute_elem, "appliesTo")
-                    for ent in req.get("entities", ['']):
-                        etree.SubElement(applies_elem, "entity").text = ent
-
-                    # Add terms tags
-                    terms_elem = etree.SubElement(req_statute_elem, "terms")
-                    for tag in req.get("tags", []):
-                        #watch out for lxml double-escaping ampersands...
-                        etree.SubElement(terms_elem, "term").text = tag.replace('&amp;', '&')
+            title_elem.append(article_element(article))
 
     # Create the ElementTree object
     tree = etree.ElementTree(root)
 
     # Write the XML to a file
-    xml_file = os.path.join(details["out_dir"], f"{details['state'].lower().replace(' ', '_')}_{datetime.now().strftime("%Y%m%d")}.xml")
+    xml_file = output_file(details, "xml")
 
     with open(xml_file, "wb") as file:
         tree.write(file, pretty_print=True, xml_declaration=True, encoding="UTF-8")
 
-    return xml_file
+    return xml_file, tree
 
-def generate_html(xml_file, xsl_file):
+def write_indented(xf, element, level):
 
-    # Load the XML file
-    xml_tree = etree.parse(xml_file)
+    # match the layout of lxml's pretty_print, which xmlfile doesn't do for us
+    etree.indent(element, space=XML_INDENT, level=level)
+    xf.write(f"\n{XML_INDENT * level}")
+    xf.write(element)
 
-    # Load the XSL file
-    xsl_tree = etree.parse(xsl_file)
+def write_xml_stream(details, record_data):
 
-    # Create an XSLT transformer
-    transform = etree.XSLT(xsl_tree)
+    # NOTE: this empties record_data as it goes; each title (and its articles) is released as soon as it has been written
+    xml_file = output_file(details, "xml")
 
-    # Apply the transformation to the XML data
-    html_tree = transform(xml_tree)
+    with open(xml_file, "wb") as file:
+        with etree.xmlfile(file, encoding="UTF-8") as xf:
+            xf.write_declaration()
 
-    # Write the HTML to a file
-    html_file = os.path.join(details["out_dir"], f"{details['state'].lower().replace(' ', '_')}_{datetime.now().strftime("%Y%m%d")}.html")
-    html_tree.write(html_file, pretty_print=True, method="html")
+            with xf.element("record", {f"{{{XSI_NAMESPACE['xsi']}}}noNamespaceSchemaLocation": "../schema_final.xsd"}, nsmap=XSI_NAMESPACE):
 
-def check_all_hyperlinks_from_docx(doc, xml_file):
+                #set up top-level elements
+                for element in header_elements(details):
+                    write_indented(xf, element, 1)
 
-    # First, get all the URLs in our XML
-    tree = etree.parse(xml_file)
-    root = tree.getroot()
+                # a <category> stays open for as long as consecutive titles share it
+                category_context = contextlib.ExitStack()
+                current_category = None
 
-    # Extract all hyperlinks in <source> tags at various levels of hierarchy
-    xml_hyperlinks = set()
-    
-    # Find all <source> elements at different levels of the XML hierarchy
-    for source in root.xpath('.//source'):
-        if source.text:
-            xml_hyperlinks.add(source.text.strip().lower())
+                while record_data:
+                    title_key = next(iter(record_data))
+                    title_record = record_data.pop(title_key)
 
-    #Next, look through hyperlinks in MS docx and document which ones are not present
-    # Dictionary to store hyperlinks; each URL maps to a set of anchor texts
-    missing_docx_hyperlinks = {}
+                    # include 'category' info, if applicable
+                    category = title_record.get('category', {})
+                    if current_category is not None and not (category and category.get('name', '') in current_category):
+                        xf.write(f"\n{XML_INDENT}")
+                        category_context.close()
+                        current_category = None
 
-    # Iterate over every table in the document
-    for t_i, table in enumerate(doc.tables):
+                    if category and current_category is None:
+                        xf.write(f"\n{XML_INDENT}")
+                        category_context.enter_context(xf.element("category"))
+                        for element in category_elements(category):
+                            write_indented(xf, element, 2)
+                        current_category = category['name']
 
-         # skip any table with only 1 column in first row
-        if (len(table.rows[0].cells) == 1) or ("Table of Contents" in table.rows[0].cells[0].text):
-            continue
+                    # NOTE: if we have a category, then Title will be nested under it. Otherwise, Title will be a child of root
+                    level = 2 if current_category is not None else 1
 
-        for r_i, row in enumerate(table.rows):
+                    xf.write(f"\n{XML_INDENT * level}")
+                    with xf.element("title"):
+                        for element in title_elements(title_record):
+                            write_indented(xf, element, level + 1)
 
-            for c_i, cell in enumerate(row.cells):
-                # Access the XML structure of the cell
-                cell_xml = cell._element
-                
-                # Find all hyperlinks in the cell
-                hyperlinks = cell_xml.findall('.//w:hyperlink', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
-                
-                for hyperlink in hyperlinks:
-
-                    # Get the rID and anchor from the hyperlink
-                    r_id = hyperlink.get("{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id")
-                    anchor = hyperlink.get("{http://schemas.openxmlformats.org/wordprocessingml/2006/main}anchor")
-                    
-                    if r_id:
-                        rel = cell.part.rels.get(r_id)
-                        if rel:
-                            # Build the full URL, including the anchor if present
-                            full_target = rel.target_ref
-                            if anchor:
-                                full_target += f"#{anchor}"  # Append the anchor as a fragment
-
-                            # if we missed this hyperlink in our XML, get more info
-                            if full_target.lower() not in xml_hyperlinks:
-
-                                # see if it's URL-encoded; if it is in our list, continue, otherwise, document error
-                                if urllib.parse.unquote(full_target.lower()) in xml_hyperlinks:
-                                    continue
-                                if urllib.parse.quote(full_target.lower()) in xml_hyperlinks:
-                                    continue
-
-                                # Retrieve the text associated with the hyperlink
-                                text_elements = hyperlink.findall('.//w:t', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
-                                if len(text_elements) == 0:
-                                    continue
-                                
-                                # Combine text elements (handling irregular text breaks)
-                                full_text = ''.join([text.text for text in text_elements if text.text])
-
-                                #now save info 
-                                if not missing_docx_hyperlinks.get(full_target):
-                                    missing_docx_hyperlinks[full_target] = []
-                                missing_docx_hyperlinks[full_target].append(full_text)
-
-                # Check for HYPERLINK fields in <w:p> elements
-                paragraphs = cell_xml.findall('.//w:p', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
-                for paragraph in paragraphs:
-                    # Find the <w:instrText> element
-                    instr_text = paragraph.find('.//w:instrText', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
-
-                    if instr_text is not None and 'HYPERLINK' in instr_text.text:
-                        # Extract the hyperlink URL from the instrText
-                        parts = instr_text.text.split('"')
-                        if len(parts) > 1:
-                            hyperlink_url = parts[1].lower()
-
-                            if "\\l" in instr_text.text:
-                                # Find the text following \l
-                                l_index = instr_text.text.index("\\l") + 2
-                                anchor_text = instr_text.text[l_index:].strip()
-                                if anchor_text.startswith('"') and anchor_text.endswith('"'):
-                                    anchor_text = anchor_text[1:-1]  # Remove surrounding quotes
-                                hyperlink_url += f"#{anchor_text}".lower()
-
-                            if hyperlink_url.lower() not in xml_hyperlinks:
-
-                                # Extract all text in the same paragraph
-                                text_elements = paragraph.findall('.//w:t', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
-                                paragraph_text = ''.join([text.text.strip() for text in text_elements if text.text])
-
-                                #now save info 
-                                if not missing_docx_hyperlinks.get(hyperlink_url):
-                                    missing_docx_hyperlinks[hyperlink_url] = []
-                                missing_docx_hyperlinks[hyperlink_url].append(paragraph_text)
+                        # write each article, then let it go
+                        articles = title_record.get("articles", [])
+                        while articles:
+                            write_indented(xf, article_element(articles.pop(0)), level + 1)
+
+                        xf.write(f"\n{XML_INDENT * level}")
+
+                    xf.flush()
+
+                if current_category is not None:
+                    xf.write(f"\n{XML_INDENT}")
+                    category_context.close()
+
+                xf.write("\n")
+
+        # tree.write() ends the file with a newline; do the same
+        file.write(b"\n")
+
+    return xml_file
+
+def generate_html(xml_doc, xsl_file, details):
+
+    # xml_doc is the tree from write_xml() (or the XML file's path); make_html compiles the stylesheet once per process
+    return make_html.render_html(xml_doc, xsl_file, output_file(details, "html"))
+
+def check_hyperlink_ledger(ledger):
+
+    # any link in Word whose URL never made it into a <source> element
+    missing_docx_hyperlinks = {url: texts for url, texts in ledger['docx'].items() if ledger_url_key(url) not in ledger['emitted']}
 
     # If there are missing hyperlinks, print them
     if missing_docx_hyperlinks:
@@ -969,72 +1344,217 @@ def check_all_hyperlinks_from_docx(doc, xml_file):
             for t in text:  
                 print(f'\tTEXT: {t}')
 
-def main(details):
-    
-    # load DOCX file
-    doc = Document(details["input_doc"])
+    return missing_docx_hyperlinks
 
-    # set array to capture info
-    record_data = {}
+def check_cached_links(details, ledger):
+
+    # links in this record that the last link check (test_links.py) found broken or moved; this only reads its cache, so nothing is fetched
+    import acf_link_cache
+
+    problems = acf_link_cache.problem_links(details['link_cache'])
+    if not problems:
+        return []
+
+    # the cache is keyed on acf_link_cache.canonical_url() (no #fragment, case-sensitive path), so our links are looked up the same way
+    sources = {acf_link_cache.canonical_url(url) for url in ledger['sources']}
+    problems = [entry for entry in problems if entry['url'] in sources]
+    if problems:
+        print(f"\n\nThe last link check found problems with {len(problems)} link(s) in this record:")
+        for entry in sorted(problems, key=lambda entry: entry['url']):
+            if entry['ok']:
+                print(f"\n\nURL: {entry['url']}\n\tMOVED TO: {entry['corrected_url']}")
+            else:
+                print(f"\n\nURL: {entry['url']}\n\tBROKEN: {entry['status'] or entry['error']}")
+
+    return problems
+
+@contextlib.contextmanager
+def measure_phase(details, phase):
 
-    # get our title information
-    print('\n\nGetting title information...')
-    parse_tables(doc, details, record_data, "title")
+    # wall and CPU time for one step of the run, plus peak memory if we're tracing allocations (--trace-memory)
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
 
-    # get our article information
-    print('\n\nGetting article information...')
-    parse_tables(doc, details, record_data, "article")
+    try:
+        yield
+    finally:
+        details['metrics']['phases'][phase] = {
+            "wall_s": round(time.perf_counter() - wall_start, 4),
+            "cpu_s": round(time.process_time() - cpu_start, 4),
+            "peak_mb": round(tracemalloc.get_traced_memory()[1] / 2**20, 2) if tracemalloc.is_tracing() else None
+        }
+
+def count_records(record_data):
+
+    # titles, articles and statutes (definitions plus requirements) we're about to write
+    counts = Counter()
+    for title_record in record_data.values():
+        counts['titles'] += 1
+        for article in title_record.get('articles', []):
+            counts['articles'] += 1
+            counts['statutes'] += len(article.get('definitions', [])) + len(article.get('requirements', []))
+
+    return counts
+
+def write_metrics_report(details, wall_start, cpu_start):
+
+    # counters from this script and from the vocab matching, plus the phase timings collected by measure_phase()
+    metrics = details['metrics']
+    metrics['counters'].update(COUNTERS)
+    metrics['counters'].update({f"vocab_{name}": count for name, count in acf_vocabs.counters.items()})
+    metrics['wall_s'] = round(time.perf_counter() - wall_start, 4)
+    metrics['cpu_s'] = round(time.process_time() - cpu_start, 4)
+
+    with open(details['metrics_report'], 'w', encoding='utf-8') as fo:
+        json.dump(metrics, fo, indent=4)
+
+def print_xml_errors(xml_errors):
+    print(f"\n\nXML is not valid. Found {len(xml_errors)} error(s):")
+    for error in xml_errors:
+        print(f'\n\n - Line: {error["line"]}')
+        print(f' - Element: {error["path"]}')
+        print(f' - Message: {error["message"]}')
+
+def write_outputs(details, record_data, ledger):
 
     # now write to XML with lxml
     print('\n\nWriting XML...')
-    xml_file = write_xml(details, record_data)
+    with measure_phase(details, "write_xml"):
+        xml_file, xml_doc = write_xml(details, record_data)
 
     # validate our XML
     print('\n\nValidating XML...')
-    validate_xml(xml_file, details['xsd_file'])
+    with measure_phase(details, "validate_xml"):
+        xml_errors = validate_xml(xml_doc if xml_doc is not None else xml_file, details['xsd_file'], xml_file)
+    if xml_errors:
+        print_xml_errors(xml_errors)
 
     # verify that we retrieved all links from docx
     print('\n\nMaking sure all links are in XML...')
-    check_all_hyperlinks_from_docx(doc, xml_file)
+    with measure_phase(details, "check_hyperlinks"):
+        missing_links = check_hyperlink_ledger(ledger)
+        problem_links = check_cached_links(details, ledger)
+    details['metrics']['counters'].update({"docx_links": len(ledger['docx']), "xml_links": len(ledger['emitted']), "missing_links": len(missing_links), "problem_links": len(problem_links)})
 
     # Finally, generate HTML; NOTE: in the future, add xsl_file path as variable to config
     print('\n\nGenerating HTML...')
-    generate_html(xml_file, details['xsl_file'])
+    with measure_phase(details, "generate_html"):
+        generate_html(xml_doc if xml_doc is not None else xml_file, details['xsl_file'], details)
+
+    return xml_file
+
+def main(details):
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    # start with a clean slate; in batch mode a worker process runs several states
+    COUNTERS.clear()
+    acf_vocabs.counters.clear()
+    details['metrics'] = {"state": details['state'], "input_doc": details['input_doc'], "trace_memory": bool(details.get('trace_memory')), "phases": {}, "counters": {}}
+
+    # optional: peak memory per phase (slows the run down considerably) and a cProfile dump for the whole run
+    if details.get('trace_memory') and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    profiler = None
+    if details.get('profile'):
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    # pick up vocabulary corrections made in earlier runs
+    acf_vocabs.load_corrections(details['vocab_cache'])
+
+    # load DOCX file; when streaming, tables are read as we go, so most of the loading shows up under parse_tables
+    with measure_phase(details, "load_docx"):
+        if details.get('stream_docx'):
+            tables = stream_tables(details["input_doc"])
+        else:
+            from docx import Document
+            tables = snapshot_tables(Document(details["input_doc"]))
+
+    # set array to capture info
+    record_data = {}
+
+    # every hyperlink in the Word doc and every one we write to the XML; filled in as we parse
+    ledger = new_link_ledger()
+
+    # get our title and article information in a single pass through the tables
+    print('\n\nGetting title and article information...')
+    with measure_phase(details, "parse_tables"):
+        parse_tables(tables, details, record_data, ledger)
+    details['metrics']['counters'].update(count_records(record_data))
+
+    # optionally keep the cross-state SQLite index up to date; done before writing XML because --stream-xml empties record_data as it goes
+    if details.get('index_db'):
+        import state_index
+        print(f"\n\nIndexing record in {details['index_db']}...")
+        with measure_phase(details, "index_record"):
+            state_index.index_record_data(details['index_db'], details, record_data)
+
+    # optionally write the record as a flat table too (one row per statute); same reason for doing it before the XML
+    if details.get('export_table'):
+        import export_records
+        print('\n\nExporting table...')
+        with measure_phase(details, "export_table"):
+            row_count, table_files = export_records.export_record_data(os.path.splitext(output_file(details, "xml"))[0], details, record_data)
+        print(f"\n\nWrote {row_count} rows to {', '.join(table_files)}")
+
+    # when the same details are used again (watch mode), a save that didn't change the record (formatting, comments, etc.) needs no new XML or HTML
+    record_digest = hashlib.sha256(json.dumps(record_data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    xml_file = output_file(details, "xml")
+    if record_digest == details.get('record_digest') and os.path.exists(xml_file) and os.path.exists(output_file(details, "html")):
+        print('\n\nNo changes to the record; XML and HTML are already up to date.')
+    else:
+        xml_file = write_outputs(details, record_data, ledger)
+        details['record_digest'] = record_digest
+
+    # write out our audit log, if we found any problems
+    if details.get('audit'):
+        print('\n\nWriting audit log...')
+        with measure_phase(details, "write_audit_log"):
+            write_audit_log(details)
+    details['metrics']['counters']['audit_entries'] = len(details.get('audit', []))
+
+    # keep any new vocabulary corrections for next time
+    acf_vocabs.save_corrections(details['vocab_cache'])
 
-    #clean up our error log, if it exists; read in previous error messages and sort
-    if os.path.exists(details['tmp_audit_log']):
-        print('\n\nWriting audit log and cleaning up...')
-        with open(details['tmp_audit_log'], 'r', encoding='utf-8') as fi:
-            all_errors = fi.readlines()
-            all_errors.sort()
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(details['profile_file'])
+        print(f"\n\nProfile written to {details['profile_file']} (view with: python -m pstats {os.path.basename(details['profile_file'])})")
 
-        # now write out to final audit file
-        with open(details['audit_log'], 'w', encoding='utf-8') as fo:
-            for line in all_errors:
-                fo.write(f"{line}\n")
+    if details.get('trace_memory'):
+        tracemalloc.stop()
 
-        # delete tmp file
-        os.remove(details['tmp_audit_log'])
+    # timings and counts for this run, next to the audit log
+    write_metrics_report(details, wall_start, cpu_start)
 
     print('\n\n----------------------------------------------------\n\nProcess complete!')
 
-if __name__ == "__main__":
-    
-    # check for config file; get the directory where the current script is located
-    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return xml_file
 
-    # Construct the path to the config file; make sure it exists
-    config_path = os.path.join(script_dir, 'acf_parse_config.json')
+def load_config(config_path, script_dir):
+
+    # make sure the config file exists
     if os.path.exists(config_path):
-        print("\n\nConfig file found.")
+        print(f"\n\nConfig file found: {config_path}")
     else:
-        print(f"\n\nConfig file is missing; please be sure file is saved to {script_dir}.")
+        print(f"\n\nConfig file is missing; please be sure {config_path} exists.")
         sys.exit(1)
 
     # load config details
-    with open(config_path, 'r') as file:
+    with open(config_path, 'r', encoding='utf-8') as file:
         details = json.load(file)
 
+    return prepare_config(details, script_dir)
+
+def prepare_config(details, script_dir):
+
+    # config details come from a config file (load_config) or, for a warm worker, straight from the job
+
     # make sure XSD and XSL files have right paths
     details['xsd_file'] = os.path.join(script_dir, details['xsd_file'])
     details['xsl_file'] = os.path.join(script_dir, details['xsl_file'])
@@ -1048,14 +1568,22 @@ if __name__ == "__main__":
     if bad_path:
         sys.exit(1)
 
-    #create our audit log vars so we can refer to them later
-    details['tmp_audit_log'] = os.path.join(details['out_dir'], f'tmp_{details['state'].lower().replace(' ', '_')}_audit-log.txt')
-    if os.path.exists(details['tmp_audit_log']):
-        os.remove(details['tmp_audit_log'])
+    # parsed rows are cached between runs, so that only rows that have changed are parsed again
+    details['parse_cache'] = os.path.join(details['out_dir'], f'{details['state'].lower().replace(' ', '_')}_parse-cache.pkl')
+    details.setdefault('use_cache', True)
+
+    # timing/counts report for every run, and a cProfile dump when asked for (--profile)
+    details['metrics_report'] = os.path.join(details['out_dir'], f'{details['state'].lower().replace(' ', '_')}_metrics.json')
+    details['profile_file'] = os.path.join(details['out_dir'], f'{details['state'].lower().replace(' ', '_')}_profile.prof')
+
+    # vocabulary corrections are shared by every state, and so are link check results (written by test_links.py)
+    details['vocab_cache'] = os.path.join(script_dir, 'acf_vocab_corrections.json')
+    details['link_cache'] = os.path.join(script_dir, 'acf_link_cache.sqlite')
 
+    #create our audit log vars so we can refer to them later; problems found while parsing are collected in details['audit'] and written at the end
     details["audit_log"] = os.path.join(details['out_dir'], f'{details['state'].lower().replace(' ', '_')}_audit-log.txt')
-    if os.path.exists(details['audit_log']):
-        os.remove(details['audit_log'])
+    details["audit_jsonl"] = os.path.join(details['out_dir'], f'{details['state'].lower().replace(' ', '_')}_audit-log.jsonl')
+    reset_audit_log(details)
 
     # make sure boolean values are set
     for term in ["category", "titleContent"]:            
@@ -1082,5 +1610,394 @@ if __name__ == "__main__":
         print('\n\nThe "partName" value must be a list!')
         sys.exit(1)
 
-    main(details)
+    return details
+
+def reset_audit_log(details):
+
+    # start each run with no audit entries and no audit files left over from the last run
+    details['audit'] = []
+    for audit_file in [details['audit_log'], details['audit_jsonl']]:
+        if os.path.exists(audit_file):
+            os.remove(audit_file)
+
+def file_signature(path):
+
+    # cheap "has this changed?" check; None while the file is missing (Word can briefly remove the doc while saving it)
+    try:
+        stats = os.stat(path)
+    except OSError:
+        return None
+    return stats.st_mtime_ns, stats.st_size
+
+def wait_for_quiet(path, debounce, poll_interval):
+
+    # a save is several writes (plus Word's temp-file shuffle); wait until the file exists and has stopped changing for debounce seconds
+    signature = file_signature(path)
+    quiet_since = time.monotonic()
+    while signature is None or time.monotonic() - quiet_since < debounce:
+        time.sleep(poll_interval)
+        current = file_signature(path)
+        if current != signature:
+            signature = current
+            quiet_since = time.monotonic()
+
+    return signature
+
+def watch_state(config_path, script_dir, options, debounce=0.5, poll_interval=0.25):
+
+    details = load_config(config_path, script_dir)
+    details.update(options)
+
+    print(f"\n\nWatching {details['input_doc']} (Ctrl+C to stop)...")
+
+    # what each stage depends on: the config or the Word doc means parsing again (unchanged rows come from the row cache), the XSD only means
+    # validating again, and the XSL only means rendering again
+    signatures = {}
+    xml_file = None
+    try:
+        while True:
+            inputs = {"config": config_path, "input_doc": details['input_doc'], "xsd_file": details['xsd_file'], "xsl_file": details['xsl_file']}
+            changed = [key for key, path in inputs.items() if file_signature(path) != signatures.get(key)]
+            if not changed:
+                time.sleep(poll_interval)
+                continue
+
+            for key in changed:
+                wait_for_quiet(inputs[key], debounce, poll_interval)
+            signatures = {key: file_signature(path) for key, path in inputs.items()}
+
+            start_time = time.perf_counter()
+            try:
+                if xml_file is None or "config" in changed or "input_doc" in changed:
+                    if "config" in changed and xml_file is not None:
+                        details = load_config(config_path, script_dir)
+                        details.update(options)
+                    else:
+                        reset_audit_log(details)
+
+                    # main() skips writing when the record hasn't changed; if the XSL or XSD changed along with the doc, the outputs still need redoing
+                    if "xsd_file" in changed or "xsl_file" in changed:
+                        details.pop('record_digest', None)
+                    xml_file = main(details)
+
+                else:
+                    if "xsd_file" in changed:
+                        print('\n\nSchema changed; validating XML...')
+                        xml_errors = validate_xml(xml_file, details['xsd_file'])
+                        if xml_errors:
+                            print_xml_errors(xml_errors)
+                    if "xsl_file" in changed:
+                        print('\n\nStylesheet changed; generating HTML...')
+                        generate_html(xml_file, details['xsl_file'], details)
+
+                print(f"\n\nUpdated in {time.perf_counter() - start_time:.1f}s; watching for changes...")
+
+            # main() and load_config() exit when the Word doc (or config) needs fixing; keep watching so the fix gets picked up
+            except SystemExit:
+                print('\n\nFix the problem above and save again; still watching...')
+            except Exception:
+                traceback.print_exc()
+                print('\n\nStill watching...')
+
+    except KeyboardInterrupt:
+        print('\n\nStopped watching.')
+
+def find_batch_configs(batch_target):
+
+    # a directory means 'every state config in this folder'; anything else is treated as a glob
+    if os.path.isdir(batch_target):
+        config_paths = glob(os.path.join(batch_target, '*_acf_parse_config.json'))
+    else:
+        config_paths = glob(batch_target)
+
+    # the template config is only a starting point for new states; never try to run it
+    return sorted(path for path in config_paths if not os.path.basename(path).startswith('template'))
+
+def run_state(config, script_dir, options=None):
+
+    # config is the path to a state config file or, for jobs sent to a warm worker, the config itself
+    inline = isinstance(config, dict)
+    config_name = "inline config" if inline else os.path.basename(config)
+
+    # summary info for this state; filled in as we go so that failures still get reported
+    summary = {
+        "config": config_name,
+        "state": config_name.replace('_acf_parse_config.json', ''),
+        "status": "failed",
+        "wall_time": 0.0,
+        "xml_size": 0,
+        "audit_errors": 0,
+        "audit_warnings": 0,
+        "message": ""
+    }
+
+    start_time = time.perf_counter()
+
+    # each worker keeps its own console log next to its own audit log, so that output from parallel states doesn't get jumbled together
+    log_dir = script_dir if inline else os.path.dirname(os.path.abspath(config))
+    try:
+        if inline:
+            peek = config
+        else:
+            with open(config, 'r', encoding='utf-8') as file:
+                peek = json.load(file)
+        summary['state'] = peek['state']
+        if os.path.isdir(peek['out_dir']):
+            log_dir = peek['out_dir']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    summary['console_log'] = os.path.join(log_dir, f"{summary['state'].lower().replace(' ', '_')}_console-log.txt")
+
+    with open(summary['console_log'], 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            if inline:
+                details = prepare_config(copy.deepcopy(config), script_dir)
+            else:
+                details = load_config(config, script_dir)
+            details.update(options or {})
+
+            xml_file = main(details)
+
+            summary['status'] = "ok"
+            summary['xml_size'] = os.path.getsize(xml_file)
+
+            # count logged errors and warnings separately; warnings are problems we fixed ourselves
+            severities = [entry.severity for entry in details['audit']]
+            summary['audit_errors'] = severities.count("error")
+            summary['audit_warnings'] = severities.count("warning")
+
+        # main() and load_config() call sys.exit() when a Word doc needs fixing; record the failure and let the other states carry on
+        except SystemExit as e:
+            summary['message'] = f"exited with code {e.code}"
+        except Exception as e:
+            traceback.print_exc()
+            summary['message'] = f"{type(e).__name__}: {e}"
+
+    summary['wall_time'] = time.perf_counter() - start_time
+
+    return summary
+
+def print_batch_summary(summaries):
+
+    print('\n\n----------------------------------------------------\n\nBatch summary:\n')
+    print(f"{'State':<20} {'Status':<8} {'Wall (s)':>10} {'XML (KB)':>10} {'Audit errors':>13} {'Warnings':>9}")
+    for summary in sorted(summaries, key=lambda s: s['state']):
+        print(f"{summary['state']:<20} {summary['status']:<8} {summary['wall_time']:>10.1f} {summary['xml_size'] / 1024:>10.1f} {summary['audit_errors']:>13} {summary['audit_warnings']:>9}")
+        if summary['message']:
+            print(f"\t{summary['message']} (see {summary['console_log']})")
+
+    failed = [s for s in summaries if s['status'] != 'ok']
+    print(f"\n{len(summaries) - len(failed)} of {len(summaries)} states completed; total worker time {sum(s['wall_time'] for s in summaries):.1f}s")
+
+def run_batch(config_paths, script_dir, workers=None, options=None):
+
+    # python-docx and lxml are CPU-bound, so use processes rather than threads; default to one worker per core
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    workers = min(workers or os.cpu_count() or 1, len(config_paths))
+    print(f"\n\nParsing {len(config_paths)} state configs with {workers} worker(s)...")
+
+    summaries = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_state, config_path, script_dir, options): config_path for config_path in config_paths}
+        for future in as_completed(futures):
+            summary = future.result()
+            print(f" - {summary['state']}: {summary['status']} ({summary['wall_time']:.1f}s)")
+            summaries.append(summary)
+
+    print_batch_summary(summaries)
+
+    return summaries
+
+def run_job(job, script_dir, options):
+
+    # a job is {"config": "<path to config file>"} or {"config": {...config values...}}, optionally with "options" (use_cache, stream_docx, etc.)
+    # that override the worker's own command line options for that one job
+    if not isinstance(job, dict) or not isinstance(job.get('config'), (str, dict)):
+        return {"status": "failed", "message": 'A job must be a JSON object with a "config" entry (a config file path or the config itself).'}
+
+    job_options = dict(options)
+    job_options.update({key: value for key, value in (job.get('options') or {}).items() if key in options})
+
+    # relative paths in a job are relative to wherever the job came from, which the worker can't know; make the sender spell them out
+    if isinstance(job['config'], str) and not os.path.isabs(job['config']):
+        return {"status": "failed", "message": f"Config paths sent to a worker must be absolute: {job['config']}"}
+
+    summary = run_state(job['config'], script_dir, job_options)
+    print(f" - {summary['state']}: {summary['status']} ({summary['wall_time']:.1f}s){' - ' + summary['message'] if summary['message'] else ''}")
+
+    return summary
+
+def serve_socket(socket_path, script_dir, options):
+
+    # warm worker: everything expensive to set up (compiled XSD and XSLT, vocabulary indexes and corrections, compiled regexes in re's own cache)
+    # is kept between jobs, so only the first job pays for it. Jobs arrive as one line of JSON per connection; the summary goes back the same way
+    if not hasattr(socket, 'AF_UNIX'):
+        print('\n\nUnix sockets are not available on this system; use --serve-spool instead.')
+        sys.exit(1)
+
+    # a socket file left behind by a worker that didn't shut down cleanly can be replaced; anything else (or a live worker) can't
+    if os.path.exists(socket_path):
+        if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            print(f'\n\n{socket_path} exists and is not a socket!')
+            sys.exit(1)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            if probe.connect_ex(socket_path) == 0:
+                print(f'\n\nA worker is already listening on {socket_path}.')
+                sys.exit(1)
+        os.remove(socket_path)
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(socket_path)
+        server.listen()
+        print(f"\n\nWaiting for jobs on {socket_path} (Ctrl+C to stop)...")
+
+        try:
+            while True:
+                connection, _ = server.accept()
+                with connection, connection.makefile('rwb') as stream:
+                    try:
+                        summary = run_job(json.loads(stream.readline()), script_dir, options)
+                    except ValueError as e:
+                        summary = {"status": "failed", "message": f"Job is not valid JSON: {e}"}
+                    try:
+                        stream.write(json.dumps(summary).encode('utf-8') + b'\n')
+                        stream.flush()
+                    except OSError:
+                        print(' - client went away before the result was sent')
+        except KeyboardInterrupt:
+            print('\n\nWorker stopped.')
+        finally:
+            os.remove(socket_path)
+
+def serve_spool(spool_dir, script_dir, options, poll_interval=1.0):
+
+    # warm worker that takes jobs from files instead of a socket (works everywhere, including Windows): drop <name>.job.json into the folder
+    # (write it under another name and rename it, so we never read half a file) and <name>.result.json appears when the job is done.
+    # Jobs are claimed by renaming them, so several workers can share one spool folder
+    os.makedirs(spool_dir, exist_ok=True)
+    print(f"\n\nWatching {spool_dir} for *.job.json files (Ctrl+C to stop)...")
+
+    try:
+        while True:
+            job_files = sorted(glob(os.path.join(spool_dir, '*.job.json')))
+            if not job_files:
+                time.sleep(poll_interval)
+                continue
+
+            for job_file in job_files:
+                job_name = os.path.basename(job_file)[:-len('.job.json')]
+                running_file = os.path.join(spool_dir, f"{job_name}.running.json")
+                try:
+                    os.replace(job_file, running_file)
+                except OSError:
+                    continue
+
+                try:
+                    with open(running_file, 'r', encoding='utf-8') as fi:
+                        summary = run_job(json.load(fi), script_dir, options)
+                except (OSError, ValueError) as e:
+                    summary = {"status": "failed", "message": f"Could not read job {job_name}: {e}"}
+
+                # write the result under a temporary name first, so whoever is waiting for it never sees a partial file
+                result_file = os.path.join(spool_dir, f"{job_name}.result.json")
+                with open(f"{result_file}.tmp", 'w', encoding='utf-8') as fo:
+                    json.dump(summary, fo, indent=4)
+                os.replace(f"{result_file}.tmp", result_file)
+                os.remove(running_file)
+    except KeyboardInterrupt:
+        print('\n\nWorker stopped.')
+
+def submit_job(socket_path, config_path, options):
+
+    # hand the job to a warm worker instead of parsing here, then show what the parser printed, just as if it had run in this window
+    if not hasattr(socket, 'AF_UNIX'):
+        print('\n\nUnix sockets are not available on this system; drop a job file in the worker\'s spool folder instead.')
+        sys.exit(1)
+
+    job = {"config": os.path.abspath(config_path), "options": options}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+            with client.makefile('rwb') as stream:
+                stream.write(json.dumps(job).encode('utf-8') + b'\n')
+                stream.flush()
+                summary = json.loads(stream.readline())
+    except (OSError, ValueError) as e:
+        print(f'\n\nCould not get a result from the worker at {socket_path}: {e}')
+        sys.exit(1)
+
+    if summary.get('console_log') and os.path.exists(summary['console_log']):
+        with open(summary['console_log'], 'r', encoding='utf-8') as fi:
+            print(fi.read(), end='')
+
+    if summary['status'] != 'ok':
+        print(f"\n\nJob failed: {summary['message']}")
+        sys.exit(1)
+
+def get_cli_arguments():
+    """ Parse command line arguments and return an object whose members contain the argument values. """
+    parser = argparse.ArgumentParser(description="Parse ACF state records from MS Word (DOCX) into XML and HTML")
+    parser.add_argument('--config', dest='config', type=str, help='Path to a single state config (default: acf_parse_config.json next to this script)')
+    parser.add_argument('--batch', dest='batch', type=str, help='Directory of *_acf_parse_config.json files (or a glob) to parse in parallel')
+    parser.add_argument('--workers', dest='workers', type=int, help='Number of worker processes for --batch (default: one per CPU core)')
+    parser.add_argument('--stream-docx', dest='stream_docx', action='store_true', help='Read tables straight out of the DOCX with a streaming XML parser instead of python-docx (faster, less memory)')
+    parser.add_argument('--stream-xml', dest='stream_xml', action='store_true', help='Write XML one title at a time to keep memory flat for very large states')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false', help='Re-parse every row instead of reusing rows cached from the last run')
+    parser.add_argument('--profile', dest='profile', action='store_true', help='Write a cProfile dump (<state>_profile.prof) for each state')
+    parser.add_argument('--trace-memory', dest='trace_memory', action='store_true', help='Record peak memory per phase in the metrics report (slow)')
+    parser.add_argument('--index-db', dest='index_db', type=str, help='Also load each parsed state into this SQLite index (see state_index.py)')
+    parser.add_argument('--export-table', dest='export_table', action='store_true', help='Also write one row per statute to <state>_<YYYYMMDD>.jsonl (and .parquet, if pyarrow is installed)')
+    parser.add_argument('--watch', dest='watch', action='store_true', help='Keep running, and re-parse/re-render whenever the Word doc (or config, XSD or XSL) is saved')
+    parser.add_argument('--debounce', dest='debounce', type=float, default=0.5, help='With --watch, seconds a file must stay unchanged before it is read (default: 0.5)')
+    parser.add_argument('--serve-socket', dest='serve_socket', type=str, help='Run as a warm worker, taking parse jobs on this Unix socket')
+    parser.add_argument('--serve-spool', dest='serve_spool', type=str, help='Run as a warm worker, taking parse jobs (<name>.job.json files) from this folder')
+    parser.add_argument('--socket', dest='socket', type=str, help='Send the --config job to the warm worker listening on this socket instead of parsing here')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    
+    args = get_cli_arguments()
+
+    # check for config file; get the directory where the current script is located
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    # command line options that override config values
+    options = {"use_cache": args.use_cache, "stream_docx": args.stream_docx, "stream_xml": args.stream_xml, "profile": args.profile, "trace_memory": args.trace_memory, "index_db": args.index_db and os.path.abspath(args.index_db), "export_table": args.export_table}
+
+    # worker modes: stay up and run jobs as they arrive, keeping compiled schemas/stylesheets and vocabulary indexes between them
+    if args.serve_socket:
+        serve_socket(args.serve_socket, script_dir, options)
+
+    elif args.serve_spool:
+        serve_spool(args.serve_spool, script_dir, options)
+
+    # client mode: let a running worker do the parsing
+    elif args.socket:
+        submit_job(args.socket, args.config or os.path.join(script_dir, 'acf_parse_config.json'), options)
+
+    # watch mode: rebuild one state every time its Word doc is saved
+    elif args.watch:
+        watch_state(args.config or os.path.join(script_dir, 'acf_parse_config.json'), script_dir, options, args.debounce)
+
+    # batch mode: run every state config we can find, each in its own process
+    elif args.batch:
+        config_paths = find_batch_configs(args.batch)
+        if not config_paths:
+            print(f'\n\nNo state config files found at {args.batch}.')
+            sys.exit(1)
+
+        summaries = run_batch(config_paths, script_dir, args.workers, options)
+        if any(s['status'] != 'ok' for s in summaries):
+            sys.exit(1)
+
+    else:
+        # Construct the path to the config file; make sure it exists
+        config_path = args.config or os.path.join(script_dir, 'acf_parse_config.json')
+
+        details = load_config(config_path, script_dir)
+        details.update(options)
+
+        main(details)
 
@@ -0,0 +1,131 @@
+import os
+import re
+import json
+import hashlib
+from collections import defaultdict, Counter
+
+# controlled vocabs
+CONTROLLED_VOCABS = {
+    "offices": [
+        "Administration on Children, Youth, and Families (ACYF)",
+        "Children's Bureau (CB)",
+        "Family and Youth Services Bureau (FYSB)",
+        "Office of Child Support Enforcement (OCSE)",
+        "Office of Family Assistance (OFA)",
+        "Office of Head Start (OHS)",
+        "Office of Planning, Research, and Evaluation (OPRE)",
+        "Office of Child Care (OCC)",
+        "Office of Community Services (OCS)",
+        "Office of Early Childhood Development (ECD)",
+        "Office on Trafficking in Persons (OTIP)",
+        "Administration for Native Americans (ANA)",
+        "Office of Refugee Resettlement (ORR)",
+        "N/A"
+    ],
+    "domains": [
+        "Public Records",
+        "Medical Assistance",
+        "Public Assistance",
+        "Child Welfare Services"
+    ],
+    "federal": ["21st Century Cures Act", "Adam Walsh", "BJS", "CAPEA", "CAPTA", "CCDBG", "CSBG", "EETC", "Evidence Act/CIPSEA", "FCIA", "FERPA", "FISMA", "FVPSA", "Head Start Act", "HIPAA/HITECH", "ICWA", "IDEA", "IRS", "LIHEAP", "Medicare Act/CMS", "MVHAA", "NCHS", "NAPA", "OASDI", "Privacy Act", "Refugee Education Assistance Act", "RHYA", "SAMHSA/SAPT", "Section 1137 of the SSA", "SNAP/2018 Farm Bill", "SSA Title IV-A", "SSA Title IV-B", "SSA Title IV-D", "SSA Title IV-E", "SSA Title XIX", "SSBG", "TVPA", "UIFSA", "US Repatriation Program", "N/A"],
+    "terms": ["Abuse and Neglect", "Adoption and Foster Care", "Background Checks", "Biometric Information", "Breach Response", "Child Care", "Child Support", "Children and Youth Services", "Confidentiality", "Criminal Justice/Courts", "Cross-jurisdictional", "Data Collection", "Data Recipient Requirements", "Data Retention", "Databases", "Disability", "Domestic Violence", "Early Childhood", "Economic Security and Mobility", "Education – Higher Ed", "Education – K-12", "Education – Pre-K", "Family Services", "Genetic Information", "Grants & Funding", "Health Care", "How the Law Relates to Other Laws", "Human Trafficking", "Immigration & Refugee Services", "Income Verification", "Individual Subject Rights", "Information Security", "Information Technology Systems", "Medicaid/Medicare", "Mental Health", "Military", "Minorities", "Missing and Unidentified Persons", "Non-Compliance and Consequences for Misuse", "Nutrition Assistance", "Parents", "Preservation of Culture", "Program Eligibility", "Runaway and Homeless Youth", "Substance Abuse", "Taxpayer Information", "Tribal/Native American", "Use and Sharing – Programmatic", "Use and Sharing – Research"]
+}
+
+# hashed copies of each vocab for exact-match lookups
+VOCAB_SETS = {cv_used: frozenset(vocab) for cv_used, vocab in CONTROLLED_VOCABS.items()}
+
+# fingerprint of each vocab; saved corrections are thrown out if the vocab they were made against changes
+VOCAB_HASHES = {cv_used: hashlib.sha1(json.dumps(vocab).encode('utf-8')).hexdigest() for cv_used, vocab in CONTROLLED_VOCABS.items()}
+
+# how many candidates we hand to fuzzywuzzy for scoring
+SHORTLIST_SIZE = 8
+
+# corrections we have already worked out: {vocab: {term as it appeared in Word: correction (or None if nothing was close enough)}}
+corrections = defaultdict(dict)
+
+# how often we reused a correction vs. had to do the fuzzy matching; reported in the parser's metrics
+counters = Counter()
+
+def trigrams(txt):
+
+    # lowercase and reduce to letters/digits (roughly what fuzzywuzzy does before scoring); pad so short terms still get n-grams
+    clean_txt = f"  {re.sub(r'[^a-z0-9]+', ' ', txt.lower()).strip()} "
+    return {clean_txt[i:i+3] for i in range(len(clean_txt) - 2)}
+
+def build_trigram_index(vocab):
+
+    index = defaultdict(set)
+    for term in vocab:
+        for gram in trigrams(term):
+            index[gram].add(term)
+
+    return index
+
+# n-gram index for each vocab, used to pick a short list of likely candidates before any fuzzy scoring
+TRIGRAM_INDEXES = {cv_used: build_trigram_index(vocab) for cv_used, vocab in CONTROLLED_VOCABS.items()}
+
+def shortlist(term, cv_used):
+
+    # count shared trigrams for every vocab entry that has at least one in common with our term
+    overlap = defaultdict(int)
+    for gram in trigrams(term):
+        for candidate in TRIGRAM_INDEXES[cv_used].get(gram, ()):
+            overlap[candidate] += 1
+
+    return sorted(overlap, key=lambda candidate: (-overlap[candidate], candidate))[:SHORTLIST_SIZE]
+
+def find_closest_match(user_term, cv_used, threshold=90):
+
+    # reuse any correction we've already made (in this run or a previous one)
+    if user_term in corrections[cv_used]:
+        counters['memo_hits'] += 1
+        return corrections[cv_used][user_term]
+
+    counters['fuzzy_matches'] += 1
+
+    # fuzzywuzzy is only needed once a term misses the memo, which on most re-runs is never
+    from fuzzywuzzy import process
+
+    # score the short list first; only fall back to the full vocabulary if nothing there is good enough
+    match = None
+    candidates = shortlist(user_term, cv_used)
+    if candidates:
+        match, score = process.extractOne(user_term, candidates)
+    if match is None or score < threshold:
+        match, score = process.extractOne(user_term, CONTROLLED_VOCABS[cv_used])
+
+    closest_match = match if score >= threshold else None
+    corrections[cv_used][user_term] = closest_match
+
+    return closest_match
+
+def load_corrections(cache_file):
+
+    if not os.path.exists(cache_file):
+        return
+
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as fi:
+            cached = json.load(fi)
+    except (OSError, ValueError):
+        print(f'\n\nWARNING: unable to read vocabulary cache {cache_file}; starting fresh.')
+        return
+
+    # only keep corrections made against the vocabs as they stand today
+    for cv_used, entry in cached.items():
+        if entry.get('vocab_hash') == VOCAB_HASHES.get(cv_used):
+            corrections[cv_used].update(entry.get('corrections', {}))
+
+def save_corrections(cache_file):
+
+    # other processes (e.g., batch runs) may have saved corrections since we loaded; merge with what's on disk
+    load_corrections(cache_file)
+
+    cached = {cv_used: {"vocab_hash": VOCAB_HASHES[cv_used], "corrections": terms} for cv_used, terms in corrections.items() if cv_used in VOCAB_HASHES}
+
+    # write to a temp file and swap it into place so a reader never sees a half-written cache
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as fo:
+        json.dump(cached, fo, indent=4, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp_file, cache_file)
@@ -0,0 +1,256 @@
+#!/usr/bin/python3
+""" Measures how fast test_links.py checks links, offline.
+
+    Starts fake_link_server.py with --hosts fake legislature sites, writes a synthetic state XML with
+    --urls <source> links spread across them (a mix of good, redirected, broken, throttled and hanging
+    links set by --mix), and runs test_links.py on it once per --workers value, in a fresh process with
+    --no-cache. For each run it reports links per second, latency percentiles (from the checker's
+    journal), peak connections and requests in flight per host (from the server), how many requests the
+    server throttled and how many links were judged wrongly. Results are written to JSON. Pass
+    --baseline to compare against an earlier results file; the script exits with 1 if any run got
+    slower than --tolerance allows.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+import requests
+from lxml import etree
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CHECKER_SCRIPT = os.path.join(SCRIPT_DIR, 'test_links.py')
+SERVER_SCRIPT = os.path.join(SCRIPT_DIR, 'fake_link_server.py')
+
+# roughly what our states' links look like: mostly good, some moved, a few broken or slow
+DEFAULT_MIX = 'ok=80,moved=6,temp=3,nohead=3,chain=1,missing=4,error=1,timeout=1,loop=1'
+
+# what the checker should make of each kind of link: (ok, corrected)
+EXPECTED = {
+    "ok": (True, False),
+    "nohead": (True, False),
+    "moved": (True, True),
+    "temp": (True, False),
+    "chain": (True, False),
+    "loop": (False, False),
+    "missing": (False, False),
+    "error": (False, False),
+    "timeout": (False, False),
+}
+
+SOURCES_PER_TITLE = 25
+
+def get_cli_arguments():
+    """ Parse command line arguments and return an object whose members contain the argument values. """
+    parser = argparse.ArgumentParser(description="Benchmark test_links.py against local fake websites")
+    parser.add_argument('--urls', dest='urls', type=int, default=2000, help='Links in the synthetic state (default: 2000)')
+    parser.add_argument('--hosts', dest='hosts', type=int, default=20, help='Fake hosts the links are spread across (default: 20)')
+    parser.add_argument('--mix', dest='mix', type=str, default=DEFAULT_MIX, help=f'Relative weights of each kind of link (default: {DEFAULT_MIX})')
+    parser.add_argument('--workers', dest='workers', type=int, nargs='+', default=[4, 8, 16, 32], help='test_links.py --workers values to run (default: 4 8 16 32)')
+    parser.add_argument('--per-host', dest='per_host', type=int, default=2, help='test_links.py --per-host (default: 2)')
+    parser.add_argument('--interval', dest='interval', type=float, default=0.05, help='test_links.py --interval (default: 0.05)')
+    parser.add_argument('--timeout', dest='timeout', type=float, default=2, help='test_links.py --timeout (default: 2)')
+    parser.add_argument('--latency', dest='latency', type=float, default=50, help='Fake hosts\' median response time in ms (default: 50)')
+    parser.add_argument('--jitter', dest='jitter', type=float, default=0.5, help='Spread of response times (default: 0.5)')
+    parser.add_argument('--host-limit', dest='host_limit', type=int, default=4, help='Requests in flight per fake host before it answers 429 (default: 4; 0 for no limit)')
+    parser.add_argument('--base-port', dest='base_port', type=int, default=8900, help='Port of the first fake host (default: 8900)')
+    parser.add_argument('--seed', dest='seed', type=int, default=1, help='Seed for the link mix and response times (default: 1)')
+    parser.add_argument('--work-dir', dest='work_dir', type=str, help='Where to keep the synthetic XML, journals and logs (default: a temp folder, removed afterwards)')
+    parser.add_argument('--output', dest='output', type=str, default='benchmark_links_results.json', help='Results file (default: benchmark_links_results.json)')
+    parser.add_argument('--baseline', dest='baseline', type=str, help='Earlier results file to compare against')
+    parser.add_argument('--tolerance', dest='tolerance', type=float, default=1.25, help='Slowdown vs. baseline that counts as a regression (default: 1.25)')
+    return parser.parse_args()
+
+def parse_mix(mix):
+    """ 'ok=80,moved=6' -> {'ok': 80.0, 'moved': 6.0}; exits on kinds the fake server doesn't know. """
+    weights = {}
+    for item in mix.split(','):
+        kind, _, weight = item.partition('=')
+        kind = kind.strip()
+        if kind not in EXPECTED:
+            print(f"\n\nUnknown kind of link in --mix: {kind} (choose from {', '.join(EXPECTED)})")
+            sys.exit(1)
+        weights[kind] = float(weight or 1)
+
+    return weights
+
+def make_links(count, hosts, base_port, weights, seed):
+    """ {url: kind} for count links, spread evenly across the hosts. """
+    rng = random.Random(seed)
+    kinds = rng.choices(list(weights), weights=list(weights.values()), k=count)
+
+    links = {}
+    for i, kind in enumerate(kinds):
+        path = f"/chain/{1 + i % 3}/{i}" if kind == 'chain' else f"/{kind}/{i}"
+        links[f"http://127.0.0.1:{base_port + i % hosts}{path}"] = kind
+
+    return links
+
+def write_state_xml(xml_file, links):
+    """ A minimal state XML: just enough (<state>, <title>, <source>) for test_links.py. """
+    record = etree.Element('record')
+    etree.SubElement(record, 'state').text = 'Benchmark'
+    urls = list(links)
+    for i in range(0, len(urls), SOURCES_PER_TITLE):
+        title = etree.SubElement(record, 'title')
+        etree.SubElement(title, 'number').text = str(i // SOURCES_PER_TITLE + 1)
+        for url in urls[i:i + SOURCES_PER_TITLE]:
+            etree.SubElement(title, 'source').text = url
+
+    etree.ElementTree(record).write(xml_file, pretty_print=True, xml_declaration=True, encoding='utf-8')
+
+def start_server(args, log_file):
+    """ Start the fake hosts in their own process (so they don't compete with the checker for the GIL) and wait until they answer. """
+    command = [sys.executable, SERVER_SCRIPT, '--hosts', str(args.hosts), '--base-port', str(args.base_port), '--latency', str(args.latency),
+               '--jitter', str(args.jitter), '--host-limit', str(args.host_limit), '--hang', str(args.timeout * 5), '--seed', str(args.seed)]
+    log = open(log_file, 'w', encoding='utf-8')
+    server = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+
+    stats_url = f"http://127.0.0.1:{args.base_port}/__stats"
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            break
+        try:
+            requests.get(stats_url, timeout=1)
+            return server
+        except requests.RequestException:
+            time.sleep(0.1)
+
+    server.kill()
+    print(f'\n\nERROR: the fake hosts did not start; see {log_file}')
+    sys.exit(1)
+
+def server_request(args, path):
+    response = requests.get(f"http://127.0.0.1:{args.base_port}{path}", timeout=10)
+    response.raise_for_status()
+    return response
+
+def percentile(values, fraction):
+    """ Nearest-rank percentile of a sorted list. """
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+def read_results(journal_file):
+    results = []
+    with open(journal_file, 'r', encoding='utf-8') as fi:
+        for line in fi:
+            results.append(json.loads(line))
+    return results
+
+def benchmark_workers(args, work_dir, xml_file, links, workers):
+    """ One checker run with this many workers; returns its summary. """
+    journal_file = os.path.join(work_dir, f'journal_{workers}.jsonl')
+    log_file = os.path.join(work_dir, f'console-log_{workers}.txt')
+
+    server_request(args, '/__reset')
+    command = [sys.executable, CHECKER_SCRIPT, xml_file, '--no-cache', '--journal', journal_file, '--workers', str(workers),
+               '--per-host', str(args.per_host), '--interval', str(args.interval), '--timeout', str(args.timeout)]
+    start = time.perf_counter()
+    with open(log_file, 'w', encoding='utf-8') as log:
+        completed = subprocess.run(command, stdout=log, stderr=subprocess.STDOUT, cwd=work_dir)
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        print(f'\n\nERROR: test_links.py failed with {workers} workers; see {log_file}')
+        sys.exit(1)
+
+    server = server_request(args, '/__stats').json()
+    results = read_results(journal_file)
+
+    # throughput over the checking itself, from the first link picked up to the last answer (start-up and reading the XML aren't counted)
+    first = min(result['checked_at'] for result in results)
+    last = max(result['checked_at'] + result['elapsed'] for result in results)
+    latencies = sorted(result['elapsed'] for result in results)
+
+    wrong = {}
+    for result in results:
+        kind = links[result['url']]
+        if (result['ok'], bool(result['corrected_url'])) != EXPECTED[kind]:
+            wrong[kind] = wrong.get(kind, 0) + 1
+
+    return {
+        "workers": workers,
+        "per_host": args.per_host,
+        "interval": args.interval,
+        "urls": len(results),
+        "wall_s": round(wall, 3),
+        "check_s": round(last - first, 3),
+        "urls_per_s": round(len(results) / (last - first), 1) if last > first else None,
+        "latency_ms": {name: round(percentile(latencies, fraction) * 1000, 1) for name, fraction in [("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("max", 1.0)]},
+        "requests": server['requests'],
+        "throttled": server['throttled'],
+        "peak_connections": server['peak_connections'],
+        "peak_host_connections": server['peak_host_connections'],
+        "peak_host_in_flight": server['peak_host_in_flight'],
+        "wrong": wrong,
+    }
+
+def print_results(results):
+    print(f"\n\n{'Workers':>8} {'URLs':>6} {'Check (s)':>10} {'URLs/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'Max (ms)':>9} {'Peak conns':>11} {'Per host':>9} {'429s':>6} {'Wrong':>6}")
+    for result in results:
+        latency = result['latency_ms']
+        print(f"{result['workers']:>8} {result['urls']:>6} {result['check_s']:>10.2f} {result['urls_per_s'] or 0:>8.1f} {latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f} {latency['max']:>9.1f} "
+              f"{result['peak_connections']:>11} {result['peak_host_in_flight']:>9} {result['throttled']:>6} {sum(result['wrong'].values()):>6}")
+
+def compare_to_baseline(results, baseline_file, tolerance):
+    """ Print how each run compares to the baseline; return the runs that got slower than tolerance allows. """
+    with open(baseline_file, 'r', encoding='utf-8') as fi:
+        baseline = {(b['urls'], b['workers'], b['per_host'], b['interval']): b for b in json.load(fi)['results']}
+
+    regressions = []
+    print(f'\n\nCompared to {baseline_file}:')
+    for result in results:
+        before = baseline.get((result['urls'], result['workers'], result['per_host'], result['interval']))
+        if before is None or not before['urls_per_s'] or not result['urls_per_s']:
+            print(f" - {result['workers']} workers: no matching run in baseline")
+            continue
+
+        ratio = before['urls_per_s'] / result['urls_per_s']
+        flag = 'REGRESSION' if ratio > tolerance else 'ok'
+        print(f" - {result['workers']} workers: {before['urls_per_s']:.1f} -> {result['urls_per_s']:.1f} URLs/s ({ratio:.2f}x slower) {flag}")
+        if ratio > tolerance:
+            regressions.append(result['workers'])
+
+    return regressions
+
+def main():
+    args = get_cli_arguments()
+
+    links = make_links(args.urls, args.hosts, args.base_port, parse_mix(args.mix), args.seed)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='acf_link_benchmark_')
+    os.makedirs(work_dir, exist_ok=True)
+    xml_file = os.path.join(work_dir, 'benchmark_links.xml')
+    write_state_xml(xml_file, links)
+
+    server = start_server(args, os.path.join(work_dir, 'server-log.txt'))
+    results = []
+    try:
+        for workers in sorted(args.workers):
+            print(f'\n\nChecking {len(links)} links on {args.hosts} hosts with {workers} workers...')
+            start = time.perf_counter()
+            results.append(benchmark_workers(args, work_dir, xml_file, links, workers))
+            print(f' - done in {time.perf_counter() - start:.1f}s')
+    finally:
+        server.terminate()
+        server.wait()
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_results(results)
+
+    server_options = {"hosts": args.hosts, "latency_ms": args.latency, "jitter": args.jitter, "host_limit": args.host_limit, "timeout": args.timeout, "mix": args.mix}
+    with open(args.output, 'w', encoding='utf-8') as fo:
+        json.dump({"server": server_options, "python": sys.version.split()[0], "results": results}, fo, indent=4)
+    print(f'\n\nResults written to {args.output}')
+
+    if args.baseline and compare_to_baseline(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+""" Measures how acf_parse-docx-to-xml.py scales with the size of a state record.
+
+    For each scale factor, a synthetic record is generated (make_synthetic_docx.py) for the chosen
+    state config and parsed in a fresh process with --no-cache. Timings and counts come from the
+    parser's <state>_metrics.json. Peak memory comes from a second run with --trace-memory, which is
+    kept separate because tracing slows everything down. Results are written to JSON. Pass --baseline
+    to compare against an earlier results file; the script exits with 1 if anything got slower than
+    --tolerance allows.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import make_synthetic_docx
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARSER_SCRIPT = os.path.join(SCRIPT_DIR, 'acf_parse-docx-to-xml.py')
+
+def get_cli_arguments():
+    """ Parse command line arguments and return an object whose members contain the argument values. """
+    parser = argparse.ArgumentParser(description="Benchmark the ACF parser on synthetic records of increasing size")
+    parser.add_argument('--config', dest='config', type=str, default=os.path.join(SCRIPT_DIR, 'acf_parse_config.json'), help='State config to model the records on (default: acf_parse_config.json)')
+    parser.add_argument('--scales', dest='scales', type=int, nargs='+', default=[1, 2, 4, 8], help='Multiples of --titles to run (default: 1 2 4 8)')
+    parser.add_argument('--titles', dest='titles', type=int, default=5, help='Titles at scale 1 (default: 5)')
+    parser.add_argument('--articles', dest='articles', type=int, default=10, help='Articles per title (default: 10)')
+    parser.add_argument('--statutes', dest='statutes', type=int, default=10, help='Requirement statutes per article (default: 10)')
+    parser.add_argument('--repeat', dest='repeat', type=int, default=1, help='Timed runs per size; the fastest is kept (default: 1)')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='Skip the (slow) traced run used to measure peak memory')
+    parser.add_argument('--work-dir', dest='work_dir', type=str, help='Where to keep generated records and parser output (default: a temp folder, removed afterwards)')
+    parser.add_argument('--output', dest='output', type=str, default='benchmark_results.json', help='Results file (default: benchmark_results.json)')
+    parser.add_argument('--baseline', dest='baseline', type=str, help='Earlier results file to compare against')
+    parser.add_argument('--tolerance', dest='tolerance', type=float, default=1.25, help='Slowdown vs. baseline that counts as a regression (default: 1.25)')
+    return parser.parse_args()
+
+def run_parser(config_path, log_file, extra_args=()):
+    """ Run the parser in its own process and return its metrics report. """
+    with open(config_path, 'r', encoding='utf-8') as fi:
+        details = json.load(fi)
+
+    with open(log_file, 'w', encoding='utf-8') as log:
+        result = subprocess.run([sys.executable, PARSER_SCRIPT, '--config', config_path, '--no-cache', *extra_args], stdout=log, stderr=subprocess.STDOUT, cwd=SCRIPT_DIR)
+
+    if result.returncode != 0:
+        print(f'\n\nERROR: parser failed on {details["input_doc"]}; see {log_file}')
+        sys.exit(1)
+
+    metrics_report = os.path.join(details['out_dir'], f"{details['state'].lower().replace(' ', '_')}_metrics.json")
+    with open(metrics_report, 'r', encoding='utf-8') as fi:
+        return json.load(fi)
+
+def benchmark_size(args, work_dir, scale):
+    """ Generate one record, parse it (args.repeat times, plus a traced run if asked) and summarize. """
+    size_dir = os.path.join(work_dir, f'scale_{scale}')
+    os.makedirs(size_dir, exist_ok=True)
+
+    titles = args.titles * scale
+    docx_file = os.path.join(size_dir, f'synthetic_{scale}.docx')
+    make_synthetic_docx.generate_docx(docx_file, args.config, titles, args.articles, args.statutes)
+
+    # same config as the real state, pointed at our synthetic record
+    with open(args.config, 'r', encoding='utf-8') as fi:
+        details = json.load(fi)
+    details['input_doc'] = docx_file
+    details['out_dir'] = size_dir
+    config_path = os.path.join(size_dir, 'benchmark_acf_parse_config.json')
+    with open(config_path, 'w', encoding='utf-8') as fo:
+        json.dump(details, fo, indent=4)
+
+    runs = [run_parser(config_path, os.path.join(size_dir, f'console-log_{i}.txt')) for i in range(args.repeat)]
+    metrics = min(runs, key=lambda run: run['wall_s'])
+    counters = metrics['counters']
+    parse_time = metrics['phases']['parse_tables']['wall_s']
+
+    result = {
+        "scale": scale,
+        "titles": titles,
+        "articles": counters.get('articles', 0),
+        "statutes": counters.get('statutes', 0),
+        "docx_mb": round(os.path.getsize(docx_file) / 2**20, 2),
+        "wall_s": metrics['wall_s'],
+        "cpu_s": metrics['cpu_s'],
+        "phases": {phase: values['wall_s'] for phase, values in metrics['phases'].items()},
+        "rows_per_s": round((counters.get('title_rows', 0) + counters.get('article_rows', 0)) / parse_time, 1) if parse_time else None,
+        "statutes_per_s": round(counters.get('statutes', 0) / parse_time, 1) if parse_time else None,
+        "peak_mb": None
+    }
+
+    if args.memory:
+        traced = run_parser(config_path, os.path.join(size_dir, 'console-log_traced.txt'), ['--trace-memory'])
+        result['peak_mb'] = max(values['peak_mb'] for values in traced['phases'].values())
+        result['phase_peak_mb'] = {phase: values['peak_mb'] for phase, values in traced['phases'].items()}
+
+    return result
+
+def print_results(results):
+    print(f"\n\n{'Scale':>6} {'Titles':>7} {'Articles':>9} {'Statutes':>9} {'DOCX (MB)':>10} {'Wall (s)':>9} {'Parse (s)':>10} {'Rows/s':>9} {'Peak (MB)':>10}")
+    for result in results:
+        peak = f"{result['peak_mb']:.1f}" if result['peak_mb'] is not None else '-'
+        print(f"{result['scale']:>6} {result['titles']:>7} {result['articles']:>9} {result['statutes']:>9} {result['docx_mb']:>10.2f} {result['wall_s']:>9.2f} {result['phases']['parse_tables']:>10.2f} {result['rows_per_s'] or 0:>9.1f} {peak:>10}")
+
+def compare_to_baseline(results, baseline_file, tolerance):
+    """ Print how each size compares to the baseline; return the sizes that got slower than tolerance allows. """
+    with open(baseline_file, 'r', encoding='utf-8') as fi:
+        baseline = {(b['titles'], b['articles'], b['statutes']): b for b in json.load(fi)['results']}
+
+    regressions = []
+    print(f'\n\nCompared to {baseline_file}:')
+    for result in results:
+        before = baseline.get((result['titles'], result['articles'], result['statutes']))
+        if before is None:
+            print(f" - scale {result['scale']}: no matching run in baseline")
+            continue
+
+        ratio = result['wall_s'] / before['wall_s'] if before['wall_s'] else 1.0
+        flag = 'REGRESSION' if ratio > tolerance else 'ok'
+        print(f" - scale {result['scale']}: {before['wall_s']:.2f}s -> {result['wall_s']:.2f}s ({ratio:.2f}x) {flag}")
+        if ratio > tolerance:
+            regressions.append(result['scale'])
+
+    return regressions
+
+def main():
+    args = get_cli_arguments()
+
+    if not os.path.exists(args.config):
+        print(f"\n\nConfig file is missing; please be sure {args.config} exists.")
+        sys.exit(1)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='acf_benchmark_')
+    os.makedirs(work_dir, exist_ok=True)
+
+    results = []
+    try:
+        for scale in sorted(args.scales):
+            print(f'\n\nBenchmarking scale {scale} ({args.titles * scale} titles)...')
+            start = time.perf_counter()
+            results.append(benchmark_size(args, work_dir, scale))
+            print(f' - done in {time.perf_counter() - start:.1f}s')
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_results(results)
+
+    with open(args.output, 'w', encoding='utf-8') as fo:
+        json.dump({"config": os.path.basename(args.config), "python": sys.version.split()[0], "results": results}, fo, indent=4)
+    print(f'\n\nResults written to {args.output}')
+
+    if args.baseline and compare_to_baseline(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/python3
+""" Compares two XML outputs for the same state (e.g. utah_20250101.xml and utah_20250301.xml).
+
+    Titles are matched by number, articles by (title number, article number) and statutes by
+    (title number, article number, stateCode). Reports added, removed and changed titles, articles,
+    requirements and definitions, down to individual entities, terms, defined terms and sources.
+    Both files are streamed, and statutes are matched through dictionaries, so the diff takes
+    time proportional to the size of the files. Writes JSON (--json) and/or HTML (--html).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from lxml import etree
+
+# the text fields we compare for each kind of element, and the lists of values
+TITLE_FIELDS = ['name', 'source']
+ARTICLE_FIELDS = ['name', 'source', 'domain']
+STATUTE_FIELDS = ['label', 'description', 'source', 'altCode', 'altSource']
+STATUTE_LISTS = {'appliesTo': 'entities', 'terms': 'terms', 'definedTerms': 'definedTerms'}
+SECTIONS = ['titles', 'articles', 'requirements', 'definitions']
+
+# what to call titleContent (statutes that sit directly in a title) in place of an article number
+TITLE_CONTENT = '(title content)'
+
+def get_cli_arguments():
+    """ Parse command line arguments and return an object whose members contain the argument values. """
+    parser = argparse.ArgumentParser(description="Compare two XML outputs for the same state")
+    parser.add_argument('old_xml', type=str, help='The earlier XML file')
+    parser.add_argument('new_xml', type=str, help='The later XML file')
+    parser.add_argument('--json', dest='json_file', type=str, help='Write the differences to this JSON file')
+    parser.add_argument('--html', dest='html_file', type=str, help='Write the differences to this HTML file')
+    return parser.parse_args()
+
+def child_text(element, path):
+    """ Stripped text of the first element at path, or None if there isn't one. """
+    child = element.find(path)
+    if child is None or child.text is None:
+        return None
+    return child.text.strip()
+
+def statute_values(statute):
+    """ The stateCode of one <statute>, and everything else we compare for it. Reads each child once; path lookups are several times slower on big files. """
+    state_code = None
+    values = {}
+    for child in statute:
+        if child.tag == 'stateCode':
+            state_code = (child.text or '').strip()
+        elif child.tag in STATUTE_FIELDS:
+            values[child.tag] = (child.text or '').strip()
+        elif child.tag in STATUTE_LISTS:
+            values[STATUTE_LISTS[child.tag]] = [item.text.strip() for item in child if item.text]
+    return state_code, values
+
+def load_state(xml_file):
+    """ Stream xml_file and index its titles, articles and statutes. Each title is dropped from memory once it has been indexed. """
+    index = {"state": None, "titles": {}, "articles": {}, "requirements": {}, "definitions": {}}
+
+    for _, element in etree.iterparse(xml_file, events=('end',), tag=('state', 'title'), remove_blank_text=True):
+        if element.tag == 'state':
+            if element.getparent() is not None and element.getparent().tag == 'record':
+                index['state'] = (element.text or '').strip()
+            continue
+
+        title_number = child_text(element, 'number')
+        index['titles'][title_number] = {field: child_text(element, field) for field in TITLE_FIELDS}
+        index['titles'][title_number]['offices'] = [office.text.strip() for office in element.iterfind('officesAssociated/office') if office.text]
+
+        for article in element:
+            if article.tag not in ('article', 'titleContent'):
+                continue
+
+            article_number = child_text(article, 'number') if article.tag == 'article' else TITLE_CONTENT
+            if article.tag == 'article':
+                index['articles'][(title_number, article_number)] = {field: child_text(article, field) for field in ARTICLE_FIELDS}
+                index['articles'][(title_number, article_number)]['federal'] = [federal.text.strip() for federal in article.iterfind('associatedFederalRecords/federal') if federal.text]
+
+            # a stateCode can (rarely) appear more than once in the same article; keep every occurrence, in document order
+            for section in article:
+                if section.tag not in ('requirements', 'definitions'):
+                    continue
+                for statute in section:
+                    state_code, values = statute_values(statute)
+                    index[section.tag].setdefault((title_number, article_number, state_code), []).append(values)
+
+        # done with this title; free it (and anything before it) so memory doesn't grow with the file
+        element.clear()
+        parent = element.getparent()
+        if parent is not None:
+            while element.getprevious() is not None:
+                del parent[0]
+
+    return index
+
+def compare_values(old, new):
+    """ Field-by-field differences between two indexed items: {field: {"old": ..., "new": ...}} for text, {field: {"added": [...], "removed": [...]}} for lists. """
+    changes = {}
+    for field in dict.fromkeys([*old, *new]):
+        before, after = old.get(field), new.get(field)
+        if before == after:
+            continue
+
+        if isinstance(before, list) or isinstance(after, list):
+            before_set, after_set = set(before or []), set(after or [])
+            added = [value for value in after or [] if value not in before_set]
+            removed = [value for value in before or [] if value not in after_set]
+            # same values in a different order isn't worth reporting
+            if added or removed:
+                changes[field] = {"added": added, "removed": removed}
+        else:
+            changes[field] = {"old": before, "new": after}
+
+    return changes
+
+def key_fields(section, key):
+    """ Turn an index key back into named fields for the report. """
+    if section == 'titles':
+        return {"title": key}
+    if section == 'articles':
+        return {"title": key[0], "article": key[1]}
+    return {"title": key[0], "article": key[1], "stateCode": key[2]}
+
+def pair_statutes(old_list, new_list):
+    """ Match up statutes that share a key: identical ones first, then the rest in document order. Returns (pairs, removed, added). """
+    if len(old_list) == 1 and len(new_list) == 1:
+        return [(old_list[0], new_list[0])], [], []
+
+    unmatched_new = list(new_list)
+    pairs = []
+    unmatched_old = []
+    for old in old_list:
+        if old in unmatched_new:
+            unmatched_new.remove(old)
+            pairs.append((old, old))
+        else:
+            unmatched_old.append(old)
+
+    paired = min(len(unmatched_old), len(unmatched_new))
+    pairs.extend(zip(unmatched_old[:paired], unmatched_new[:paired]))
+
+    return pairs, unmatched_old[paired:], unmatched_new[paired:]
+
+def diff_section(section, old_items, new_items):
+    """ Added, removed and changed items for one section; output follows the new file's order, with removed items in the old file's order. """
+    result = {"added": [], "removed": [], "changed": []}
+    statutes = section in ('requirements', 'definitions')
+
+    for key, new in new_items.items():
+        old = old_items.get(key)
+        if old is None:
+            for values in (new if statutes else [new]):
+                result['added'].append({**key_fields(section, key), "values": values})
+            continue
+
+        if statutes:
+            pairs, removed, added = pair_statutes(old, new)
+        else:
+            pairs, removed, added = [(old, new)], [], []
+
+        for before, after in pairs:
+            changes = compare_values(before, after)
+            if changes:
+                result['changed'].append({**key_fields(section, key), "changes": changes})
+        result['removed'].extend({**key_fields(section, key), "values": values} for values in removed)
+        result['added'].extend({**key_fields(section, key), "values": values} for values in added)
+
+    for key, old in old_items.items():
+        if key not in new_items:
+            for values in (old if statutes else [old]):
+                result['removed'].append({**key_fields(section, key), "values": values})
+
+    return result
+
+def diff_states(old_xml, new_xml):
+    """ Compare two state XML files; returns a JSON-ready dict. """
+    old_index = load_state(old_xml)
+    new_index = load_state(new_xml)
+
+    diff = {
+        "old": os.path.basename(old_xml),
+        "new": os.path.basename(new_xml),
+        "state": new_index['state'] or old_index['state'],
+        "summary": {},
+    }
+    for section in SECTIONS:
+        diff[section] = diff_section(section, old_index[section], new_index[section])
+        diff['summary'][section] = {change: len(items) for change, items in diff[section].items()}
+
+    return diff
+
+def location(item):
+    """ Where an item lives, e.g. 'Title 60A / Article 1 / Utah Code § 60A-1-200'. """
+    parts = [f"Title {item['title']}"]
+    if 'article' in item:
+        parts.append(item['article'] if item['article'] == TITLE_CONTENT else f"Article {item['article']}")
+    if 'stateCode' in item:
+        parts.append(item['stateCode'] or '(no stateCode)')
+    return ' / '.join(parts)
+
+def describe_values(values):
+    """ One line per field for an added/removed item. """
+    return [f"{field}: {'; '.join(value) if isinstance(value, list) else value}" for field, value in values.items()]
+
+def describe_changes(changes):
+    """ One line per changed field. """
+    lines = []
+    for field, change in changes.items():
+        if 'old' in change:
+            lines.append(f"{field}: {change['old']} -> {change['new']}")
+        else:
+            if change['added']:
+                lines.append(f"{field} added: {'; '.join(change['added'])}")
+            if change['removed']:
+                lines.append(f"{field} removed: {'; '.join(change['removed'])}")
+    return lines
+
+def write_html(diff, html_file):
+    """ A plain report page: a summary table, then one table per section listing every difference. """
+    html = etree.Element('html')
+    head = etree.SubElement(html, 'head')
+    etree.SubElement(head, 'meta', charset='utf-8')
+    etree.SubElement(head, 'title').text = f"{diff['state']}: {diff['old']} vs. {diff['new']}"
+    etree.SubElement(head, 'style').text = (
+        "body { font-family: sans-serif; } table { border-collapse: collapse; margin-bottom: 2em; } "
+        "th, td { border: 1px solid #ccc; padding: 4px 8px; text-align: left; vertical-align: top; } "
+        ".added { background: #e6ffec; } .removed { background: #ffebe9; } .changed { background: #fff8c5; }"
+    )
+
+    body = etree.SubElement(html, 'body')
+    etree.SubElement(body, 'h1').text = f"{diff['state']}: {diff['old']} vs. {diff['new']}"
+
+    summary = etree.SubElement(body, 'table')
+    header = etree.SubElement(summary, 'tr')
+    for heading in ['', 'Added', 'Removed', 'Changed']:
+        etree.SubElement(header, 'th').text = heading
+    for section in SECTIONS:
+        row = etree.SubElement(summary, 'tr')
+        etree.SubElement(row, 'th').text = section.capitalize()
+        for change in ['added', 'removed', 'changed']:
+            etree.SubElement(row, 'td').text = str(diff['summary'][section][change])
+
+    for section in SECTIONS:
+        if not any(diff[section].values()):
+            continue
+
+        etree.SubElement(body, 'h2').text = section.capitalize()
+        table = etree.SubElement(body, 'table')
+        for change in ['added', 'removed', 'changed']:
+            for item in diff[section][change]:
+                row = etree.SubElement(table, 'tr', {'class': change})
+                etree.SubElement(row, 'td').text = change.capitalize()
+                etree.SubElement(row, 'td').text = location(item)
+                cell = etree.SubElement(row, 'td')
+                lines = describe_changes(item['changes']) if change == 'changed' else describe_values(item['values'])
+                for i, line in enumerate(lines):
+                    if i:
+                        etree.SubElement(cell, 'br').tail = line
+                    else:
+                        cell.text = line
+
+    # write next to the old report and swap it in, same as the state HTML
+    temp_file = f"{html_file}.tmp"
+    etree.ElementTree(html).write(temp_file, pretty_print=True, method='html', encoding='utf-8', doctype='<!DOCTYPE html>')
+    os.replace(temp_file, html_file)
+
+def main():
+    args = get_cli_arguments()
+
+    for xml_file in [args.old_xml, args.new_xml]:
+        if not os.path.exists(xml_file):
+            print(f'\n\nERROR: {xml_file} does not exist.')
+            sys.exit(1)
+
+    start = time.perf_counter()
+    try:
+        diff = diff_states(args.old_xml, args.new_xml)
+    except etree.XMLSyntaxError as ex:
+        print(f'\n\nERROR: could not read XML: {ex}')
+        sys.exit(1)
+
+    print(f"\n\n{diff['state']}: {diff['old']} -> {diff['new']} (compared in {time.perf_counter() - start:.2f}s)\n")
+    print(f"{'':<14} {'Added':>8} {'Removed':>8} {'Changed':>8}")
+    for section in SECTIONS:
+        counts = diff['summary'][section]
+        print(f"{section.capitalize():<14} {counts['added']:>8} {counts['removed']:>8} {counts['changed']:>8}")
+
+    if args.json_file:
+        with open(args.json_file, 'w', encoding='utf-8') as fo:
+            json.dump(diff, fo, indent=4, ensure_ascii=False)
+        print(f'\n\nDifferences written to {args.json_file}')
+
+    if args.html_file:
+        write_html(diff, args.html_file)
+        print(f'\n\nDifferences written to {args.html_file}')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+""" Flattens parsed ACF state records into a table: one row per requirement or definition statute,
+    with the title, article, part, domain, offices, federal records, entities and terms it belongs to.
+
+    Rows are written as JSONL and, when pyarrow is installed, as Parquet with dictionary-encoded
+    (categorical) columns for the values that repeat from row to row. Run it on state XML files,
+    or let the parser write the table alongside the XML (acf_parse-docx-to-xml.py --export-table).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import state_index
+
+# every column, in order, with its type: str, bool, int or list (of str); columns named in CATEGORICAL_COLUMNS are dictionary-encoded in Parquet
+COLUMNS = {
+    "state": str,
+    "category": str,
+    "title_number": str,
+    "title_name": str,
+    "title_source": str,
+    "offices": list,
+    "title_content": bool,
+    "domain": str,
+    "subtitle_number": str,
+    "subtitle_name": str,
+    "article_number": str,
+    "article_name": str,
+    "article_source": str,
+    "part_number": str,
+    "part_name": str,
+    "subpart_number": str,
+    "subpart_name": str,
+    "federal_records": list,
+    "kind": str,
+    "position": int,
+    "label": str,
+    "description": str,
+    "state_code": str,
+    "source": str,
+    "entities": list,
+    "terms": list,
+    "defined_terms": list,
+}
+CATEGORICAL_COLUMNS = {"state", "category", "title_number", "title_name", "title_source", "domain", "subtitle_number", "subtitle_name",
+                       "article_number", "article_name", "article_source", "part_number", "part_name", "subpart_number", "subpart_name", "kind"}
+
+# rows handed to pyarrow at a time, so a very large state never has to be held as one table
+PARQUET_BATCH_SIZE = 10000
+
+def get_cli_arguments():
+    """ Parse command line arguments and return an object whose members contain the argument values. """
+    parser = argparse.ArgumentParser(description="Export parsed ACF state records (XML) as a flat table (JSONL, plus Parquet if pyarrow is installed)")
+    parser.add_argument('xml_files', type=str, nargs='+', help='State XML files, directories of them, or globs')
+    parser.add_argument('--out', dest='out', type=str, default='acf_records', help='Output path without extension; writes <out>.jsonl and <out>.parquet (default: acf_records)')
+    parser.add_argument('--no-parquet', dest='parquet', action='store_false', help='Only write JSONL')
+    return parser.parse_args()
+
+def flatten_record(state, titles):
+    """ Yield one row (a dict with every column in COLUMNS) per statute; titles are shaped like the parser's record_data values. """
+    for title in titles:
+        title_columns = {
+            "state": state,
+            "category": (title.get('category') or {}).get('name'),
+            "title_number": title.get('number'),
+            "title_name": title.get('name'),
+            "title_source": title.get('source'),
+            "offices": list(title.get('officesAssociated', [])),
+        }
+
+        for article in title.get('articles', []):
+            subtitle = article.get('subtitle') or {}
+            part = article.get('part') or {}
+            subpart = part.get('subPart') or {}
+            title_content = bool(article.get('found_titleContent'))
+            article_columns = {
+                **title_columns,
+                "title_content": title_content,
+                "domain": article.get('domain'),
+                "subtitle_number": subtitle.get('number'),
+                "subtitle_name": subtitle.get('name'),
+                "article_number": None if title_content else article.get('number'),
+                "article_name": None if title_content else article.get('name'),
+                "article_source": None if title_content else article.get('source'),
+                "part_number": part.get('number'),
+                "part_name": part.get('name'),
+                "subpart_number": subpart.get('number'),
+                "subpart_name": subpart.get('name'),
+                "federal_records": list(article.get('associatedFederalRecords', [])),
+            }
+
+            for position, definition in enumerate(article.get('definitions', [])):
+                yield {
+                    **article_columns,
+                    "kind": "definition",
+                    "position": position,
+                    "label": None,
+                    "description": None,
+                    "state_code": definition.get('state_code'),
+                    "source": definition.get('source'),
+                    "entities": [],
+                    "terms": [],
+                    "defined_terms": list(definition.get('defined_terms', [])),
+                }
+
+            for position, requirement in enumerate(article.get('requirements', [])):
+                yield {
+                    **article_columns,
+                    "kind": "requirement",
+                    "position": position,
+                    "label": requirement.get('label'),
+                    "description": requirement.get('description'),
+                    "state_code": requirement.get('state_code'),
+                    "source": requirement.get('source'),
+                    "entities": [entity for entity in requirement.get('entities', []) if entity],
+                    "terms": [tag.replace('&amp;', '&') for tag in requirement.get('tags', [])],
+                    "defined_terms": [],
+                }
+
+def parquet_schema(pa):
+    """ The Arrow schema for our rows: categorical columns are dictionary<int32, string>, lists are list<string>. """
+    types = {str: pa.string(), bool: pa.bool_(), int: pa.int32(), list: pa.list_(pa.string())}
+    return pa.schema([
+        pa.field(name, pa.dictionary(pa.int32(), pa.string()) if name in CATEGORICAL_COLUMNS else types[column_type])
+        for name, column_type in COLUMNS.items()
+    ])
+
+def write_table(rows, out_path, parquet=True):
+    """ Write rows to <out_path>.jsonl and (if pyarrow is available and parquet is set) <out_path>.parquet. Returns (row count, files written). """
+    pq = None
+    if parquet:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print('\n\npyarrow is not installed; writing JSONL only (pip install pyarrow for Parquet).')
+
+    jsonl_file = f"{out_path}.jsonl"
+    parquet_file = f"{out_path}.parquet"
+    written = [jsonl_file]
+    count = 0
+
+    with open(jsonl_file, 'w', encoding='utf-8') as fo:
+        writer = pq.ParquetWriter(parquet_file, parquet_schema(pa)) if pq else None
+        try:
+            batch = []
+            for row in rows:
+                fo.write(json.dumps(row, ensure_ascii=False))
+                fo.write('\n')
+                count += 1
+
+                if writer:
+                    batch.append(row)
+                    if len(batch) >= PARQUET_BATCH_SIZE:
+                        writer.write_table(pa.Table.from_pylist(batch, schema=writer.schema))
+                        batch = []
+
+            if writer and batch:
+                writer.write_table(pa.Table.from_pylist(batch, schema=writer.schema))
+        finally:
+            if writer:
+                writer.close()
+                written.append(parquet_file)
+
+    return count, written
+
+def export_record_data(out_path, details, record_data, parquet=True):
+    """ Export a state straight from the parser's record_data (used by acf_parse-docx-to-xml.py --export-table). """
+    return write_table(flatten_record(details['state'], list(record_data.values())), out_path, parquet)
+
+def xml_rows(xml_files):
+    """ Rows for every statute in every file, one file at a time. """
+    for xml_file in xml_files:
+        header, titles = state_index.read_state_xml(xml_file)
+        print(f" - {os.path.basename(xml_file)}: {header.get('state')}")
+        yield from flatten_record(header.get('state'), titles)
+
+def main():
+    args = get_cli_arguments()
+
+    xml_files = state_index.find_xml_files(args.xml_files)
+    if not xml_files:
+        print(f"\n\nNo XML files found at {' '.join(args.xml_files)}.")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    print(f'\n\nExporting {len(xml_files)} XML file(s)...')
+    count, written = write_table(xml_rows(xml_files), args.out, args.parquet)
+
+    print(f"\n\nWrote {count} rows to {', '.join(written)} in {time.perf_counter() - start:.1f}s.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/python3
+""" A local stand-in for the legislature websites that test_links.py checks, for benchmarking and
+    tuning the link checker without going online.
+
+    Serves several "hosts" at once, one port each (--base-port, --base-port + 1, ...), so the checker's
+    per-host limits apply to them as they would to real sites. What a URL does is given by its path:
+
+        /ok/<n>            200
+        /nohead/<n>        405 to HEAD, 200 to GET (servers that don't support HEAD)
+        /moved/<n>         301 to /ok/<n>
+        /temp/<n>          302 to /ok/<n>
+        /chain/<k>/<n>     k 302s in a row, then /ok/<n>
+        /loop/<n>          302 back to itself
+        /missing/<n>       404
+        /error/<n>         500
+        /timeout/<n>       no answer for --hang seconds, or until the client hangs up
+
+    Every response takes --latency ms (log-normally spread by --jitter). A host with more than
+    --host-limit requests in flight answers 429 with a Retry-After, like a throttling site. GET
+    /__stats (on any port) returns request counts by status, peak connections and peak requests
+    in flight per host, and GET /__reset clears them.
+"""
+import sys
+import json
+import math
+import time
+import random
+import select
+import socket
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def get_cli_arguments():
+    """ Parse command line arguments and return an object whose members contain the argument values. """
+    parser = argparse.ArgumentParser(description="Serve fake legislature websites for benchmarking test_links.py")
+    parser.add_argument('--hosts', dest='hosts', type=int, default=20, help='Number of hosts, one port each (default: 20)')
+    parser.add_argument('--base-port', dest='base_port', type=int, default=8900, help='Port of the first host (default: 8900)')
+    parser.add_argument('--bind', dest='bind', type=str, default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--latency', dest='latency', type=float, default=50, help='Median response time in ms (default: 50)')
+    parser.add_argument('--jitter', dest='jitter', type=float, default=0.5, help='Spread of response times (sigma of the log-normal; 0 for none; default: 0.5)')
+    parser.add_argument('--host-limit', dest='host_limit', type=int, default=0, help='Requests in flight per host before it answers 429 (default: 0, no limit)')
+    parser.add_argument('--retry-after', dest='retry_after', type=int, default=1, help='Retry-After seconds sent with 429s (default: 1)')
+    parser.add_argument('--hang', dest='hang', type=float, default=30, help='Seconds /timeout/ URLs take to answer (default: 30)')
+    parser.add_argument('--seed', dest='seed', type=int, help='Seed for the response time spread, for repeatable runs')
+    return parser.parse_args()
+
+def new_stats():
+    """ Counters shared by every host; 'hosts' is keyed by port. """
+    return {"lock": threading.Lock(), "started": time.time(), "requests": 0, "throttled": 0, "connections": 0, "peak_connections": 0, "hosts": {}}
+
+def host_stats(stats, port):
+    """ The counters for one host (call with stats['lock'] held). """
+    if port not in stats['hosts']:
+        stats['hosts'][port] = {"requests": 0, "by_status": {}, "in_flight": 0, "peak_in_flight": 0, "connections": 0, "peak_connections": 0}
+    return stats['hosts'][port]
+
+def stats_report(stats):
+    """ A JSON-ready copy of the counters. """
+    with stats['lock']:
+        hosts = {str(port): {key: (dict(value) if isinstance(value, dict) else value) for key, value in host.items()} for port, host in stats['hosts'].items()}
+        return {
+            "seconds": round(time.time() - stats['started'], 3),
+            "requests": stats['requests'],
+            "throttled": stats['throttled'],
+            "peak_connections": stats['peak_connections'],
+            "peak_host_connections": max((host['peak_connections'] for host in hosts.values()), default=0),
+            "peak_host_in_flight": max((host['peak_in_flight'] for host in hosts.values()), default=0),
+            "hosts": hosts,
+        }
+
+def reset_stats(stats):
+    """ Clear the counters, keeping track of connections that are still open. """
+    with stats['lock']:
+        stats.update(started=time.time(), requests=0, throttled=0, peak_connections=stats['connections'])
+        for host in stats['hosts'].values():
+            host.update(requests=0, by_status={}, peak_in_flight=host['in_flight'], peak_connections=host['connections'])
+
+def response_time(options):
+    """ Seconds to wait before answering: log-normal around --latency, so there's a long tail like real sites have. """
+    median = options.latency / 1000
+    if options.jitter <= 0:
+        return median
+    return random.lognormvariate(math.log(median), options.jitter) if median > 0 else 0
+
+def route(method, path):
+    """ (status, Location) for a path; see the docstring at the top of the file. """
+    parts = path.split('?')[0].strip('/').split('/')
+    kind, rest = parts[0], parts[1:]
+    n = rest[-1] if rest else '0'
+
+    if kind == 'ok':
+        return 200, None
+    if kind == 'nohead':
+        return (405, None) if method == 'HEAD' else (200, None)
+    if kind == 'moved':
+        return 301, f"/ok/{n}"
+    if kind == 'temp':
+        return 302, f"/ok/{n}"
+    if kind == 'chain':
+        hops = int(rest[0]) if len(rest) > 1 and rest[0].isdigit() else 1
+        return (302, f"/chain/{hops - 1}/{n}") if hops > 1 else (302, f"/ok/{n}")
+    if kind == 'loop':
+        return 302, f"/loop/{n}"
+    if kind == 'missing':
+        return 404, None
+    if kind == 'error':
+        return 500, None
+    return 404, None
+
+def make_handler(options, stats):
+    """ A request handler class bound to our options and counters. """
+
+    class FakeSiteHandler(BaseHTTPRequestHandler):
+        # keep-alive, like real servers; the checker's session reuses connections
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def setup(self):
+            super().setup()
+            port = self.server.server_address[1]
+            with stats['lock']:
+                host = host_stats(stats, port)
+                host['connections'] += 1
+                host['peak_connections'] = max(host['peak_connections'], host['connections'])
+                stats['connections'] += 1
+                stats['peak_connections'] = max(stats['peak_connections'], stats['connections'])
+
+        def finish(self):
+            with stats['lock']:
+                host_stats(stats, self.server.server_address[1])['connections'] -= 1
+                stats['connections'] -= 1
+            super().finish()
+
+        def send(self, status, location=None, body=b'', headers=None):
+            self.send_response(status)
+            if location:
+                self.send_header('Location', location)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(body)
+
+        def answer(self):
+            if self.path.startswith('/__stats'):
+                self.send(200, body=json.dumps(stats_report(stats)).encode(), headers={'Content-Type': 'application/json'})
+                return
+            if self.path.startswith('/__reset'):
+                reset_stats(stats)
+                self.send(200)
+                return
+
+            if self.path.startswith('/timeout/'):
+                self.hang()
+                return
+
+            port = self.server.server_address[1]
+            with stats['lock']:
+                host = host_stats(stats, port)
+                host['in_flight'] += 1
+                host['peak_in_flight'] = max(host['peak_in_flight'], host['in_flight'])
+                throttled = bool(options.host_limit) and host['in_flight'] > options.host_limit
+
+            try:
+                if throttled:
+                    status = 429
+                    self.send(status, headers={'Retry-After': str(options.retry_after)})
+                else:
+                    status, location = route(self.command, self.path)
+                    time.sleep(response_time(options))
+                    self.send(status, location, b'<html><body>fake legislature page</body></html>' if status == 200 else b'', {'ETag': f'"{self.path}"'} if status == 200 else None)
+            finally:
+                with stats['lock']:
+                    host['in_flight'] -= 1
+                    host['requests'] += 1
+                    stats['requests'] += 1
+                    host['by_status'][str(status)] = host['by_status'].get(str(status), 0) + 1
+                    if throttled:
+                        stats['throttled'] += 1
+
+        def hang(self):
+            # never answers in time: sits on the request until --hang runs out or the checker gives up and hangs up.
+            # A dead page isn't load on the site, so it doesn't count towards --host-limit
+            with stats['lock']:
+                host = host_stats(stats, self.server.server_address[1])
+                host['requests'] += 1
+                host['by_status']['hung'] = host['by_status'].get('hung', 0) + 1
+                stats['requests'] += 1
+
+            deadline = time.monotonic() + options.hang
+            while time.monotonic() < deadline:
+                readable, _, _ = select.select([self.connection], [], [], 0.1)
+                if readable and not self.connection.recv(1, socket.MSG_PEEK):
+                    break
+            self.close_connection = True
+
+        def do_HEAD(self):
+            self.answer()
+
+        def do_GET(self):
+            self.answer()
+
+    return FakeSiteHandler
+
+class FakeSiteServer(ThreadingHTTPServer):
+    # one thread per connection; they mustn't keep the process alive once we're told to stop
+    daemon_threads = True
+    request_queue_size = 128
+
+def start_servers(options, stats=None):
+    """ Start one server per host, each on its own thread. Returns (servers, stats). """
+    stats = stats or new_stats()
+    handler = make_handler(options, stats)
+
+    servers = []
+    for port in range(options.base_port, options.base_port + options.hosts):
+        server = FakeSiteServer((options.bind, port), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+
+    return servers, stats
+
+def main():
+    options = get_cli_arguments()
+    if options.seed is not None:
+        random.seed(options.seed)
+
+    try:
+        servers, _ = start_servers(options)
+    except OSError as e:
+        print(f'\n\nERROR: could not start the fake hosts on ports {options.base_port}-{options.base_port + options.hosts - 1}: {e}')
+        sys.exit(1)
+
+    print(f"Serving {options.hosts} fake hosts on http://{options.bind}:{options.base_port}-{options.base_port + options.hosts - 1} ({options.latency:g} ms median latency). Ctrl+C to stop.", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,131 @@
+#!/usr/bin/python3
+""" Renders ACF state XML records to HTML with statetemplatev5.xsl.
+
+    The stylesheet is compiled once per process and reused. Give a single XML file,
+    a directory of state XMLs, or a glob; several files are transformed in parallel
+    worker processes. acf_parse-docx-to-xml.py calls render_html() directly with the
+    tree it has just built.
+"""
+import os
+import sys
+import time
+import argparse
+from glob import glob
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from lxml import etree
 
-# Paths to your files
-xml_file = 'C:/ACF/FINAL APPROVED STATE RECORDS/Tennessee/tennessee_20250219.xml'
-xsl_file = 'C:/icpsr_github/metadata/acf/statetemplatev5_edit.xsl'
-output_html = 'C:/ACF/FINAL APPROVED STATE RECORDS/Tennessee/tennessee_20250410.html'
+# stylesheet used when none is given on the command line
+DEFAULT_XSL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'statetemplatev5.xsl')
+
+# compiled XSLT transforms, keyed by (path, modification time)
+TRANSFORMS = {}
+
+def get_cli_arguments():
+    """ Parse command line arguments and return an object whose members contain the argument values. """
+    parser = argparse.ArgumentParser(description="Render ACF state XML records to HTML")
+    parser.add_argument('target', type=str, help='State XML file, directory of state XMLs, or a glob (quote it so the shell leaves it alone)')
+    parser.add_argument('--xsl', dest='xsl_file', type=str, default=DEFAULT_XSL_FILE, help='XSL stylesheet (default: statetemplatev5.xsl next to this script)')
+    parser.add_argument('--out-dir', dest='out_dir', type=str, help='Where to write the HTML (default: next to each XML file)')
+    parser.add_argument('--workers', dest='workers', type=int, help='Number of worker processes (default: one per CPU core)')
+    return parser.parse_args()
+
+def get_transform(xsl_file):
+    """ Return the compiled XSLT for xsl_file, compiling it only the first time it's asked for (or after it changes). """
+    cache_key = (os.path.abspath(xsl_file), os.path.getmtime(xsl_file))
+    if cache_key not in TRANSFORMS:
+        TRANSFORMS[cache_key] = etree.XSLT(etree.parse(xsl_file))
+
+    return TRANSFORMS[cache_key]
+
+def render_html(xml_doc, xsl_file, html_file):
+    """ Transform xml_doc (an lxml tree/element or a path to an XML file) and write the result to html_file. """
+    if isinstance(xml_doc, (str, os.PathLike)):
+        xml_doc = etree.parse(xml_doc)
+
+    html_tree = get_transform(xsl_file)(xml_doc)
+
+    # write next to the old page and swap it in, so anyone viewing html_file never sees a half-written page
+    temp_file = f"{html_file}.tmp"
+    html_tree.write(temp_file, pretty_print=True, method="html")
+    os.replace(temp_file, html_file)
+
+    return html_file
+
+def find_xml_files(target):
+    """ A single file is used as-is, a directory means every XML file in it, and anything else is treated as a glob. """
+    if os.path.isfile(target):
+        return [target]
+
+    if os.path.isdir(target):
+        return sorted(glob(os.path.join(target, '*.xml')))
+
+    return sorted(path for path in glob(target) if path.lower().endswith('.xml'))
+
+def html_path(xml_file, out_dir=None):
+    """ <state>_<YYYYMMDD>.xml becomes <state>_<YYYYMMDD>.html, in out_dir if we have one. """
+    html_file = f"{os.path.splitext(xml_file)[0]}.html"
+    if out_dir:
+        html_file = os.path.join(out_dir, os.path.basename(html_file))
+
+    return html_file
+
+def render_file(xml_file, xsl_file, out_dir=None):
+    """ Worker entry point: render one file and report back rather than raising, so one bad record doesn't stop the batch. """
+    start = time.perf_counter()
+    try:
+        html_file = render_html(xml_file, xsl_file, html_path(xml_file, out_dir))
+        return xml_file, html_file, None, time.perf_counter() - start
+    except (OSError, etree.Error) as ex:
+        return xml_file, None, str(ex), time.perf_counter() - start
+
+def render_batch(xml_files, xsl_file, out_dir=None, workers=None):
+    """ Render every file in xml_files, spreading the work over a pool of processes (each compiles the stylesheet once). """
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    # fail fast on a broken stylesheet rather than once per file in every worker
+    get_transform(xsl_file)
+
+    # nothing to gain from a pool for a single file
+    workers = min(workers or os.cpu_count() or 1, len(xml_files))
+    if workers <= 1:
+        return [render_file(xml_file, xsl_file, out_dir) for xml_file in xml_files]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(render_file, xml_file, xsl_file, out_dir) for xml_file in xml_files]
+        for future in as_completed(futures):
+            results.append(future.result())
+
+    return sorted(results)
+
+def main():
+    args = get_cli_arguments()
+
+    xml_files = find_xml_files(args.target)
+    if not xml_files:
+        print(f'\n\nNo XML files found at {args.target}.')
+        sys.exit(1)
+
+    if not os.path.exists(args.xsl_file):
+        print(f'\n\nERROR: XSL stylesheet {args.xsl_file} does not exist.')
+        sys.exit(1)
+
+    start = time.perf_counter()
+    results = render_batch(xml_files, args.xsl_file, args.out_dir, args.workers)
 
-# Parse the XML and XSL files
-xml_doc = etree.parse(xml_file)
-xsl_doc = etree.parse(xsl_file)
+    failures = 0
+    for xml_file, html_file, error, elapsed in results:
+        if error:
+            failures += 1
+            print(f' - {os.path.basename(xml_file)}: FAILED ({error})')
+        else:
+            print(f' - {os.path.basename(xml_file)} -> {html_file} ({elapsed:.2f}s)')
 
-# Create an XSLT transformer
-transform = etree.XSLT(xsl_doc)
+    print(f'\n\nRendered {len(results) - failures} of {len(results)} file(s) in {time.perf_counter() - start:.1f}s.')
 
-# Apply the transformation
-result_tree = transform(xml_doc)
+    if failures:
+        sys.exit(1)
 
-# Save the result to an HTML file
-with open(output_html, 'wb') as f:
-    f.write(etree.tostring(result_tree, pretty_print=True, method="html"))
+if __name__ == "__main__":
+    main()
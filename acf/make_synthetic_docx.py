@@ -0,0 +1,298 @@
+#!/usr/bin/python3
+""" Builds a synthetic ACF state record (DOCX) in the table layout acf_parse-docx-to-xml.py expects.
+
+    Title rows have an empty first cell, the title (and category, if the state uses them) in the
+    second and 'ACF Offices Associated' in the third. Article rows have the Domain/Title/Article
+    overview and 'Associated Federal Records' in the first cell and 'Definitions related to' and
+    'Requirements related to' blocks in the second. Statute citations follow the patterns in the
+    chosen state config, and are linked with a mix of <w:hyperlink> elements and HYPERLINK fields.
+    A small share of vocabulary terms are misspelled so the fuzzy matching gets exercised too.
+"""
+import os
+import re
+import sys
+import json
+import random
+import argparse
+from docx import Document
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+import acf_vocabs
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# how many times we'll try to come up with a citation the state's patterns accept before giving up
+CITATION_ATTEMPTS = 200
+
+def get_cli_arguments():
+    """ Parse command line arguments and return an object whose members contain the argument values. """
+    parser = argparse.ArgumentParser(description="Generate a synthetic ACF state record (DOCX) for testing and benchmarking the parser")
+    parser.add_argument('output', type=str, help='Path of the DOCX file to write')
+    parser.add_argument('--config', dest='config', type=str, default=os.path.join(SCRIPT_DIR, 'acf_parse_config.json'), help='State config whose names and citation patterns to use (default: acf_parse_config.json)')
+    parser.add_argument('--titles', dest='titles', type=int, default=5, help='Number of titles (default: 5)')
+    parser.add_argument('--articles', dest='articles', type=int, default=10, help='Articles per title (default: 10)')
+    parser.add_argument('--statutes', dest='statutes', type=int, default=10, help='Requirement statutes per article (default: 10)')
+    parser.add_argument('--definitions', dest='definitions', type=int, default=2, help='Definition statutes per article (default: 2)')
+    parser.add_argument('--typo-rate', dest='typo_rate', type=float, default=0.05, help='Share of vocabulary terms to misspell (default: 0.05)')
+    parser.add_argument('--seed', dest='seed', type=int, default=1, help='Random seed, so the same arguments always give the same document (default: 1)')
+    return parser.parse_args()
+
+def load_state_config(config_path):
+    """ Read a state config, turning the 'true'/'false' strings the parser uses into booleans. """
+    with open(config_path, 'r', encoding='utf-8') as file:
+        details = json.load(file)
+
+    for term in ["category", "titleContent"]:
+        details[term] = str(details.get(term)).lower() == 'true'
+
+    return details
+
+def example_string(parsed, rng):
+    """ Walk a parsed regular expression and build a string it matches (digits wherever we have a choice). """
+    output = []
+
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            output.append(chr(av))
+        elif op in (sre_parse.NOT_LITERAL, sre_parse.ANY):
+            output.append('x')
+        elif op is sre_parse.IN:
+            output.append(example_char(av, rng))
+        elif op is sre_parse.CATEGORY:
+            output.append(example_char([(op, av)], rng))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            min_count, max_count, item = av
+            count = max(min_count, min(max_count, rng.randint(1, 3)))
+            output.extend(example_string(item, rng) for _ in range(count))
+        elif op is sre_parse.SUBPATTERN:
+            output.append(example_string(av[-1], rng))
+        elif op is sre_parse.BRANCH:
+            output.append(example_string(rng.choice(av[1]), rng))
+
+        # anchors (^, $, \b) don't add any text
+
+    return ''.join(output)
+
+def example_char(items, rng):
+    """ Pick one character from a character class: a digit if the class allows it, otherwise its first option. """
+    literals = []
+
+    for op, av in items:
+        if op is sre_parse.CATEGORY:
+            if av in (sre_parse.CATEGORY_DIGIT, sre_parse.CATEGORY_WORD):
+                return str(rng.randint(1, 9))
+            if av is sre_parse.CATEGORY_SPACE:
+                literals.append(' ')
+        elif op is sre_parse.RANGE:
+            low, high = av
+            if low <= ord('1') <= high:
+                return str(rng.randint(1, min(9, high - ord('0'))))
+            literals.append(chr(low))
+        elif op is sre_parse.LITERAL:
+            literals.append(chr(av))
+
+    return literals[0] if literals else 'x'
+
+def citation_maker(details, rng):
+    """ Return a function that hands out unique citations matching both the definition and requirement patterns in details. """
+    statute_pattern = re.compile(details['statute_pattern'])
+    state_code_pattern = re.compile(details['state_code_pattern'])
+
+    # the citation itself is the first group of the definition pattern
+    parsed = sre_parse.parse(details['statute_pattern'])
+    citation_group = next((av[-1] for op, av in parsed if op is sre_parse.SUBPATTERN), None)
+    if citation_group is None:
+        print(f"\n\nERROR: statute_pattern for {details['state']} has no group for the citation.")
+        sys.exit(1)
+
+    seen = set()
+
+    def make_citation():
+        for _ in range(CITATION_ATTEMPTS):
+            citation = re.sub(r'\s+', ' ', example_string(citation_group, rng)).strip()
+            if citation in seen:
+                continue
+
+            # make sure the parser will read it back exactly, both as a definition and as a requirement
+            defn_match = statute_pattern.search(f"{citation} – Term")
+            req_match = state_code_pattern.search(f"Label – Description ({citation})")
+            if defn_match and defn_match.group(1) == citation and req_match and req_match.group(3).strip() == citation:
+                seen.add(citation)
+                return citation
+
+        print(f"\n\nERROR: unable to build citations that match the patterns for {details['state']}; check statute_pattern and state_code_pattern.")
+        sys.exit(1)
+
+    return make_citation
+
+def misspell(term, rng, typo_rate):
+    """ Drop one letter from term, typo_rate of the time. """
+    if len(term) < 6 or rng.random() >= typo_rate:
+        return term
+
+    idx = rng.randrange(1, len(term) - 1)
+    return term[:idx] + term[idx+1:]
+
+def link_url(*parts):
+    """ Stable, unique URL for a synthetic link. """
+    path = '/'.join(re.sub(r'[^\w.-]+', '-', str(part)) for part in parts)
+    return f"https://example.org/statutes/{path}"
+
+def add_hyperlink(paragraph, text, url):
+    """ Append a <w:hyperlink> with text to paragraph, the way Word stores most links. """
+    r_id = paragraph.part.relate_to(url, RT.HYPERLINK, is_external=True)
+    hyperlink = OxmlElement('w:hyperlink')
+    hyperlink.set(qn('r:id'), r_id)
+    hyperlink.append(text_run(text))
+    paragraph._p.append(hyperlink)
+
+def add_hyperlink_field(paragraph, text, url):
+    """ Append a HYPERLINK field (begin / instrText / separate / text / end), the other way Word stores links. """
+    instr_run = OxmlElement('w:r')
+    instr_text = OxmlElement('w:instrText')
+    instr_text.set(qn('xml:space'), 'preserve')
+    instr_text.text = f' HYPERLINK "{url}" '
+    instr_run.append(instr_text)
+
+    for run in [field_char_run('begin'), instr_run, field_char_run('separate'), text_run(text), field_char_run('end')]:
+        paragraph._p.append(run)
+
+def field_char_run(field_type):
+    run = OxmlElement('w:r')
+    fld_char = OxmlElement('w:fldChar')
+    fld_char.set(qn('w:fldCharType'), field_type)
+    run.append(fld_char)
+    return run
+
+def text_run(text):
+    run = OxmlElement('w:r')
+    run_text = OxmlElement('w:t')
+    run_text.set(qn('xml:space'), 'preserve')
+    run_text.text = text
+    run.append(run_text)
+    return run
+
+def add_link(paragraph, text, url, as_field=False):
+    if as_field:
+        add_hyperlink_field(paragraph, text, url)
+    else:
+        add_hyperlink(paragraph, text, url)
+
+def next_paragraph(cell):
+    """ Use a new cell's empty first paragraph before adding more. """
+    if len(cell.paragraphs) == 1 and not cell.paragraphs[0].text:
+        return cell.paragraphs[0]
+    return cell.add_paragraph()
+
+def add_title_row(table, details, title, rng, typo_rate):
+    cells = table.add_row().cells
+
+    # first cell stays empty; that's how the parser spots a title row
+    title_cell = cells[1]
+    if details['category']:
+        add_link(next_paragraph(title_cell), title['category'], link_url(title['number'], 'category'))
+    next_paragraph(title_cell).add_run(title['label'])
+    add_link(next_paragraph(title_cell), title['name'], title['url'])
+
+    office_cell = cells[2]
+    next_paragraph(office_cell).add_run('ACF Offices Associated')
+    for office in rng.sample(acf_vocabs.CONTROLLED_VOCABS['offices'][:-1], rng.randint(1, 3)):
+        next_paragraph(office_cell).add_run(misspell(office, rng, typo_rate))
+
+def add_article_row(table, details, title, a_idx, counts, make_citation, rng, typo_rate):
+    cells = table.add_row().cells
+    article_number = f"{title['number']}-{a_idx + 1}"
+
+    # overview: Domain, Title, Article, Associated Federal Records
+    overview_cell = cells[0]
+    next_paragraph(overview_cell).add_run('Domain:')
+    next_paragraph(overview_cell).add_run(misspell(rng.choice(acf_vocabs.CONTROLLED_VOCABS['domains']), rng, typo_rate))
+    next_paragraph(overview_cell).add_run(title['label'])
+    add_link(next_paragraph(overview_cell), title['name'], title['url'])
+    if details['articleName']:
+        next_paragraph(overview_cell).add_run(f"{details['articleName']} {article_number}")
+        add_link(next_paragraph(overview_cell), f"Synthetic article {article_number}", link_url(article_number))
+    next_paragraph(overview_cell).add_run('Associated Federal Records')
+    for federal in rng.sample(acf_vocabs.CONTROLLED_VOCABS['federal'][:-1], rng.randint(1, 4)):
+        next_paragraph(overview_cell).add_run(misspell(federal, rng, typo_rate))
+
+    # statutes: definitions, then requirements (label – description (citation), who it applies to, tags)
+    statute_cell = cells[1]
+    if counts['definitions']:
+        next_paragraph(statute_cell).add_run(f"Definitions related to {article_number}")
+        for d_idx in range(counts['definitions']):
+            citation = make_citation()
+            paragraph = next_paragraph(statute_cell)
+            add_link(paragraph, citation, link_url(article_number, 'def', d_idx), as_field=bool(d_idx % 2))
+            paragraph.add_run(f" – Term {d_idx}A, Term {d_idx}B")
+
+    if counts['statutes']:
+        next_paragraph(statute_cell).add_run(f"Requirements related to {article_number}")
+        for s_idx in range(counts['statutes']):
+            citation = make_citation()
+            paragraph = next_paragraph(statute_cell)
+            paragraph.add_run(f"Requirement {s_idx + 1} – Description of requirement {s_idx + 1} for {article_number} (")
+            add_link(paragraph, citation, link_url(article_number, 'req', s_idx), as_field=bool(s_idx % 2))
+            paragraph.add_run(")")
+            next_paragraph(statute_cell).add_run('Who Law Applies To: State agencies; Tribal agencies')
+            tags = [misspell(tag, rng, typo_rate) for tag in rng.sample(acf_vocabs.CONTROLLED_VOCABS['terms'], rng.randint(1, 4))]
+            next_paragraph(statute_cell).add_run(f"Tags: {'; '.join(tags)}")
+
+def build_document(details, titles=5, articles=10, statutes=10, definitions=2, typo_rate=0.05, seed=1):
+    """ Build (but don't save) a synthetic record for the state described by details. """
+    rng = random.Random(seed)
+    make_citation = citation_maker(details, rng)
+    counts = {"statutes": statutes, "definitions": definitions}
+
+    doc = Document()
+    doc.add_heading(f"{details['state']} (synthetic record)", level=1)
+
+    # the parser skips the table of contents; include one so that path is exercised as well
+    toc = doc.add_table(rows=1, cols=1)
+    toc.rows[0].cells[0].text = 'Table of Contents'
+
+    for t_idx in range(titles):
+        number = f"{t_idx + 1}{rng.choice(['', 'A', 'B'])}"
+        title = {
+            "number": number,
+            "label": f"{details['titleName']} {number}",
+            "name": f"Synthetic Human Services Code {number}",
+            "url": link_url(number),
+            "category": f"Division {t_idx // 3 + 1}: Social Services"
+        }
+
+        # one table per title; real records use a mix of a few large tables and many small ones
+        table = doc.add_table(rows=0, cols=3)
+        add_title_row(table, details, title, rng, typo_rate)
+        for a_idx in range(articles):
+            add_article_row(table, details, title, a_idx, counts, make_citation, rng, typo_rate)
+
+    return doc
+
+def generate_docx(output, config_path, titles=5, articles=10, statutes=10, definitions=2, typo_rate=0.05, seed=1):
+    """ Build a synthetic record and save it to output. """
+    details = load_state_config(config_path)
+    doc = build_document(details, titles, articles, statutes, definitions, typo_rate, seed)
+    doc.save(output)
+
+    return output
+
+def main():
+    args = get_cli_arguments()
+
+    if not os.path.exists(args.config):
+        print(f"\n\nConfig file is missing; please be sure {args.config} exists.")
+        sys.exit(1)
+
+    generate_docx(args.output, args.config, args.titles, args.articles, args.statutes, args.definitions, args.typo_rate, args.seed)
+    print(f"\n\nWrote {args.output}: {args.titles} titles x {args.articles} articles x ({args.definitions} definitions + {args.statutes} requirements)")
+
+if __name__ == "__main__":
+    main()
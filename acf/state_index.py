@@ -0,0 +1,458 @@
+#!/usr/bin/python3
+""" Loads parsed ACF state records into one SQLite database, so questions that span states can be
+    answered with a query instead of opening dozens of XML or HTML files.
+
+    Each state is replaced as a whole ("upserted") whenever it is indexed again; XML files that
+    haven't changed since they were last indexed are skipped unless --force is given. Titles,
+    articles (with their subtitle, part and subpart) and statutes each have their own table; offices, federal records, entities and terms
+    are stored once and linked. Requirement labels and descriptions are full-text indexed (FTS5).
+
+    Example: which states have Data Retention requirements that apply to tribal agencies?
+
+        SELECT DISTINCT s.state
+        FROM statutes st
+        JOIN articles a USING (article_id) JOIN titles t USING (title_id) JOIN states s USING (state_id)
+        JOIN statute_terms stt USING (statute_id) JOIN terms tm USING (term_id)
+        JOIN statute_entities ste USING (statute_id) JOIN entities e USING (entity_id)
+        WHERE tm.name = 'Data Retention' AND e.name = 'Tribal agencies';
+
+    The parser can also index a state as it runs (acf_parse-docx-to-xml.py --index-db).
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from glob import glob
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from lxml import etree
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS states (
+    state_id INTEGER PRIMARY KEY,
+    state TEXT NOT NULL UNIQUE,
+    title_name TEXT,
+    article_name TEXT,
+    source_file TEXT,
+    source_signature TEXT,
+    indexed_at TEXT
+);
+CREATE TABLE IF NOT EXISTS titles (
+    title_id INTEGER PRIMARY KEY,
+    state_id INTEGER NOT NULL REFERENCES states(state_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    category TEXT,
+    number TEXT,
+    name TEXT,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS articles (
+    article_id INTEGER PRIMARY KEY,
+    title_id INTEGER NOT NULL REFERENCES titles(title_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    title_content INTEGER NOT NULL DEFAULT 0,
+    domain TEXT,
+    number TEXT,
+    name TEXT,
+    source TEXT,
+    subtitle_number TEXT,
+    subtitle_name TEXT,
+    part_number TEXT,
+    part_name TEXT,
+    subpart_number TEXT,
+    subpart_name TEXT
+);
+CREATE TABLE IF NOT EXISTS statutes (
+    statute_id INTEGER PRIMARY KEY,
+    article_id INTEGER NOT NULL REFERENCES articles(article_id) ON DELETE CASCADE,
+    kind TEXT NOT NULL CHECK (kind IN ('requirement', 'definition')),
+    position INTEGER NOT NULL,
+    label TEXT,
+    description TEXT,
+    state_code TEXT,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS defined_terms (
+    statute_id INTEGER NOT NULL REFERENCES statutes(statute_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    PRIMARY KEY (statute_id, position)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS offices (office_id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS federal_records (federal_id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS entities (entity_id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS terms (term_id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+
+CREATE TABLE IF NOT EXISTS title_offices (
+    title_id INTEGER NOT NULL REFERENCES titles(title_id) ON DELETE CASCADE,
+    office_id INTEGER NOT NULL REFERENCES offices(office_id),
+    PRIMARY KEY (title_id, office_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS article_federal_records (
+    article_id INTEGER NOT NULL REFERENCES articles(article_id) ON DELETE CASCADE,
+    federal_id INTEGER NOT NULL REFERENCES federal_records(federal_id),
+    PRIMARY KEY (article_id, federal_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS statute_entities (
+    statute_id INTEGER NOT NULL REFERENCES statutes(statute_id) ON DELETE CASCADE,
+    entity_id INTEGER NOT NULL REFERENCES entities(entity_id),
+    PRIMARY KEY (statute_id, entity_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS statute_terms (
+    statute_id INTEGER NOT NULL REFERENCES statutes(statute_id) ON DELETE CASCADE,
+    term_id INTEGER NOT NULL REFERENCES terms(term_id),
+    PRIMARY KEY (statute_id, term_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS titles_state ON titles(state_id);
+CREATE INDEX IF NOT EXISTS articles_title ON articles(title_id);
+CREATE INDEX IF NOT EXISTS statutes_article ON statutes(article_id);
+CREATE INDEX IF NOT EXISTS statutes_state_code ON statutes(state_code);
+CREATE INDEX IF NOT EXISTS title_offices_office ON title_offices(office_id, title_id);
+CREATE INDEX IF NOT EXISTS article_federal_records_federal ON article_federal_records(federal_id, article_id);
+CREATE INDEX IF NOT EXISTS statute_entities_entity ON statute_entities(entity_id, statute_id);
+CREATE INDEX IF NOT EXISTS statute_terms_term ON statute_terms(term_id, statute_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS statute_fts USING fts5(label, description, tokenize = 'porter unicode61');
+"""
+
+# columns added since the first version of the schema; CREATE TABLE IF NOT EXISTS won't add them to an existing database
+ADDED_COLUMNS = {
+    "articles": ["subpart_number TEXT", "subpart_name TEXT"],
+}
+
+# the lookup tables, and the link table/column that points at each of them
+VOCAB_TABLES = {
+    "offices": ("office_id", "title_offices", "title_id"),
+    "federal_records": ("federal_id", "article_federal_records", "article_id"),
+    "entities": ("entity_id", "statute_entities", "statute_id"),
+    "terms": ("term_id", "statute_terms", "statute_id"),
+}
+
+# full-text search results: one line per requirement, best match first
+SEARCH_SQL = """
+SELECT s.state, t.number, a.number, st.state_code, st.label
+FROM statute_fts
+JOIN statutes st ON st.statute_id = statute_fts.rowid
+JOIN articles a USING (article_id) JOIN titles t USING (title_id) JOIN states s USING (state_id)
+WHERE statute_fts MATCH ?
+ORDER BY statute_fts.rank
+LIMIT ?
+"""
+
+def get_cli_arguments():
+    """ Parse command line arguments and return an object whose members contain the argument values. """
+    parser = argparse.ArgumentParser(description="Index parsed ACF state records (XML) in a SQLite database")
+    parser.add_argument('--db', dest='db', type=str, default='acf_index.sqlite', help='SQLite database to create or update (default: acf_index.sqlite)')
+    parser.add_argument('--load', dest='load', type=str, nargs='+', default=[], help='State XML files, directories of them, or globs to (re-)index')
+    parser.add_argument('--force', dest='force', action='store_true', help='Re-index files even if they have not changed since they were last indexed')
+    parser.add_argument('--workers', dest='workers', type=int, help='Processes used to read XML files (default: one per CPU core)')
+    parser.add_argument('--remove', dest='remove', type=str, nargs='+', default=[], help='States to drop from the index')
+    parser.add_argument('--search', dest='search', type=str, help='Full-text search of requirement labels and descriptions (FTS5 query syntax)')
+    parser.add_argument('--sql', dest='sql', type=str, help='Run a SQL query against the index and print the results')
+    parser.add_argument('--limit', dest='limit', type=int, default=50, help='Maximum rows shown for --search (default: 50)')
+    return parser.parse_args()
+
+def connect(db_file):
+    """ Open (creating if needed) the index database. """
+    conn = sqlite3.connect(db_file)
+
+    # WAL lets queries run while a state is being re-indexed; cascading deletes are what make per-state upserts simple
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute('PRAGMA foreign_keys = ON')
+    try:
+        conn.executescript(SCHEMA)
+        add_missing_columns(conn)
+    except sqlite3.OperationalError as ex:
+        print(f'\n\nERROR: could not set up {db_file} ({ex}). The full-text index needs SQLite built with FTS5.')
+        sys.exit(1)
+
+    return conn
+
+def add_missing_columns(conn):
+    """ Bring a database made by an older version up to date. States indexed before then have no values in the new columns until they are re-indexed (--force). """
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for column in columns:
+            if column.split()[0] not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+
+def file_signature(path):
+    """ Size and modification time; enough to tell whether an XML file has changed since it was indexed. """
+    stats = os.stat(path)
+    return f"{stats.st_size}:{stats.st_mtime_ns}"
+
+def child_text(element, name):
+    """ Stripped text of the first child called name, or None. """
+    child = element.find(name)
+    if child is None or child.text is None:
+        return None
+    return child.text.strip()
+
+def child_list(element, path):
+    """ Stripped text of every element at path. """
+    return [item.text.strip() for item in element.iterfind(path) if item.text]
+
+def read_section(element):
+    """ The number/name/source of a <subtitle>, <part> or <category>. """
+    return {name: child_text(element, name) for name in ['number', 'name', 'source'] if element.find(name) is not None}
+
+def read_article(element):
+    """ One <article> or <titleContent>, in the same shape the parser's record_data uses. """
+    article = {
+        "found_titleContent": element.tag == 'titleContent',
+        "domain": child_text(element, 'domain'),
+        "number": child_text(element, 'number'),
+        "name": child_text(element, 'name'),
+        "source": child_text(element, 'source'),
+        "associatedFederalRecords": child_list(element, 'associatedFederalRecords/federal'),
+        "definitions": [],
+        "requirements": []
+    }
+    for section in ['subtitle', 'part']:
+        if element.find(section) is not None:
+            article[section] = read_section(element.find(section))
+    if element.find('part/subPart') is not None:
+        article['part']['subPart'] = read_section(element.find('part/subPart'))
+
+    for statute in element.iterfind('definitions/statute'):
+        article['definitions'].append({
+            "state_code": child_text(statute, 'stateCode'),
+            "source": child_text(statute, 'source'),
+            "defined_terms": child_list(statute, 'definedTerms/definedTerm')
+        })
+    for statute in element.iterfind('requirements/statute'):
+        article['requirements'].append({
+            "label": child_text(statute, 'label'),
+            "description": child_text(statute, 'description'),
+            "state_code": child_text(statute, 'stateCode'),
+            "source": child_text(statute, 'source'),
+            "entities": child_list(statute, 'appliesTo/entity'),
+            "tags": child_list(statute, 'terms/term')
+        })
+
+    return article
+
+def read_state_xml(xml_file):
+    """ Read a state XML (as written by write_xml) into a header dict and a list of titles shaped like the parser's record_data values. """
+    header = {"source_file": os.path.abspath(xml_file), "source_signature": file_signature(xml_file)}
+    titles = []
+
+    for _, element in etree.iterparse(xml_file, events=('end',), tag=('state', 'titleName', 'articleName', 'title'), remove_blank_text=True):
+        if element.tag != 'title':
+            header[element.tag] = (element.text or '').strip()
+            continue
+
+        title = {
+            "number": child_text(element, 'number'),
+            "name": child_text(element, 'name'),
+            "source": child_text(element, 'source'),
+            "officesAssociated": child_list(element, 'officesAssociated/office'),
+            "articles": [read_article(article) for article in element if article.tag in ('article', 'titleContent')]
+        }
+        if element.getparent() is not None and element.getparent().tag == 'category':
+            title['category'] = read_section(element.getparent())
+        titles.append(title)
+
+        # titles are independent of each other; let go of each one once it has been read
+        element.clear()
+        previous = element.getprevious()
+        while previous is not None and previous.tag == 'title':
+            element.getparent().remove(previous)
+            previous = element.getprevious()
+
+    return header, titles
+
+def vocab_ids(conn, table, names, cache):
+    """ ids for names in one of the lookup tables, adding any names we haven't seen before. """
+    id_column = VOCAB_TABLES[table][0]
+    missing = [name for name in dict.fromkeys(names) if name not in cache]
+    if missing:
+        conn.executemany(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", [(name,) for name in missing])
+        for name in missing:
+            cache[name] = conn.execute(f"SELECT {id_column} FROM {table} WHERE name = ?", (name,)).fetchone()[0]
+
+    return [cache[name] for name in names]
+
+def delete_state(conn, state):
+    """ Drop a state and everything under it. FTS rows are removed by hand; the rest goes via ON DELETE CASCADE. """
+    conn.execute("""
+        DELETE FROM statute_fts WHERE rowid IN (
+            SELECT statute_id FROM statutes JOIN articles USING (article_id) JOIN titles USING (title_id) JOIN states USING (state_id) WHERE state = ?
+        )""", (state,))
+    return conn.execute("DELETE FROM states WHERE state = ?", (state,)).rowcount
+
+def index_state(conn, header, titles, vocab_cache=None):
+    """ Replace everything we have for one state with titles (shaped like the parser's record_data values), in a single transaction. """
+    vocab_cache = vocab_cache if vocab_cache is not None else {table: {} for table in VOCAB_TABLES}
+    links = {table: [] for table in VOCAB_TABLES}
+    counts = {"titles": 0, "articles": 0, "statutes": 0}
+
+    with conn:
+        delete_state(conn, header['state'])
+        state_id = conn.execute(
+            "INSERT INTO states (state, title_name, article_name, source_file, source_signature, indexed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (header['state'], header.get('titleName'), header.get('articleName'), header.get('source_file'), header.get('source_signature'), datetime.now().isoformat(timespec='seconds'))
+        ).lastrowid
+
+        defined_term_rows = []
+        fts_rows = []
+
+        for title_position, title in enumerate(titles):
+            title_id = conn.execute(
+                "INSERT INTO titles (state_id, position, category, number, name, source) VALUES (?, ?, ?, ?, ?, ?)",
+                (state_id, title_position, (title.get('category') or {}).get('name'), title.get('number'), title.get('name'), title.get('source'))
+            ).lastrowid
+            links['offices'].extend((title_id, office_id) for office_id in vocab_ids(conn, 'offices', title.get('officesAssociated', []), vocab_cache['offices']))
+            counts['titles'] += 1
+
+            for article_position, article in enumerate(title.get('articles', [])):
+                subtitle = article.get('subtitle') or {}
+                part = article.get('part') or {}
+                subpart = part.get('subPart') or {}
+                article_id = conn.execute(
+                    "INSERT INTO articles (title_id, position, title_content, domain, number, name, source, subtitle_number, subtitle_name, part_number, part_name, subpart_number, subpart_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (title_id, article_position, int(bool(article.get('found_titleContent'))), article.get('domain'), article.get('number'), article.get('name'), article.get('source'),
+                     subtitle.get('number'), subtitle.get('name'), part.get('number'), part.get('name'), subpart.get('number'), subpart.get('name'))
+                ).lastrowid
+                links['federal_records'].extend((article_id, federal_id) for federal_id in vocab_ids(conn, 'federal_records', article.get('associatedFederalRecords', []), vocab_cache['federal_records']))
+                counts['articles'] += 1
+
+                for position, definition in enumerate(article.get('definitions', [])):
+                    statute_id = conn.execute(
+                        "INSERT INTO statutes (article_id, kind, position, state_code, source) VALUES (?, 'definition', ?, ?, ?)",
+                        (article_id, position, definition.get('state_code'), definition.get('source'))
+                    ).lastrowid
+                    defined_term_rows.extend((statute_id, term_position, term) for term_position, term in enumerate(definition.get('defined_terms', [])))
+                    counts['statutes'] += 1
+
+                for position, requirement in enumerate(article.get('requirements', [])):
+                    statute_id = conn.execute(
+                        "INSERT INTO statutes (article_id, kind, position, label, description, state_code, source) VALUES (?, 'requirement', ?, ?, ?, ?, ?)",
+                        (article_id, position, requirement.get('label'), requirement.get('description'), requirement.get('state_code'), requirement.get('source'))
+                    ).lastrowid
+                    fts_rows.append((statute_id, requirement.get('label'), requirement.get('description')))
+                    links['entities'].extend((statute_id, entity_id) for entity_id in vocab_ids(conn, 'entities', [entity for entity in requirement.get('entities', []) if entity], vocab_cache['entities']))
+                    links['terms'].extend((statute_id, term_id) for term_id in vocab_ids(conn, 'terms', [tag.replace('&amp;', '&') for tag in requirement.get('tags', [])], vocab_cache['terms']))
+                    counts['statutes'] += 1
+
+        # the link tables and the full-text index are written in bulk once the rows they point at exist
+        conn.executemany("INSERT OR IGNORE INTO defined_terms (statute_id, position, term) VALUES (?, ?, ?)", defined_term_rows)
+        conn.executemany("INSERT INTO statute_fts (rowid, label, description) VALUES (?, ?, ?)", fts_rows)
+        for table, (id_column, link_table, owner_column) in VOCAB_TABLES.items():
+            conn.executemany(f"INSERT OR IGNORE INTO {link_table} ({owner_column}, {id_column}) VALUES (?, ?)", links[table])
+
+    return counts
+
+def index_record_data(db_file, details, record_data):
+    """ Index a state straight from the parser's record_data (used by acf_parse-docx-to-xml.py --index-db). """
+    conn = connect(db_file)
+    try:
+        header = {"state": details['state'], "titleName": details.get('titleName'), "articleName": details.get('articleName'), "source_file": os.path.abspath(details['input_doc'])}
+        return index_state(conn, header, list(record_data.values()))
+    finally:
+        conn.close()
+
+def find_xml_files(targets):
+    """ Files are used as-is, directories mean every XML file in them, and anything else is treated as a glob. """
+    xml_files = []
+    for target in targets:
+        if os.path.isfile(target):
+            xml_files.append(target)
+        elif os.path.isdir(target):
+            xml_files.extend(sorted(glob(os.path.join(target, '*.xml'))))
+        else:
+            xml_files.extend(sorted(path for path in glob(target) if path.lower().endswith('.xml')))
+
+    return list(dict.fromkeys(os.path.abspath(path) for path in xml_files))
+
+def read_file(xml_file):
+    """ Worker entry point: read one XML file, reporting errors rather than raising so one bad file doesn't stop the load. """
+    try:
+        return xml_file, *read_state_xml(xml_file), None
+    except (OSError, etree.Error) as ex:
+        return xml_file, None, None, str(ex)
+
+def load_files(conn, xml_files, force=False, workers=None):
+    """ Bulk load: XML files are read in parallel and written to the database one state (one transaction) at a time. """
+    indexed = dict(conn.execute("SELECT source_file, source_signature FROM states"))
+    if not force:
+        unchanged = [path for path in xml_files if indexed.get(path) == file_signature(path)]
+        for path in unchanged:
+            print(f' - {os.path.basename(path)}: unchanged, skipped')
+        xml_files = [path for path in xml_files if path not in unchanged]
+
+    if not xml_files:
+        return 0
+
+    vocab_cache = {table: dict(conn.execute(f"SELECT name, {id_column} FROM {table}")) for table, (id_column, _, _) in VOCAB_TABLES.items()}
+
+    # dated outputs for the same state replace each other, so the newest file (last by name) wins
+    failures = 0
+    workers = min(workers or os.cpu_count() or 1, len(xml_files))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for xml_file, header, titles, error in executor.map(read_file, sorted(xml_files)):
+            if error or not header.get('state'):
+                failures += 1
+                print(f' - {os.path.basename(xml_file)}: FAILED ({error or "no <state> element"})')
+                continue
+
+            counts = index_state(conn, header, titles, vocab_cache)
+            print(f" - {os.path.basename(xml_file)}: {header['state']}, {counts['titles']} titles, {counts['articles']} articles, {counts['statutes']} statutes")
+
+    return failures
+
+def print_rows(cursor, rows):
+    """ Tab-separated rows with a header line. """
+    print('\t'.join(column[0] for column in cursor.description))
+    for row in rows:
+        print('\t'.join('' if value is None else str(value) for value in row))
+
+def main():
+    args = get_cli_arguments()
+
+    if not (args.load or args.remove or args.search or args.sql):
+        print('\n\nNothing to do; use --load, --remove, --search and/or --sql.')
+        sys.exit(1)
+
+    conn = connect(args.db)
+    failures = 0
+
+    for state in args.remove:
+        with conn:
+            removed = delete_state(conn, state)
+        print(f" - {state}: {'removed' if removed else 'not in the index'}")
+
+    if args.load:
+        xml_files = find_xml_files(args.load)
+        if not xml_files:
+            print(f"\n\nNo XML files found at {' '.join(args.load)}.")
+            sys.exit(1)
+
+        start = time.perf_counter()
+        print(f'\n\nIndexing {len(xml_files)} XML file(s) into {args.db}...')
+        failures = load_files(conn, xml_files, args.force, args.workers)
+        print(f'\n\nDone in {time.perf_counter() - start:.1f}s.')
+
+    try:
+        if args.search:
+            cursor = conn.execute(SEARCH_SQL, (args.search, args.limit))
+            print_rows(cursor, cursor.fetchall())
+
+        if args.sql:
+            cursor = conn.execute(args.sql)
+            print_rows(cursor, cursor.fetchall())
+    except sqlite3.Error as ex:
+        print(f'\n\nERROR: query failed: {ex}')
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+""" Tests for acf_link_cache: URLs that canonical_url() can't tidy up, and the parser's read-only view of the cache.
+
+    Run with: python -m pytest acf/test_link_cache.py
+"""
+import sqlite3
+
+import acf_link_cache
+
+def test_canonical_url_keeps_bad_ports_as_written():
+    for url in ["https://le.utah.gov:44x/typo", "https://le.utah.gov:99999/typo"]:
+        assert acf_link_cache.canonical_url(f" {url} ") == url
+
+def test_canonical_url_keeps_ipv6_brackets():
+    assert acf_link_cache.canonical_url("HTTP://[::1]:8080/x#part") == "http://[::1]:8080/x"
+    assert acf_link_cache.canonical_url("http://[::1]:80/x") == "http://[::1]/x"
+
+def test_problem_links_does_not_write_to_the_cache(tmp_path):
+    # a cache left in rollback-journal mode; opening it with open_cache() would switch it to WAL
+    cache_file = str(tmp_path / "link_cache.sqlite")
+    with sqlite3.connect(cache_file) as conn:
+        conn.execute(acf_link_cache.CACHE_SCHEMA)
+    conn.close()
+    conn = sqlite3.connect(cache_file)
+    acf_link_cache.save_results(conn, [
+        {"url": "https://le.utah.gov/good", "ok": True, "status": 200, "final_url": None, "corrected_url": "", "error": None},
+        {"url": "https://le.utah.gov/gone", "ok": False, "status": 404, "final_url": None, "corrected_url": "", "error": None},
+    ])
+    conn.close()
+
+    assert [entry['url'] for entry in acf_link_cache.problem_links(cache_file)] == ["https://le.utah.gov/gone"]
+    conn = sqlite3.connect(cache_file)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    conn.close()
+
+    # a file that isn't a link cache is left as it is
+    empty_file = tmp_path / "empty.sqlite"
+    empty_file.touch()
+    assert acf_link_cache.problem_links(str(empty_file)) == []
+    assert empty_file.stat().st_size == 0
@@ -1,49 +1,393 @@
 from lxml import etree
 import requests
+from requests.adapters import HTTPAdapter
 import sys
 import os
 import time
 import csv
+import json
+import argparse
+import threading
+import contextlib
+from collections import Counter
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit, urljoin
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import acf_link_cache
+import make_html
 
-if len(sys.argv) < 3:
-    print('Add the state and an xml file as arguments!')
-    sys.exit(1)
+# redirects we follow ourselves (so every hop goes through the per-host limits); 301/308 mean the link itself should be updated
+REDIRECT_CODES = {301, 302, 303, 307, 308}
+PERMANENT_REDIRECTS = {301, 308}
+MAX_REDIRECTS = 10
 
-state = sys.argv[1].lower().replace(' ', '_')
-xml_file = sys.argv[2]
-out_dir = os.path.dirname(xml_file)
-bad_link_log = os.path.join(out_dir, f"{state}_bad_links.csv")
+# a site that's throttling us (or briefly down) isn't a broken link: wait as long as it asks, a few times, before giving up on it
+THROTTLE_CODES = {429, 503}
+MAX_RETRIES = 3
+MAX_RETRY_AFTER = 60
 
-tree = etree.parse(xml_file)
-root = tree.getroot()
+# identify ourselves to the legislature sites we're checking
+HEADERS = {'User-Agent': 'ACF link checker (python-requests)'}
 
-# Extract all hyperlinks in <source> tags at various levels of hierarchy
-xml_hyperlinks = set()
+def get_cli_arguments():
+    """ Parse command line arguments and return an object whose members contain the argument values. """
+    parser = argparse.ArgumentParser(description="Check every <source> URL in one or more state XML files and log the ones that don't work")
+    parser.add_argument('targets', type=str, nargs='+', help='State XML files, directories of them, or globs. (The old "<state> <xml_file>" form still works.)')
+    parser.add_argument('--state', dest='state', type=str, help='State name for the bad link CSV, when checking a single file (default: the <state> in the XML)')
+    parser.add_argument('--workers', dest='workers', type=int, default=16, help='Links checked at the same time, across all hosts (default: 16)')
+    parser.add_argument('--per-host', dest='per_host', type=int, default=2, help='Requests in flight to any one host (default: 2)')
+    parser.add_argument('--interval', dest='interval', type=float, default=0.5, help='Minimum seconds between requests to the same host (default: 0.5)')
+    parser.add_argument('--timeout', dest='timeout', type=float, default=10, help='Seconds to wait for a response (default: 10)')
+    parser.add_argument('--cache', dest='cache', type=str, default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'acf_link_cache.sqlite'), help='Link check cache, shared by all states (default: acf_link_cache.sqlite next to this script)')
+    parser.add_argument('--ttl', dest='ttl', type=float, default=24, help='Hours a good result is trusted before the link is checked again (default: 24; 0 checks everything)')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false', help="Check every link and don't read or update the cache")
+    parser.add_argument('--journal', dest='journal', type=str, default='link_check_journal.jsonl', help='Every result is recorded here as soon as it is known (default: link_check_journal.jsonl)')
+    parser.add_argument('--resume', dest='resume', action='store_true', help='Carry on from an interrupted run: links already in the journal are not checked again')
+    return parser.parse_args()
 
-# Find all <source> elements at different levels of the XML hierarchy
-for source in root.xpath('.//source'):
-    if source.text:
-        xml_hyperlinks.add(source.text.strip().lower())
+def extract_links(xml_file):
 
-bad_links = []
-for url in xml_hyperlinks:
-    try:
-        response = requests.get(url, timeout=10)  # 10-second timeout
-        # Return True for 200 status, False otherwise
-        if response.status_code != 200:
-            print(f"{url} returned code {response.status_code}")
-            bad_links.append(url)
+    # Extract the state name and all hyperlinks in <source> tags at various levels of hierarchy; URLs are case-sensitive, so only whitespace is trimmed.
+    # The file is streamed, and each title is released once its links have been collected, so big states don't have to fit in memory
+    state = None
+    xml_hyperlinks = set()
+    for _, element in etree.iterparse(xml_file, events=('end',), tag=('state', 'source', 'title')):
+        if element.tag == 'state':
+            state = (element.text or '').strip()
+        elif element.tag == 'source':
+            if element.text and element.text.strip():
+                xml_hyperlinks.add(element.text.strip())
         else:
-            print(f"{url} is good!")
+            element.clear()
+            while element.getprevious() is not None and element.getprevious().tag == 'title':
+                element.getparent().remove(element.getprevious())
+
+    return state, xml_hyperlinks
+
+def find_xml_files(targets):
+
+    # the old command line was "<state> <xml_file>"; if the first argument isn't something we can find files with, treat it as the state name
+    state = None
+    if len(targets) == 2 and not make_html.find_xml_files(targets[0]):
+        state, targets = targets[0], targets[1:]
+
+    xml_files = []
+    for target in targets:
+        xml_files.extend(make_html.find_xml_files(target))
+
+    return state, list(dict.fromkeys(os.path.abspath(path) for path in xml_files))
+
+def interleave_by_host(urls):
+
+    # hand out URLs round-robin across hosts, so workers aren't all queued up behind the same host's limit while other hosts sit idle
+    by_host = {}
+    for url in sorted(urls):
+        by_host.setdefault(urlsplit(url).netloc.lower(), []).append(url)
+
+    ordered = []
+    queues = list(by_host.values())
+    while queues:
+        ordered.extend(queue.pop(0) for queue in queues)
+        queues = [queue for queue in queues if queue]
+
+    return ordered
+
+def new_host_limits(max_concurrent, min_interval):
+
+    # per-host politeness: no more than max_concurrent requests in flight to a host, and requests to a host start at least min_interval apart
+    return {"max_concurrent": max_concurrent, "min_interval": min_interval, "lock": threading.Lock(), "hosts": {}}
+
+@contextlib.contextmanager
+def host_slot(limits, url):
+
+    netloc = urlsplit(url).netloc.lower()
+    with limits['lock']:
+        if netloc not in limits['hosts']:
+            limits['hosts'][netloc] = {"slots": threading.BoundedSemaphore(limits['max_concurrent']), "lock": threading.Lock(), "next_start": 0.0}
+        host = limits['hosts'][netloc]
+
+    with host['slots']:
+        # book the next start time for this host, then wait for it outside the lock
+        with host['lock']:
+            now = time.monotonic()
+            start = max(now, host['next_start'])
+            host['next_start'] = start + limits['min_interval']
+        if start > now:
+            time.sleep(start - now)
+
+        yield host
+
+def retry_delay(response, attempt):
+
+    # Retry-After is either a number of seconds or an HTTP date; without one, back off exponentially
+    value = response.headers.get('Retry-After')
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                pass
+    return float(2 ** attempt)
+
+def new_session(workers, per_host):
+
+    # one session shared by every worker: connections to each host are kept alive and reused, up to per_host of them at a time
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=max(workers, 10), pool_maxsize=per_host)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
+
+def follow(session, limits, url, method, timeout, headers=None):
+
+    # request url, following redirects one hop at a time; returns (status, final URL, [(code, location), ...], headers of the last response)
+    redirects = []
+    visited = {url}
+    current = url
+
+    for _ in range(MAX_REDIRECTS + 1):
+        with host_slot(limits, current) as host:
+            for attempt in range(MAX_RETRIES + 1):
+                # the body has to be read for the connection to go back to the pool and be reused; only GETs (the fallback) have one
+                response = session.request(method, current, headers=headers, timeout=timeout, allow_redirects=False)
+                if response.status_code not in THROTTLE_CODES or attempt == MAX_RETRIES:
+                    break
+
+                # hold on to our slot and push back the host's next start, so nothing else goes to this host until it's ready for us
+                delay = retry_delay(response, attempt)
+                if delay > MAX_RETRY_AFTER:
+                    break
+                with host['lock']:
+                    host['next_start'] = max(host['next_start'], time.monotonic() + delay)
+                time.sleep(delay)
+
+        location = response.headers.get('Location')
+        if response.status_code not in REDIRECT_CODES or not location:
+            return response.status_code, current, redirects, response.headers
+
+        current = urljoin(current, location)
+        redirects.append((response.status_code, current))
+        if current in visited:
+            raise requests.TooManyRedirects(f"redirect loop back to {current}")
+        visited.add(current)
+
+        # 303 means "go GET this other page"
+        if response.status_code == 303:
+            method = 'GET'
+
+    raise requests.TooManyRedirects(f"more than {MAX_REDIRECTS} redirects")
+
+def check_url(session, limits, url, timeout, cached=None):
+
+    result = {"url": url, "ok": False, "status": None, "final_url": None, "redirects": [], "method": "HEAD", "error": None, "corrected_url": "",
+              "etag": None, "last_modified": None, "checked_at": time.time(), "revalidated": False, "elapsed": None}
+    started = time.perf_counter()
+
+    # a stale good result from the cache is revalidated with a conditional GET; otherwise HEAD is enough to see whether a page is there.
+    # Some servers don't support HEAD (or answer it wrongly), so any failure is confirmed with a plain GET
+    conditional = acf_link_cache.conditional_headers(cached)
+    attempts = [('GET', conditional), ('GET', None)] if conditional else [('HEAD', None), ('GET', None)]
+
+    for method, headers in attempts:
+        result['method'] = method
+        try:
+            result['status'], result['final_url'], result['redirects'], response_headers = follow(session, limits, url, method, timeout, headers)
+            result['error'] = None
+        except requests.RequestException as e:
+            result['status'], result['final_url'], result['redirects'], response_headers = None, None, [], {}
+            result['error'] = f"{type(e).__name__}: {e}"
+
+        # 304: unchanged since we last checked it, so the cached answer (including where it redirects to) still stands
+        if result['status'] == 304 and headers:
+            result.update(ok=True, revalidated=True, final_url=cached['final_url'], corrected_url=cached['corrected_url'] or '',
+                          etag=response_headers.get('ETag') or cached['etag'], last_modified=response_headers.get('Last-Modified') or cached['last_modified'],
+                          elapsed=round(time.perf_counter() - started, 4))
+            return result
+
+        if result['status'] is not None and 200 <= result['status'] < 300:
+            result['ok'] = True
+            result['etag'] = response_headers.get('ETag')
+            result['last_modified'] = response_headers.get('Last-Modified')
+            break
+
+    # a link that has moved permanently still works, but the Word doc should be updated to point at the new location
+    if result['ok'] and any(code in PERMANENT_REDIRECTS for code, _ in result['redirects']):
+        result['corrected_url'] = result['final_url']
+
+    # seconds from picking the link up to having an answer, waits for the host included (benchmark_links.py reports on these)
+    result['elapsed'] = round(time.perf_counter() - started, 4)
+
+    return result
+
+def cached_result(url, entry):
+
+    # a fresh cache entry stands in for a check
+    return {"url": url, "ok": bool(entry['ok']), "status": entry['status'], "final_url": entry['final_url'], "redirects": [], "method": None, "error": entry['error'],
+            "corrected_url": entry['corrected_url'] or '', "etag": entry['etag'], "last_modified": entry['last_modified'], "checked_at": entry['checked_at'], "cached": True}
+
+def check_links(urls, workers, per_host, interval, timeout, cache_entries=None, on_result=None):
+
+    session = new_session(workers, per_host)
+    limits = new_host_limits(per_host, interval)
+    cache_entries = cache_entries or {}
+
+    results = []
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(check_url, session, limits, url, timeout, cache_entries.get(acf_link_cache.canonical_url(url))) for url in interleave_by_host(urls)]
+        for future in as_completed(futures):
+            result = future.result()
+            if result['corrected_url']:
+                print(f"{result['url']} has moved to {result['corrected_url']}")
+            elif result['ok']:
+                print(f"{result['url']} is good!")
+            elif result['error']:
+                print(f"\n{result['url']} request encountered an error: {result['error']}")
+            else:
+                print(f"{result['url']} returned code {result['status']}")
+            results.append(result)
+            if on_result:
+                on_result(result)
+
+    # on Ctrl+C, drop the links nobody has started on instead of waiting for every one of them
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        session.close()
+
+    return results
+
+def read_journal(journal_file):
+
+    # results recorded so far, by URL; a run that was killed mid-write can leave a partial last line, which is ignored (that link gets checked again)
+    results = {}
+    if not os.path.exists(journal_file):
+        return results
+
+    with open(journal_file, 'r', encoding='utf-8') as fi:
+        for line in fi:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            results[result['url']] = result
+
+    return results
+
+def ends_mid_line(journal_file):
+    if not os.path.exists(journal_file) or not os.path.getsize(journal_file):
+        return False
+
+    with open(journal_file, 'rb') as fi:
+        fi.seek(-1, os.SEEK_END)
+        return fi.read(1) != b'\n'
+
+def journal_writer(journal):
+
+    # one JSON line per result, flushed straight away so an interrupted run loses nothing it had finished
+    def write(result):
+        journal.write(json.dumps(result) + '\n')
+        journal.flush()
+
+    return write
+
+def write_bad_links(bad_link_log, results):
+
+    # links that failed, plus links that moved permanently (with their new location filled in as the correction)
+    with open(bad_link_log, mode='a', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Bad URL', 'Corrected URL'])
+        for result in sorted(results, key=lambda r: r['url']):
+            if not result['ok'] or result['corrected_url']:
+                writer.writerow([result['url'], result['corrected_url']])
+
+def run_checks(urls, args):
+
+    # urls are canonical (see acf_link_cache.canonical_url), so each is checked once however many states and spellings share it.
+    # Every result goes into the journal as soon as we have it; with --resume, links already in the journal are skipped
+    journaled = read_journal(args.journal) if args.resume else {}
+    remaining = [url for url in urls if url not in journaled]
+    if journaled:
+        print(f"\n\nResuming: {len(urls) - len(remaining)} of {len(urls)} links are already in {args.journal}.")
+
+    # links checked (and found good) within the last --ttl hours are taken from the cache; the rest are checked, stale ones conditionally
+    cache = acf_link_cache.open_cache(args.cache) if args.use_cache else None
+    cache_entries = acf_link_cache.get_entries(cache, remaining) if cache else {}
+    fresh = {url: cache_entries[url] for url in remaining if acf_link_cache.is_fresh(cache_entries.get(url), args.ttl * 3600)}
+    to_check = [url for url in remaining if url not in fresh]
+
+    hosts = Counter(urlsplit(url).netloc for url in to_check)
+    print(f"\n\n{len(fresh)} of {len(remaining)} links were checked in the last {args.ttl:g} hours. Checking {len(to_check)} links on {len(hosts)} hosts ({args.workers} workers, {args.per_host} per host, {args.interval}s between requests to a host)...\n")
+
+    start = time.perf_counter()
+    with open(args.journal, 'a' if args.resume else 'w', encoding='utf-8') as journal:
+        # start on a fresh line if the last run was cut off part-way through one
+        if args.resume and ends_mid_line(args.journal):
+            journal.write('\n')
+        record = journal_writer(journal)
+        for url, entry in fresh.items():
+            record(cached_result(url, entry))
+
+        try:
+            checked = check_links(to_check, args.workers, args.per_host, args.interval, args.timeout, cache_entries, record) if to_check else []
+        except KeyboardInterrupt:
+            print(f"\n\nInterrupted. Finished results are in {args.journal}; run again with --resume to pick up where this run stopped.")
+            sys.exit(1)
+
+    # results from an earlier, interrupted run never made it into the cache; they go in now along with this run's
+    if cache:
+        acf_link_cache.save_results(cache, checked + [result for result in journaled.values() if not result.get('cached')])
+        cache.close()
+
+    revalidated = sum(1 for result in checked if result['revalidated'])
+    print(f"\n\nChecked {len(checked)} links in {time.perf_counter() - start:.1f}s ({revalidated} unchanged since last time), {len(fresh)} from cache.")
+
+    # the journal is the record of this run; the CSVs are built from it
+    return read_journal(args.journal)
+
+def main():
+    args = get_cli_arguments()
+
+    state_arg, xml_files = find_xml_files(args.targets)
+    state_arg = args.state or state_arg
+    if not xml_files:
+        print(f"\n\nNo XML files found at {' '.join(args.targets)}.")
+        sys.exit(1)
+    if state_arg and len(xml_files) > 1:
+        print('\n\nA state name can only be given when checking a single XML file.')
+        sys.exit(1)
+
+    # collect every state's links; a state's CSV goes next to its XML, and dated XMLs for the same state share one CSV
+    bad_link_logs = {}
+    for xml_file in xml_files:
+        try:
+            state, urls = extract_links(xml_file)
+        except etree.XMLSyntaxError as e:
+            print(f'\n\nCould not read {xml_file}: {e}')
+            sys.exit(1)
+
+        state = (state_arg or state or os.path.basename(xml_file).split('_')[0]).lower().replace(' ', '_')
+        bad_link_log = os.path.join(os.path.dirname(xml_file), f"{state}_bad_links.csv")
+        bad_link_logs.setdefault(bad_link_log, set()).update(urls)
+
+    # check each distinct link once...
+    canonical = {url: acf_link_cache.canonical_url(url) for urls in bad_link_logs.values() for url in urls}
+    print(f"\n\nFound {len(canonical)} links ({len(set(canonical.values()))} distinct) in {len(xml_files)} XML file(s).")
+    results = run_checks(sorted(set(canonical.values())), args)
 
-        time.sleep(1.5)
+    # ...then give every state its own results, under the URLs as that state wrote them
+    print('')
+    for bad_link_log, urls in sorted(bad_link_logs.items()):
+        state_results = [{**results[canonical[url]], "url": url} for url in urls]
+        write_bad_links(bad_link_log, state_results)
 
-    except requests.RequestException:
-        print(f"\n{url} request encountered an error: {requests.RequestException}")
-        bad_links.append(url)
+        bad = sum(1 for result in state_results if not result['ok'])
+        moved = sum(1 for result in state_results if result['corrected_url'])
+        print(f" - {os.path.basename(bad_link_log)}: {len(state_results)} links, {len(state_results) - bad} good ({moved} moved), {bad} bad")
 
-with open(bad_link_log, mode='a', newline='', encoding='utf-8') as file:
-    writer = csv.writer(file)
-    writer.writerow(['Bad URL', 'Corrected URL'])
-    for url in bad_links:
-        writer.writerow([url, ''])
\ No newline at end of file
+if __name__ == "__main__":
+    main()
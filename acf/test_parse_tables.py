@@ -0,0 +1,118 @@
+""" Regression tests for parse_tables(): title rows that appear more than once, and article rows read before their title row.
+
+    Run with: python -m pytest acf/test_parse_tables.py
+"""
+import os
+import json
+import random
+import importlib.util
+
+from docx import Document
+
+import make_synthetic_docx
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# the parser's file name isn't a valid module name, so load it by path
+spec = importlib.util.spec_from_file_location("acf_parser", os.path.join(SCRIPT_DIR, "acf_parse-docx-to-xml.py"))
+parser = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(parser)
+
+def load_details(tmp_path, doc):
+    """ The Utah config, pointed at doc and without the parse cache. """
+    input_doc = tmp_path / "record.docx"
+    doc.save(input_doc)
+
+    with open(os.path.join(SCRIPT_DIR, "acf_parse_config.json"), "r", encoding="utf-8") as fi:
+        details = json.load(fi)
+    details.update(input_doc=str(input_doc), out_dir=str(tmp_path), use_cache=False)
+
+    return parser.prepare_config(details, SCRIPT_DIR), input_doc
+
+def make_title(details, number):
+    return {
+        "number": number,
+        "label": f"{details['titleName']} {number}",
+        "name": f"Synthetic Human Services Code {number}",
+        "url": make_synthetic_docx.link_url(number),
+        "category": "Division 1: Social Services",
+    }
+
+class RecordBuilder:
+    """ Adds title and article rows to a document, with article numbers that are unique across the whole record. """
+
+    def __init__(self, details):
+        self.details = details
+        self.doc = Document()
+        self.rng = random.Random(1)
+        self.make_citation = make_synthetic_docx.citation_maker(details, self.rng)
+        self.articles = 0
+
+    def table(self):
+        return self.doc.add_table(rows=0, cols=3)
+
+    def title_row(self, table, title):
+        make_synthetic_docx.add_title_row(table, self.details, title, self.rng, 0)
+
+    def article_row(self, table, title, with_title=True):
+        make_synthetic_docx.add_article_row(table, self.details, title, self.articles, {"statutes": 1, "definitions": 0}, self.make_citation, self.rng, 0)
+        self.articles += 1
+
+        # drop the title (its label and linked name) so this row relies on the title of the article row before it
+        if not with_title:
+            overview_cell = table.rows[-1].cells[0]
+            for paragraph in overview_cell.paragraphs[2:4]:
+                paragraph._element.getparent().remove(paragraph._element)
+
+def parse(tmp_path, builder):
+    details, input_doc = load_details(tmp_path, builder.doc)
+    record_data = {}
+    parser.parse_tables(parser.snapshot_tables(Document(input_doc)), details, record_data)
+    return record_data
+
+def article_numbers(record_data, number):
+    title_key = next(key for key, title in record_data.items() if title['number'] == number)
+    return [article['number'] for article in record_data[title_key].get('articles', [])]
+
+def test_repeated_title_row_keeps_articles(tmp_path):
+    builder = RecordBuilder(make_synthetic_docx.load_state_config(os.path.join(SCRIPT_DIR, "acf_parse_config.json")))
+    title = make_title(builder.details, "62A")
+
+    # the same title row heads two tables of two articles each
+    for _ in range(2):
+        table = builder.table()
+        builder.title_row(table, title)
+        builder.article_row(table, title)
+        builder.article_row(table, title)
+
+    record_data = parse(tmp_path, builder)
+
+    assert len(record_data) == 1
+    assert article_numbers(record_data, "62A") == ["62A-1", "62A-2", "62A-3", "62A-4"]
+
+def test_deferred_rows_keep_their_own_title(tmp_path):
+    builder = RecordBuilder(make_synthetic_docx.load_state_config(os.path.join(SCRIPT_DIR, "acf_parse_config.json")))
+    first, second, third = (make_title(builder.details, number) for number in ["1", "2", "3"])
+
+    # an article for title 2 (and a title-less row after it) comes before title 2's own table
+    table = builder.table()
+    builder.title_row(table, first)
+    builder.article_row(table, first)
+    builder.article_row(table, second)
+    builder.article_row(table, second, with_title=False)
+
+    table = builder.table()
+    builder.title_row(table, second)
+    builder.article_row(table, second)
+
+    # the last table leaves title 3 behind as the most recent title; none of the rows above belong to it
+    table = builder.table()
+    builder.title_row(table, third)
+    builder.article_row(table, third)
+    builder.article_row(table, third, with_title=False)
+
+    record_data = parse(tmp_path, builder)
+
+    assert article_numbers(record_data, "1") == ["1-1"]
+    assert article_numbers(record_data, "2") == ["2-2", "2-3", "2-4"]
+    assert article_numbers(record_data, "3") == ["3-5", "3-6"]
@@ -1,17 +1,28 @@
 import sys
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import base64
 import os
-from datetime import datetime
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
 # set variables.
 working_dir = os.path.dirname(os.path.abspath(__file__))
 draft_dois = os.path.join(working_dir, "draft_dois.csv")
 minted_dois = os.path.join(working_dir, "minted_dois.csv")
+doi_journal = os.path.join(working_dir, "doi_journal.jsonl")
 xml_dir = os.path.join(working_dir, "XML")
 
+# DataCite allows 3,000 requests per five minutes from one IP address; every worker shares this budget
+max_requests_per_second = 9.5
+max_attempts = 5
+default_workers = 4
+
 try:
     if sys.argv[1].lower() == 'test':
         credentials = os.path.join(working_dir, "test_credentials.json")
@@ -22,7 +33,19 @@ try:
         sys.exit(1)
 
 except IndexError:
-    print('\n\nUsage: python somar_dois.py <prod OR test>')
+    print('\n\nUsage: python somar_dois.py <prod OR test> [number of workers] [resume]')
+    sys.exit(1)
+
+# optional: how many items to work on at the same time, and "resume" to pick up after a run that didn't finish
+options = [arg.lower() for arg in sys.argv[2:]]
+resume = 'resume' in options
+options = [option for option in options if option != 'resume']
+try:
+    workers = int(options[0]) if options else default_workers
+    if workers < 1 or len(options) > 1:
+        raise ValueError
+except ValueError:
+    print('\n\nWARNING: number of workers must be a whole number, 1 or more.')
     sys.exit(1)
 
 #make sure we have our draft_dois CSV in our working dir
@@ -62,27 +85,183 @@ if 'Result' not in somar.columns:
 else:
     somar['Result'] = somar['Result'].astype("string")
 
-#Additional vars: an empty list for suffixes and an index counter, set to 0 
-new_doi_suffixes = []
+# write-ahead journal: each mint and publish is recorded (and flushed to disk) as it happens, because draft_dois.csv is only
+# rewritten at the end. If a run dies part-way, the journal is all that says which DOIs DataCite has already minted
+journal = {"lock": threading.Lock(), "file": None}
 
-# loop through the dataframe
-print('Gathering info and minting DOIs...')
+def journal_event(event, item_url, **fields):
+    line = json.dumps({"event": event, "url": item_url, "time": datetime.now(timezone.utc).isoformat(timespec='seconds'), **fields})
+    with journal['lock']:
+        journal['file'].write(line + '\n')
+        journal['file'].flush()
+        os.fsync(journal['file'].fileno())
 
-for index, row in somar.iterrows():
+def read_journal():
+    # the last word on each item, keyed by its SOMAR URL; a partial last line (the run died while writing it) is ignored
+    items = {}
+    with open(doi_journal, 'r', encoding='utf-8') as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            item = items.setdefault(entry['url'], {"event": None, "doi": None})
+            item['event'] = entry['event']
+            if entry.get('doi'):
+                item['doi'] = entry['doi']
+    return items
 
-    print(f'\n - Working on {row["StudyTitle"]}')
+# a journal is only left behind by a run that didn't finish; starting over without it could mint a second DOI for some items
+if os.path.exists(doi_journal) and not resume:
+    print(f'\n\nWARNING: {doi_journal} was left by a run that did not finish, so DOIs may have been minted that are not in {draft_dois}. Re-run with "resume" to pick them up.')
+    sys.exit(1)
 
-    # skip item if it has already been added
-    if pd.notna(row['Result']) and 'Success' in str(row['Result']):
-        print('\tAlready added to DataCite; moving on to next item!')
-        continue
+# resume: bring the CSV up to date with everything the journal recorded
+if resume and os.path.exists(doi_journal):
+    journaled = read_journal()
+    for index, row in somar.iterrows():
+        item = journaled.get(row['URL'])
+        if item is None or (pd.notna(row['Result']) and 'Success' in str(row['Result'])):
+            continue
+
+        if item['doi']:
+            somar.loc[index, 'DOI'] = item['doi']
+        if item['event'] == 'published':
+            somar.loc[index, 'Result'] = 'Success'
+        elif item['event'] == 'mint_started':
+            # we asked for a DOI but never heard back; DataCite may have minted it anyway
+            somar.loc[index, 'Result'] = 'Unconfirmed'
+        elif item['event'] in ('mint_failed', 'publish_failed'):
+            somar.loc[index, 'Result'] = 'Failure'
+
+    print(f'\n\nResuming: {len(journaled)} items were recorded in {doi_journal}; {sum(1 for item in journaled.values() if item["event"] == "published")} of them finished.')
+
+    # start on a fresh line if the last run was cut off part-way through one
+    if os.path.getsize(doi_journal):
+        with open(doi_journal, 'rb') as file:
+            file.seek(-1, os.SEEK_END)
+            if file.read(1) != b'\n':
+                with open(doi_journal, 'a', encoding='utf-8') as journal_file:
+                    journal_file.write('\n')
+elif resume:
+    print(f'\n\nNothing to resume ({doi_journal} does not exist); starting from {draft_dois}.')
+
+# one keep-alive session shared by every worker, so each call to DataCite reuses an open connection instead of starting a new one
+session = requests.Session()
+session.auth = (user, password)
+session.headers.update({'Content-Type': 'application/vnd.api+json'})
+adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+session.mount('https://', adapter)
+session.mount('http://', adapter)
+
+# calls to DataCite start at least 1/max_requests_per_second apart, whichever worker makes them
+rate_limit = {"lock": threading.Lock(), "next_start": 0.0}
+
+def wait_for_turn():
+    with rate_limit['lock']:
+        now = time.monotonic()
+        start = max(now, rate_limit['next_start'])
+        rate_limit['next_start'] = start + 1 / max_requests_per_second
+    if start > now:
+        time.sleep(start - now)
+
+def back_off(seconds):
+    # DataCite told us to slow down; hold every worker, not just the one that was told
+    with rate_limit['lock']:
+        rate_limit['next_start'] = max(rate_limit['next_start'], time.monotonic() + seconds)
+
+def retry_delay(response, attempt):
+    # Retry-After is either a number of seconds or an HTTP date; without one, back off exponentially
+    value = response.headers.get('Retry-After') if response is not None else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                pass
+    return min(60.0, 2.0 ** attempt)
+
+def call_datacite(method, url, payload=None, repeatable=True, params=None):
+    # Send one request, waiting out rate limits (429) and outages (503) as DataCite asks.
+    # Minting (POST) isn't repeatable: if we never got an answer, DataCite may have minted the DOI anyway, so that error is passed on instead of retried
+    data = json.dumps(payload).replace('\n', '').replace('\r', '').encode() if payload is not None else None
+    retry_codes = {429, 502, 503, 504} if repeatable else {429, 503}
+
+    for attempt in range(max_attempts):
+        wait_for_turn()
+        try:
+            response = session.request(method, url, data=data, params=params, timeout=60)
+        except requests.RequestException:
+            if not repeatable or attempt == max_attempts - 1:
+                raise
+            back_off(retry_delay(None, attempt))
+            continue
+
+        if response.status_code not in retry_codes or attempt == max_attempts - 1:
+            return response
+        back_off(retry_delay(response, attempt))
+
+def error_details(response):
+    try:
+        return response.json()
+    except ValueError:
+        return response.text[:500]
+
+def find_minted_dois(item_url):
+    # DOIs under our prefix that already point at item_url; we search with our credentials, so drafts are included
+    response = call_datacite('GET', datacite_url, params={'query': f'url:"{item_url}"', 'prefix': prefix, 'page[size]': 25})
+    response.raise_for_status()
+    return [item['attributes']['doi'] for item in response.json().get('data', []) if item['attributes'].get('url') == item_url]
+
+def register_item(row):
+    # Mint a DOI for one item and publish its metadata. Runs on a worker thread, so it doesn't touch the dataframe:
+    # it returns the DOI (if one was minted), the Result, and its messages, which are printed together so items don't interleave
+    outcome = {"doi": None, "result": "Failure", "log": [f'\n - Working on {row["StudyTitle"]}']}
+    log = outcome['log']
+
+    item_url = row['URL']
+    item_doi = str(row['DOI']).strip() if pd.notna(row['DOI']) and str(row['DOI']).strip() else None
+
+    # an earlier run asked for a DOI but never heard back; find out whether DataCite minted one before asking again
+    if item_doi is None and pd.notna(row['Result']) and str(row['Result']) == 'Unconfirmed':
+        log.append('\n\tChecking whether an earlier run minted a DOI...')
+        try:
+            found = find_minted_dois(item_url)
+        except (requests.RequestException, ValueError) as e:
+            log.append(f'\t  - Could not check ({e}); leaving this item for the next run.')
+            outcome['result'] = 'Unconfirmed'
+            return outcome
+
+        if len(found) > 1:
+            log.append(f'\t  - WARNING: several DOIs already point at this item ({", ".join(found)}); sort them out in DataCite and record the right one in draft_dois.csv.')
+            outcome['result'] = 'Unconfirmed'
+            return outcome
+        if found:
+            item_doi = found[0]
+            log.append(f'\t  - Found {item_doi}')
+            journal_event('minted', item_url, doi=item_doi, found=True)
+        else:
+            log.append('\t  - None found')
+
+    if item_doi is None:
+        item_doi = mint_doi(row, log, outcome)
+        if item_doi is None:
+            return outcome
+    else:
+        log.append(f'\n\tDOI {item_doi} was minted earlier; publishing it.')
+    outcome['doi'] = item_doi
+
+    return publish_doi(row, item_doi, log, outcome)
+
+def mint_doi(row, log, outcome):
+    # returns the new DOI, or None (with outcome['result'] set) if we didn't get one
 
-    #extract the item ID from its SOMAR URL
     item_url = row['URL']
-    item_id =item_url.rsplit('/', 1)[1]
 
     #set up our JSON data to mint the DOI
-    print('\n\tMinting DOI...')
+    log.append('\n\tMinting DOI...')
     data_content = {
         "data": {
             "type": "dois",
@@ -101,46 +280,46 @@ for index, row in somar.iterrows():
         }
     }
 
-    data = json.dumps(data_content).replace('\n', '').replace('\r', '').encode()
-    headers = {
-        'content-type': 'application/vnd.api+json',
-    }
+    # recorded before we ask, so that if we never hear back the next run knows to check DataCite instead of minting blindly
+    journal_event('mint_started', item_url)
+    try:
+        response = call_datacite('POST', datacite_url, data_content, repeatable=False)
+    except requests.RequestException as e:
+        log.append(f'\t  - DOI request failed: {e}')
+        log.append('\t  - DataCite may have minted it anyway; the next run will check before minting again.')
+        outcome['result'] = 'Unconfirmed'
+        return None
 
-    response = requests.post(
-        datacite_url,
-        headers=headers,
-        data=data,
-        auth=(user, password)
-    )
-    
     #Check to make sure we got a successful ('201') response code.
     if str(response.status_code) == '201':
-        print('\t  - DOI succeeded!')
-
-        # assign variables: locally and in our dataframe
+        log.append('\t  - DOI succeeded!')
         item_doi = response.json()['data']['attributes']['doi']
-        somar.loc[index, 'DOI'] = item_doi
+        journal_event('minted', item_url, doi=item_doi)
+        return item_doi
 
-    else:
-        print(f'\t  - DOI failed; code {response.status_code}')
-        print(f'\t  - {response.json()}')
-        somar.loc[index, 'Result'] = str('Failure')
-        continue
+    log.append(f'\t  - DOI failed; code {response.status_code}')
+    log.append(f'\t  - {error_details(response)}')
+    journal_event('mint_failed', item_url, status=response.status_code)
+    return None
+
+def publish_doi(row, item_doi, log, outcome):
+    # upload the item's DataCite XML and publish the DOI; publishing again is harmless, so this is safe to repeat
+    item_url = row['URL']
 
     # proceed to update the metadata for our new DataCite object
-    print('\n\tUpdating metadata...')
+    log.append('\n\tUpdating metadata...')
 
     # First, make sure the XML file exists; if not, provide error message and move on to next item
     xml_file = os.path.join(xml_dir, row['XMLFile'])
     if not os.path.exists(xml_file):
-        print(f'\t  - WARNING: {xml_file} does not exist; verify file and associated name (and update draft_dois.csv, if necessary).')
-        somar.loc[index, 'Result'] = 'Failure'
-        continue
+        log.append(f'\t  - WARNING: {xml_file} does not exist; verify file and associated name (and update draft_dois.csv, if necessary).')
+        journal_event('publish_failed', item_url, doi=item_doi, error='missing XML')
+        return outcome
 
     # base64 encode the XML so it can be included in our API call
     with open(xml_file, 'rb') as file:
         xml_encoded = base64.b64encode(file.read()).decode('utf-8')
-        
+
     #create update json. Key things here: we have to pass the doi, we have to have a publish event, we have to pass the now-encoded xml.
     payload = {
         'data': {
@@ -157,33 +336,82 @@ for index, row in somar.iterrows():
         }
     }
 
-    #set up vars
-    data = json.dumps(payload).replace('\n', '').replace('\r', '').encode()
-    headers = {
-        'Content-Type': 'application/vnd.api+json',
-    }
-
     # submit API request
-    response = requests.put(
-        f'{datacite_url}/{item_doi}',
-        headers=headers,
-        data=data,
-        auth=(user, password),
-    )
-    
-    #Response code should be 200; document outcome in dataframe
+    try:
+        response = call_datacite('PUT', f'{datacite_url}/{item_doi}', payload, repeatable=True)
+    except requests.RequestException as e:
+        log.append(f'\t  - Metadata update request failed: {e}')
+        journal_event('publish_failed', item_url, doi=item_doi, error=str(e))
+        return outcome
+
+    #Response code should be 200; document outcome
     if str(response.status_code) == "200":
-        print('\t  - Metadata update succeeded!')
-        somar.loc[index, 'Result'] = str("Success")
+        log.append('\t  - Metadata update succeeded!')
+        journal_event('published', item_url, doi=item_doi)
+        outcome['result'] = "Success"
     else:
-        print(f'\t  - Metadata update failed; code {response.status_code}')
-        print(f'\t  - {response.json()}')
-        somar.loc[index, 'Result'] = str('Failure')
-        continue
+        log.append(f'\t  - Metadata update failed; code {response.status_code}')
+        log.append(f'\t  - {error_details(response)}')
+        journal_event('publish_failed', item_url, doi=item_doi, status=response.status_code)
+
+    return outcome
+
+# skip items that have already been added
+pending = []
+for index, row in somar.iterrows():
+    if pd.notna(row['Result']) and 'Success' in str(row['Result']):
+        print(f'\n - {row["StudyTitle"]}: already added to DataCite; moving on to next item!')
+    else:
+        pending.append((index, row))
+
+print(f'\n\nGathering info and minting DOIs for {len(pending)} items ({workers} at a time)...')
+start = time.perf_counter()
+
+journal['file'] = open(doi_journal, 'a', encoding='utf-8')
+
+# results come back as items finish, in any order; only this thread writes to the dataframe, each outcome to the row it came from
+executor = ThreadPoolExecutor(max_workers=workers)
+crashed = 0
+try:
+    futures = {executor.submit(register_item, row): index for index, row in pending}
+    for future in as_completed(futures):
+        index = futures[future]
+        try:
+            outcome = future.result()
+        except Exception as e:
+            # something we didn't plan for (an odd DataCite reply, a disk error writing the journal) only fails this item; the rest still get saved
+            outcome = {"doi": None, "result": "Failure", "log": [f'\n - Working on {somar.loc[index, "StudyTitle"]}', f'\t  - FAILED: {type(e).__name__}: {e}']}
+            crashed += 1
+        print('\n'.join(outcome['log']))
+
+        if outcome['doi']:
+            somar.loc[index, 'DOI'] = outcome['doi']
+        somar.loc[index, 'Result'] = outcome['result']
+
+except KeyboardInterrupt:
+    # let the items already under way finish (and be journaled) so nothing is left half-done at DataCite; drop the rest
+    print('\n\nInterrupted; finishing the items already started. Run again with "resume" to pick up where this run stopped.')
+    executor.shutdown(wait=True, cancel_futures=True)
+    journal['file'].close()
+    sys.exit(1)
+
+executor.shutdown()
+session.close()
+journal['file'].close()
+
+succeeded = sum(1 for index, _ in pending if somar.loc[index, 'Result'] == 'Success')
+print(f'\n\n{succeeded} of {len(pending)} items registered in {time.perf_counter() - start:.1f}s.')
 
 #Save the dataframe as a csv, for easiest copy/pasting into the google sheet. MAKE SURE TO KEEP THIS, YOU WILL NEED IT WHEN YOU UPDATE.
 somar.to_csv(minted_dois, index=False)
 try:
     os.replace(minted_dois, draft_dois)
 except Exception as e:
-    print(f"Error replacing file: {e}")
\ No newline at end of file
+    print(f"Error replacing file: {e}")
+else:
+    if crashed:
+        # an item that failed part-way may have been minted without the DOI being recorded; the journal lets the next run check first
+        print(f'\n\n{crashed} items failed unexpectedly; keeping {doi_journal}. Re-run with "resume" to retry them.')
+    else:
+        # everything the journal recorded is in draft_dois.csv now
+        os.remove(doi_journal)
\ No newline at end of file